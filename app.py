@@ -7,17 +7,19 @@ from flask import (
     flash,
     session,
     jsonify,
+    Response,
+    stream_with_context,
 )
 import os
 import re
 import json
+import click
 import tempfile
 import sqlite3
 import numpy as np
 import pandas as pd
 from werkzeug.utils import secure_filename
-from datetime import datetime
-from pydub import AudioSegment
+from datetime import datetime, timedelta
 
 # Import custom modules
 from models.database import (
@@ -30,7 +32,7 @@ from models.database import (
     update_note_text,  # Added missing import
     import_existing_notes,
     get_follow_up_actions,  # Added for follow-up functionality
-    save_follow_up_actions,  # Added for follow-up functionality
+    get_due_follow_ups,
     DB_PATH,
 )
 from models.lipid_analyzer import (
@@ -42,18 +44,33 @@ from models.lipid_analyzer import (
 from models.symptom_checker import predict_disease, get_common_symptoms
 from models.notes_processor import (
     extract_medical_info,
-    transcribe_audio,
+    extract_changed_info,
+    stream_extract_medical_info,
     save_edited_summary,  # Keep this since it's specialized
+    clean_transcription,
 )
+from models.summary import Summary, validate_summary
 from models.chatbot_handler import ChatbotHandler
+from models.batch_extraction import reprocess_notes
+from models.audio_decoding import spool_upload
+from models.speech_backends import get_speech_backend
+from models.vad import get_vad_stats
+from models.transcription_jobs import submit_transcription_job, get_transcription_job
+from models.dictation import DictationSession, DEFAULT_SAMPLE_RATE
+from models.extraction_router import get_extraction_metrics
 from models.follow_up import (
     generate_follow_up_actions,
-)  # Only import the generator function
+    generate_follow_up_actions_batch,
+    start_follow_up_subscriber,
+)
 from models.treatment_efficacy import analyze_treatment_efficacy, get_patient_notes
+from models.cohort_analytics import analyze_cohort_efficacy
 
 # Initialize the database and import existing notes when the app starts
 init_db()
 import_existing_notes()  # This will import notes from notes.txt
+# Regenerate follow-up actions in the background whenever a note changes
+start_follow_up_subscriber()
 try:
     from models.database import DB_PATH
 
@@ -90,6 +107,12 @@ except ImportError:
     genai_model = None
     chatbot = ChatbotHandler()
 
+# Load the configured speech backend (and any offline model) once per worker
+try:
+    get_speech_backend()
+except Exception as e:
+    print(f"Speech backend could not be loaded: {e}")
+
 # Initialize Flask application
 app = Flask(__name__)
 app.secret_key = "health_companion_secret_key"
@@ -108,6 +131,15 @@ app.config["ALLOWED_EXTENSIONS"] = {
     "aiff",
 }  # Added audio file types
 
+# Optional: live dictation over WebSocket
+try:
+    from flask_sock import Sock
+
+    sock = Sock(app)
+except ImportError:
+    print("flask-sock not available. Live dictation is disabled; audio uploads still work.")
+    sock = None
+
 # Ensure necessary directories exist
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 os.makedirs("summaries", exist_ok=True)  # Directory for saved summaries
@@ -122,57 +154,6 @@ def allowed_file(filename):
     )
 
 
-def convert_audio_to_wav(file_path):
-    """Convert any audio file to WAV format using pydub"""
-    try:
-        # Get the file extension
-        file_ext = os.path.splitext(file_path)[1].lower()
-
-        # Define the output WAV path
-        wav_path = os.path.splitext(file_path)[0] + ".wav"
-
-        print(f"Converting {file_ext} file to WAV: {file_path} -> {wav_path}")
-
-        # Load the audio file using pydub
-        if file_ext == ".mp3":
-            audio = AudioSegment.from_mp3(file_path)
-        elif file_ext == ".ogg":
-            audio = AudioSegment.from_ogg(file_path)
-        elif file_ext == ".flac":
-            audio = AudioSegment.from_file(file_path, format="flac")
-        elif file_ext == ".aac":
-            audio = AudioSegment.from_file(file_path, format="aac")
-        elif file_ext == ".m4a":
-            audio = AudioSegment.from_file(file_path, format="m4a")
-        elif file_ext == ".wma":
-            audio = AudioSegment.from_file(file_path, format="wma")
-        elif file_ext == ".aiff" or file_ext == ".aif":
-            audio = AudioSegment.from_file(file_path, format="aiff")
-        elif file_ext == ".wav":
-            # Already a WAV file, no conversion needed
-            return file_path
-        else:
-            # Try to load using the file extension as format
-            try:
-                audio = AudioSegment.from_file(file_path, format=file_ext[1:])
-            except Exception as e:
-                print(f"Failed to determine format for {file_ext}: {e}")
-                return None
-
-        # Export as WAV
-        audio.export(wav_path, format="wav")
-
-        print(f"Conversion successful: {wav_path}")
-        return wav_path
-
-    except Exception as e:
-        print(f"Error converting audio file: {e}")
-        import traceback
-
-        traceback.print_exc()
-        return None
-
-
 # Helper for resolving problematic note IDs
 def resolve_note_id(note_id):
     """Helper function to resolve problematic note IDs (boolean, temp, etc)"""
@@ -384,6 +365,12 @@ def get_chatbot_response():
     return jsonify(response_data)
 
 
+@app.route("/chatbot_metrics", methods=["GET"])
+def chatbot_metrics():
+    """API endpoint reporting how many chatbot answers were served from the response cache"""
+    return jsonify({"status": "success", "metrics": chatbot.get_cache_stats()})
+
+
 # Medical Notes Routes
 @app.route("/note")
 def note():
@@ -432,7 +419,10 @@ def save_note_route():
 
         # Process the note
         try:
-            if "genai_model" in globals() and genai_model:
+            if isinstance(data.get("summary"), dict):
+                # Already extracted by /stream_extract while the client watched
+                summary = data["summary"]
+            elif "genai_model" in globals() and genai_model:
                 summary = extract_medical_info(note_text, genai_model)
             else:
                 summary = extract_medical_info(note_text)
@@ -440,12 +430,9 @@ def save_note_route():
             if not summary:
                 print("Warning: extract_medical_info returned empty summary")
                 # Create a minimal summary
-                summary = {
-                    "patient_details": {"name": "Unknown Patient"},
-                    "chief_complaints": [],
-                    "symptoms": [],
-                    "allergies": [],
-                }
+                summary = Summary.from_dict(
+                    {"patient_details": {"name": "Unknown Patient"}}
+                ).to_dict()
 
             # NEW: Incorporate imported history if available
             if imported_history:
@@ -543,12 +530,12 @@ def save_note_route():
 
             traceback.print_exc()
             # Create a minimal summary as fallback
-            summary = {
-                "patient_details": {"name": "Unknown Patient"},
-                "chief_complaints": [],
-                "symptoms": [],
-                "allergies": [],
-            }
+            summary = Summary.from_dict(
+                {"patient_details": {"name": "Unknown Patient"}}
+            ).to_dict()
+
+        # Normalize once so the response matches what is stored
+        summary = Summary.from_dict(summary).to_dict()
 
         # Save the generated summary
         summary_saved = save_summary(note_id, summary)
@@ -592,6 +579,31 @@ def save_note_route():
         return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
 
 
+@app.route("/stream_extract", methods=["POST"])
+def stream_extract_route():
+    """API endpoint streaming summary fields as server-sent events while they are extracted"""
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get("note"), str) or not data["note"].strip():
+        return jsonify({"status": "error", "message": "Missing note text in request"}), 400
+
+    note_text = data["note"]
+    model = genai_model if "genai_model" in globals() and genai_model else None
+
+    def generate():
+        try:
+            for event in stream_extract_medical_info(note_text, model):
+                yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            print(f"Error in stream_extract_route: {str(e)}")
+            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/save_edited_note", methods=["POST"])
 def save_edited_note_route():
     """API endpoint to save an edited note"""
@@ -637,11 +649,13 @@ def save_edited_note_route():
                 {"status": "error", "message": "Failed to update note text"}
             ), 500
 
-        # Re-process the note if needed to update summary
-        if "genai_model" in globals() and genai_model:
-            summary = extract_medical_info(edited_text, genai_model)
-        else:
-            summary = extract_medical_info(edited_text)
+        # Re-extract only the sentences that changed and merge into the old summary
+        summary = extract_changed_info(
+            original_note["original"],
+            edited_text,
+            original_note.get("summary"),
+            genai_model if "genai_model" in globals() and genai_model else None,
+        )
 
         # Save the updated summary
         save_summary(note_id, summary, is_edited=True)
@@ -677,6 +691,12 @@ def save_edited_summary_route():
         note_id = data["noteId"]
         edited_summary = data["editedSummary"]
 
+        errors = validate_summary(edited_summary)
+        if errors:
+            return jsonify(
+                {"status": "error", "message": "Invalid summary: " + "; ".join(errors)}
+            ), 400
+
         # Resolve note ID issues
         note_id = resolve_note_id(note_id)
         if note_id is None:
@@ -751,9 +771,21 @@ def fetch_notes():
         return jsonify([])  # Return empty array instead of error
 
 
+@app.route("/extraction_metrics", methods=["GET"])
+def extraction_metrics():
+    """API endpoint reporting how summary fields were routed between regex and AI extraction"""
+    return jsonify({"status": "success", "metrics": get_extraction_metrics()})
+
+
+@app.route("/transcription_metrics", methods=["GET"])
+def transcription_metrics():
+    """API endpoint reporting how much audio voice activity detection removed before recognition"""
+    return jsonify({"status": "success", "metrics": get_vad_stats()})
+
+
 @app.route("/upload_audio", methods=["POST"])
 def upload_audio():
-    """Handle audio file upload, conversion, and transcription"""
+    """Handle audio file upload and queue it for background transcription"""
     if "audio_file" not in request.files:
         return jsonify({"status": "error", "message": "No file part"}), 400
 
@@ -764,45 +796,20 @@ def upload_audio():
 
     if file and allowed_file(file.filename):
         try:
-            # Create a file path in the uploads directory
+            # Buffer the upload in memory (spilling to a temporary file if
+            # large); the job decodes it to PCM and closes the buffer
             filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            original_file_path = os.path.join(
-                app.config["UPLOAD_FOLDER"], f"{timestamp}_{filename}"
-            )
-
-            # Save the original file
-            file.save(original_file_path)
-
-            # Convert to WAV if needed
-            wav_file_path = convert_audio_to_wav(original_file_path)
-
-            if not wav_file_path:
-                return jsonify(
-                    {
-                        "status": "error",
-                        "message": "Failed to convert audio file to WAV format",
-                    }
-                ), 500
-
-            # Transcribe the WAV file
-            transcription = transcribe_audio(wav_file_path)
-
-            # Clean up the original file if it's different from the WAV file
-            if original_file_path != wav_file_path and os.path.exists(
-                original_file_path
-            ):
-                os.remove(original_file_path)
-                print(f"Removed original file after conversion: {original_file_path}")
+            audio_buffer = spool_upload(file.stream)
+            job_id = submit_transcription_job(audio_buffer, filename)
 
             return jsonify(
                 {
                     "status": "success",
-                    "message": "Audio file transcribed successfully",
-                    "transcription": transcription,
-                    "file_path": wav_file_path,
+                    "message": "Audio file queued for transcription",
+                    "job_id": job_id,
+                    "status_url": f"/transcription_jobs/{job_id}",
                 }
-            )
+            ), 202
 
         except Exception as e:
             return jsonify(
@@ -817,6 +824,51 @@ def upload_audio():
         ), 400
 
 
+@app.route("/transcription_jobs/<job_id>", methods=["GET"])
+def transcription_job_status(job_id):
+    """API endpoint to poll a transcription job for progress and new transcript segments"""
+    since = request.args.get("since", 0, type=int)
+    job = get_transcription_job(job_id, since)
+    if job is None:
+        return jsonify({"status": "error", "message": "Transcription job not found"}), 404
+
+    return jsonify({"status": "success", "job": job})
+
+
+if sock is not None:
+
+    @sock.route("/dictation")
+    def dictation_socket(ws):
+        """
+        WebSocket endpoint for live dictation
+
+        The client sends binary messages of 16-bit mono PCM (at the
+        sample_rate query parameter) and the text message "stop" when done.
+        Partial and final transcript segments are sent back as JSON while
+        audio is still arriving, followed by {"type": "done", "text": ...}.
+        """
+        language = request.args.get("language", "en-US")
+        sample_rate = request.args.get("sample_rate", DEFAULT_SAMPLE_RATE, type=int)
+        dictation = DictationSession(language=language, sample_rate=sample_rate)
+        try:
+            while True:
+                data = ws.receive(timeout=0.1)
+                if isinstance(data, (bytes, bytearray)):
+                    dictation.feed(data)
+                elif data == "stop":
+                    break
+                for message in dictation.messages():
+                    ws.send(json.dumps(message))
+
+            for message in dictation.finish():
+                ws.send(json.dumps(message))
+            ws.send(json.dumps({"type": "done", "text": clean_transcription(dictation.text)}))
+        except Exception as e:
+            print(f"Dictation session ended: {str(e)}")
+        finally:
+            dictation.close()
+
+
 @app.route("/delete_note", methods=["POST"])
 def delete_note_route():
     """API endpoint to delete a note"""
@@ -956,15 +1008,12 @@ def generate_follow_up_route():
                 {"status": "error", "message": "Could not resolve note ID"}
             ), 400
 
-        # Generate follow-up actions
+        # Generate follow-up actions (saved to the database as they are generated)
         actions = generate_follow_up_actions(note_id)
 
         if "error" in actions:
             return jsonify({"status": "error", "message": actions["error"]}), 404
 
-        # Save the generated actions to the database
-        save_follow_up_actions(note_id, actions)
-
         return jsonify({"status": "success", "actions": actions})
 
     except Exception as e:
@@ -1008,6 +1057,63 @@ def get_follow_up_route():
         return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
 
 
+@app.route("/follow_ups/due", methods=["GET"])
+def due_follow_ups_route():
+    """API endpoint listing follow-ups due in a date range (default: the next 7 days)"""
+    try:
+        today = datetime.now().date()
+        start = request.args.get("from") or today.isoformat()
+        end = request.args.get("to") or (today + timedelta(days=7)).isoformat()
+        try:
+            start = datetime.strptime(start, "%Y-%m-%d").date().isoformat()
+            end = datetime.strptime(end, "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            return jsonify(
+                {"status": "error", "message": "Dates must be in YYYY-MM-DD format"}
+            ), 400
+
+        urgency = request.args.get("urgency")
+        urgency_levels = [u.strip() for u in urgency.split(",") if u.strip()] if urgency else None
+
+        follow_ups = get_due_follow_ups(start, end, urgency_levels)
+        return jsonify(
+            {"status": "success", "from": start, "to": end, "follow_ups": follow_ups}
+        )
+
+    except Exception as e:
+        print(f"Error in due_follow_ups_route: {str(e)}")
+        return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
+
+
+@app.route("/cohort_efficacy", methods=["GET"])
+def cohort_efficacy_route():
+    """API endpoint with treatment efficacy statistics across all patients"""
+    try:
+        start = request.args.get("from")
+        end = request.args.get("to")
+        try:
+            for value in (start, end):
+                if value:
+                    datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            return jsonify(
+                {"status": "error", "message": "Dates must be in YYYY-MM-DD format"}
+            ), 400
+
+        report = analyze_cohort_efficacy(
+            medication=request.args.get("medication") or None,
+            symptom=request.args.get("symptom") or None,
+            start_date=start or None,
+            end_date=end or None,
+            min_patients=max(1, request.args.get("min_patients", 1, type=int)),
+        )
+        return jsonify({"status": "success", "analysis": report})
+
+    except Exception as e:
+        print(f"Error in cohort_efficacy_route: {str(e)}")
+        return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
+
+
 # Add this route
 @app.route("/analyze_treatment_efficacy", methods=["POST"])
 def analyze_treatment_efficacy_route():
@@ -1232,7 +1338,7 @@ def find_previous_patient_history():
         for row in cursor.fetchall():
             try:
                 if row["summary_data"]:
-                    summary = json.loads(row["summary_data"])
+                    summary = Summary.from_json(row["summary_data"]).to_dict()
 
                     print(
                         f"Checking note {row['id']} with summary keys: {', '.join(summary.keys())}"
@@ -1426,7 +1532,7 @@ def list_all_patients():
         for row in cursor.fetchall():
             try:
                 if row["summary_data"]:
-                    summary = json.loads(row["summary_data"])
+                    summary = Summary.from_json(row["summary_data"]).to_dict()
 
                     patient_name = "Unknown"
                     patient_age = "Unknown"
@@ -1481,7 +1587,7 @@ def check_specific_patient(patient_name):
         for row in cursor.fetchall():
             try:
                 if row["summary_data"]:
-                    summary = json.loads(row["summary_data"])
+                    summary = Summary.from_json(row["summary_data"]).to_dict()
 
                     record_patient_name = None
                     if "patient_details" in summary and summary["patient_details"]:
@@ -1540,5 +1646,23 @@ def check_specific_patient(patient_name):
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+# Command line tools
+@app.cli.command("reprocess-notes")
+@click.option("--all", "include_existing", is_flag=True, help="Also regenerate unedited summaries")
+@click.option("--workers", type=int, default=None, help="Number of worker processes")
+@click.option("--chunk-size", type=int, default=None, help="Notes sent to a worker at once")
+def reprocess_notes_command(include_existing, workers, chunk_size):
+    """Extract summaries for stored notes using a process pool"""
+    reprocess_notes(include_existing, workers, chunk_size)
+
+
+@app.cli.command("generate-follow-ups")
+@click.option("--note-id", "note_ids", type=int, multiple=True, help="Note to process (repeatable; defaults to all notes)")
+def generate_follow_ups_command(note_ids):
+    """Generate follow-up actions for stored notes and save them in one transaction"""
+    saved = generate_follow_up_actions_batch(list(note_ids) or None)
+    print(f"Saved follow-up actions for {saved} notes")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,433 @@
+"""
+Extraction benchmark for Health Companion app
+
+Runs the note pipeline over every record in notes.txt and reports, for each
+stage, latency percentiles, throughput and peak memory, plus field-level
+accuracy of the regex extraction against a hand-curated golden file.
+
+Stages:
+    basic_extraction, clean_extracted_info, extract_with_ai (against a
+    deterministic local fake model), generate_follow_up_actions and
+    analyze_treatment_efficacy
+
+The database stages run against a throwaway SQLite file in a temporary
+directory, so the app's medical_notes.db is never touched.
+
+The golden file maps each distinct note (by hash) to the fields a reader
+expects from it. List fields hold one entry per expected item, each a list of
+accepted spellings; an extracted item is correct when it contains one of
+them. The fake model only exercises the AI code path for timing, so its
+output is not scored.
+
+Usage (from the repository root):
+    python benchmarks/extraction_benchmark.py
+    python benchmarks/extraction_benchmark.py --output results.json
+    python benchmarks/extraction_benchmark.py --baseline results.json
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from models import database  # noqa: E402
+from models.follow_up import generate_follow_up_actions  # noqa: E402
+from models.notes_processor import (  # noqa: E402
+    basic_extraction,
+    clean_extracted_info,
+    extract_with_ai,
+)
+from models.summary import SUMMARY_FIELDS  # noqa: E402
+from models.treatment_efficacy import analyze_treatment_efficacy  # noqa: E402
+
+DEFAULT_NOTES_PATH = os.path.join(REPO_ROOT, "notes.txt")
+DEFAULT_GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_summaries.json")
+
+# A stage is flagged when its median latency grows by more than this factor
+DEFAULT_MAX_SLOWDOWN = 1.25
+
+NOTE_IN_PROMPT_PATTERN = re.compile(r'Medical Note: "(.*)"\s*\n\s*Output Format', re.DOTALL)
+
+
+class FakeResponse:
+    """Minimal stand-in for a Gemini response object"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """
+    Deterministic local replacement for the Gemini model
+
+    Answers an extraction prompt with the regex extraction of the note it
+    contains, wrapped in a code fence like the real model does.
+    """
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000.0
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        match = NOTE_IN_PROMPT_PATTERN.search(prompt)
+        text = match.group(1) if match else ""
+        summary = clean_extracted_info(basic_extraction(text))
+
+        body = "```json\n" + json.dumps(summary, indent=2) + "\n```"
+        if stream:
+            return [FakeResponse(body[i:i + 64]) for i in range(0, len(body), 64)]
+        return FakeResponse(body)
+
+
+def note_key(text):
+    """Stable key identifying a note's text in the golden file"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def load_notes(path):
+    """
+    Split notes.txt into individual note records
+
+    Args:
+        path (str): Path to the notes file ("---" separated, like import_existing_notes)
+
+    Returns:
+        list: Note texts
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        content = f.read()
+    return [note.strip() for note in content.split("---\n") if note.strip()]
+
+
+def load_golden(path):
+    """Load the curated expectations keyed by note hash (empty if missing)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_timings(timings):
+    """
+    Turn per-item timings (seconds) into the reported statistics
+
+    Args:
+        timings (list): Duration of each call in seconds
+
+    Returns:
+        dict: count, total, throughput and p50/p90/p99/max in milliseconds
+    """
+    total = sum(timings)
+    return {
+        "count": len(timings),
+        "total_s": round(total, 4),
+        "throughput_per_s": round(len(timings) / total, 1) if total else 0.0,
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p90_ms": round(percentile(timings, 90) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3) if timings else 0.0,
+    }
+
+
+def run_stage(func, items, repeat=1, quiet=True):
+    """
+    Time a stage over every item, then measure its peak memory in a separate pass
+
+    Memory is traced separately because tracemalloc slows down every
+    allocation and would distort the latency numbers.
+
+    Args:
+        func (callable): Called with each item
+        items (list): Stage inputs
+        repeat (int): Number of timed passes over the items
+        quiet (bool): Silence the print logging of the code under test
+
+    Returns:
+        tuple: (stats dict, results of the last pass)
+    """
+    sink = io.StringIO() if quiet else None
+    timings = []
+    results = []
+
+    with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+        for _ in range(repeat):
+            results = []
+            for item in items:
+                start = time.perf_counter()
+                results.append(func(item))
+                timings.append(time.perf_counter() - start)
+                if sink is not None:
+                    sink.seek(0)
+                    sink.truncate()
+
+        tracemalloc.start()
+        for item in items:
+            func(item)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    stats = summarize_timings(timings)
+    stats["peak_memory_kb"] = round(peak / 1024, 1)
+    return stats, results
+
+
+def item_matches(value, accepted):
+    """Whether an extracted value contains one of the accepted spellings"""
+    value = str(value).lower()
+    return any(spelling.lower() in value for spelling in accepted)
+
+
+def field_correct(field, value, expected):
+    """
+    Check one extracted field against its curated expectation
+
+    Patient details must equal the expected values (case-insensitive, None
+    for details the note does not give). A list field is correct when every
+    expected item was extracted and every extracted item is an expected one.
+
+    Args:
+        field (str): Summary field name
+        value: Extracted value
+        expected: Curated value from the golden file
+
+    Returns:
+        bool
+    """
+    if field == "patient_details":
+        value = value or {}
+        return all(
+            (str(value.get(key)).strip().lower() if value.get(key) else None)
+            == (wanted.lower() if wanted else None)
+            for key, wanted in expected.items()
+        )
+
+    items = [item.get("habit") if isinstance(item, dict) else item for item in value or []]
+    return (
+        all(any(item_matches(item, accepted) for item in items) for accepted in expected)
+        and all(any(item_matches(item, accepted) for accepted in expected) for item in items)
+    )
+
+
+def field_accuracy(notes, summaries, golden):
+    """
+    Score extracted summaries against the golden file, field by field
+
+    Args:
+        notes (list): Note texts
+        summaries (list): Extracted summaries, aligned with notes
+        golden (dict): Curated expectations keyed by note hash
+
+    Returns:
+        dict: Per-field accuracy over the notes curating that field, the
+            overall (mean) accuracy and the number of notes scored
+    """
+    correct = {}
+    scored = {}
+    compared = 0
+
+    for text, summary in zip(notes, summaries):
+        entry = golden.get(note_key(text))
+        if not entry:
+            continue
+        compared += 1
+        for field, expected in entry["expected"].items():
+            scored[field] = scored.get(field, 0) + 1
+            if field_correct(field, summary.get(field), expected):
+                correct[field] = correct.get(field, 0) + 1
+
+    fields = {
+        field: round(correct.get(field, 0) / scored[field], 4)
+        for field in SUMMARY_FIELDS if field in scored
+    }
+    overall = sum(fields.values()) / len(fields) if fields else 0.0
+    return {"notes_compared": compared, "overall": round(overall, 4), "fields": fields}
+
+
+def seed_database(notes, summaries):
+    """
+    Store the notes and their summaries in the (temporary) database
+
+    Returns:
+        list: Note IDs, aligned with notes
+    """
+    database.init_db()
+    note_ids = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for text, summary in zip(notes, summaries):
+            note_id = database.save_note(text)
+            database.save_summary(note_id, summary)
+            note_ids.append(note_id)
+    return note_ids
+
+
+def run_benchmark(notes, golden, repeat=1, fake_latency_ms=0, quiet=True):
+    """
+    Run every stage over the notes
+
+    Args:
+        notes (list): Note texts
+        golden (dict): Curated expectations keyed by note hash
+        repeat (int): Timed passes per stage
+        fake_latency_ms (int): Simulated model latency per call
+        quiet (bool): Silence the print logging of the code under test
+
+    Returns:
+        dict: Benchmark report
+    """
+    report = {"notes": len(notes), "repeat": repeat, "stages": {}}
+    stages = report["stages"]
+
+    stages["basic_extraction"], raw = run_stage(basic_extraction, notes, repeat, quiet)
+    stages["clean_extracted_info"], summaries = run_stage(clean_extracted_info, raw, repeat, quiet)
+
+    model = FakeModel(fake_latency_ms)
+    stages["extract_with_ai"], _ = run_stage(
+        lambda text: extract_with_ai(text, model), notes, repeat, quiet
+    )
+
+    report["accuracy"] = field_accuracy(notes, summaries, golden)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # DB_PATH is relative, so the database stages use a file in workdir
+        os.chdir(workdir)
+        try:
+            note_ids = seed_database(notes, summaries)
+            stages["generate_follow_up_actions"], _ = run_stage(
+                generate_follow_up_actions, note_ids, repeat, quiet
+            )
+
+            patients = sorted({
+                s["patient_details"]["name"] for s in summaries if s["patient_details"]["name"]
+            })
+            stages["analyze_treatment_efficacy"], _ = run_stage(
+                analyze_treatment_efficacy, patients, repeat, quiet
+            )
+        finally:
+            os.chdir(cwd)
+
+    return report
+
+
+def compare_with_baseline(report, baseline, max_slowdown=DEFAULT_MAX_SLOWDOWN):
+    """
+    Find stages whose median latency or accuracy regressed against a saved run
+
+    Args:
+        report (dict): Current benchmark report
+        baseline (dict): Report loaded from an earlier --output file
+        max_slowdown (float): Allowed growth factor of p50 latency
+
+    Returns:
+        list: Descriptions of the regressions (empty if none)
+    """
+    regressions = []
+
+    for stage, stats in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or not previous.get("p50_ms"):
+            continue
+        ratio = stats["p50_ms"] / previous["p50_ms"]
+        if ratio > max_slowdown:
+            regressions.append(
+                f"{stage}: p50 {previous['p50_ms']}ms -> {stats['p50_ms']}ms ({ratio:.2f}x)"
+            )
+
+    previous = baseline.get("accuracy")
+    accuracy = report["accuracy"]
+    if previous and accuracy["notes_compared"] and accuracy["overall"] < previous["overall"]:
+        regressions.append(f"accuracy: {previous['overall']:.2%} -> {accuracy['overall']:.2%}")
+
+    return regressions
+
+
+def print_report(report):
+    """Print the benchmark report as a table"""
+    print(f"\nNotes: {report['notes']}  (passes per stage: {report['repeat']})\n")
+    header = f"{'stage':<28}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'per s':>10}{'peak KB':>10}"
+    print(header)
+    print("-" * len(header))
+    for stage, s in report["stages"].items():
+        print(
+            f"{stage:<28}{s['count']:>7}{s['p50_ms']:>10}{s['p90_ms']:>10}{s['p99_ms']:>10}"
+            f"{s['max_ms']:>10}{s['throughput_per_s']:>10}{s['peak_memory_kb']:>10}"
+        )
+
+    accuracy = report["accuracy"]
+    if accuracy["notes_compared"]:
+        print(f"\nRegex extraction accuracy against golden file ({accuracy['notes_compared']} notes): "
+              f"{accuracy['overall']:.2%}")
+        for field, rate in accuracy["fields"].items():
+            print(f"  {field:<26}{rate:.2%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark note extraction over notes.txt")
+    parser.add_argument("--notes", default=DEFAULT_NOTES_PATH, help="notes file to benchmark")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN_PATH, help="curated golden summaries file")
+    parser.add_argument("--repeat", type=int, default=1, help="timed passes per stage")
+    parser.add_argument("--fake-latency-ms", type=int, default=0,
+                        help="simulated latency of each fake model call")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--baseline", help="fail if results regressed against this saved report")
+    parser.add_argument("--max-slowdown", type=float, default=DEFAULT_MAX_SLOWDOWN,
+                        help="allowed p50 growth factor against the baseline")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own log output")
+    args = parser.parse_args(argv)
+
+    notes = load_notes(args.notes)
+    if not notes:
+        print(f"No notes found in {args.notes}")
+        return 1
+
+    golden = load_golden(args.golden)
+    if not golden:
+        print(f"Golden file {args.golden} not found, accuracy will not be measured")
+
+    report = run_benchmark(notes, golden, args.repeat, args.fake_latency_ms, quiet=not args.verbose)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.max_slowdown)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Severity extraction benchmark for Health Companion app
+
+Builds long notes by joining consecutive records from notes.txt (the length
+of a long dictated transcript) and times symptom severity extraction on
+them: the original whole-note patterns against models.severity, which
+searches only the sentences naming the symptom with bounded patterns. Each
+note is asked about the symptoms extracted from it plus a few it does not
+mention, since a missing symptom is the slow case for whole-note patterns.
+
+Usage (from the repository root):
+    python benchmarks/severity_benchmark.py
+    python benchmarks/severity_benchmark.py --notes-per-document 50 --output severity.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from extraction_benchmark import DEFAULT_NOTES_PATH, load_notes, run_stage  # noqa: E402
+from models.notes_processor import basic_extraction  # noqa: E402
+from models.severity import extract_severity  # noqa: E402
+
+# Symptoms asked about that the notes are unlikely to mention
+ABSENT_SYMPTOMS = ["tinnitus", "photophobia", "hemoptysis"]
+
+
+def legacy_severity(note_text, symptom):
+    """Severity lookup as it was done before models.severity (unescaped, unbounded)"""
+    patterns = [
+        rf"{symptom}.*?(mild|moderate|severe|extreme)",
+        rf"{symptom}.*?(\d+)/10",
+        rf"{symptom}.*?intensity of (\d+)",
+        rf"{symptom}.*?(?:rated|scale|score)[^\d]*(\d+)",
+        rf"(mild|moderate|severe|extreme).*?{symptom}",
+    ]
+    for pattern in patterns:
+        try:
+            match = re.search(pattern, note_text, re.IGNORECASE)
+            if match:
+                return match.group(1).lower()
+        except re.error:
+            continue
+    return None
+
+
+def build_documents(notes, notes_per_document):
+    """
+    Join consecutive notes into long documents with the symptoms to look up
+
+    Args:
+        notes (list): Note texts
+        notes_per_document (int): Notes joined into each document
+
+    Returns:
+        list: (document text, symptoms) tuples
+    """
+    documents = []
+    for start in range(0, len(notes), notes_per_document):
+        group = notes[start:start + notes_per_document]
+        symptoms = []
+        for text in group:
+            for symptom in basic_extraction(text).get("symptoms") or []:
+                if symptom not in symptoms:
+                    symptoms.append(symptom)
+        documents.append(("\n\n".join(group), symptoms + ABSENT_SYMPTOMS))
+    return documents
+
+
+def run_severity_benchmark(documents, repeat=1):
+    """
+    Time both implementations over every (document, symptom) pair
+
+    Args:
+        documents (list): Output of build_documents
+        repeat (int): Number of timed passes
+
+    Returns:
+        dict: Per-implementation stats, document sizes and label agreement
+    """
+    pairs = [(text, symptom) for text, symptoms in documents for symptom in symptoms]
+
+    legacy_stats, legacy_labels = run_stage(lambda pair: legacy_severity(*pair), pairs, repeat)
+    stats, results = run_stage(lambda pair: extract_severity(*pair), pairs, repeat)
+    labels = [result["label"] if result else None for result in results]
+
+    found = [i for i, label in enumerate(legacy_labels) if label is not None]
+    return {
+        "documents": len(documents),
+        "lookups": len(pairs),
+        "mean_document_chars": round(sum(len(text) for text, _ in documents) / max(1, len(documents))),
+        "stages": {"legacy_whole_note": legacy_stats, "sentence_scoped": stats},
+        "found": {
+            "legacy_whole_note": len(found),
+            "sentence_scoped": sum(1 for label in labels if label is not None),
+        },
+        # Share of the legacy hits that the sentence-scoped extractor labels the same way
+        "agreement_with_legacy": round(
+            sum(1 for i in found if labels[i] == legacy_labels[i]) / len(found), 3
+        ) if found else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark symptom severity extraction on long notes")
+    parser.add_argument("--notes", default=DEFAULT_NOTES_PATH, help="Path to notes.txt")
+    parser.add_argument("--notes-per-document", type=int, default=20, help="Notes joined into each long note")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed passes over the lookups")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    documents = build_documents(load_notes(args.notes), max(1, args.notes_per_document))
+    report = run_severity_benchmark(documents, args.repeat)
+
+    print(
+        f"{report['lookups']} lookups over {report['documents']} documents "
+        f"(~{report['mean_document_chars']} chars each)"
+    )
+    for name, stats in report["stages"].items():
+        print(
+            f"  {name:<20} p50 {stats['p50_ms']:>9.3f} ms  p99 {stats['p99_ms']:>9.3f} ms  "
+            f"total {stats['total_s']:>8.3f} s  found {report['found'][name]}"
+        )
+    print(f"  agreement with legacy: {report['agreement_with_legacy']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
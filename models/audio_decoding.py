@@ -0,0 +1,182 @@
+"""
+Audio Decoding module for Health Companion app
+
+Decodes uploaded recordings straight to 16 kHz mono 16-bit PCM in memory.
+Uploads are buffered in memory and only spill to an anonymous temporary
+file when they are very large; nothing is written to the uploads folder
+and every buffer is removed when it is closed.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+
+from pydub import AudioSegment
+from pydub.utils import which
+
+# Format the recognizers expect
+PCM_SAMPLE_RATE = 16000
+PCM_SAMPLE_WIDTH = 2
+PCM_CHANNELS = 1
+
+# Uploads larger than this are buffered on disk instead of in memory
+SPILL_THRESHOLD_BYTES = 8 * 1024 * 1024
+
+# Block size used when copying an upload into its buffer
+COPY_BLOCK_BYTES = 64 * 1024
+
+# Containers ffmpeg cannot decode from a pipe (their index may be at the end)
+SEEKABLE_FORMATS = {"m4a", "mp4", "mov", "3gp"}
+
+
+def spool_upload(stream, threshold=SPILL_THRESHOLD_BYTES):
+    """
+    Copy an upload stream into a buffer that spills to disk when large
+
+    Args:
+        stream: Readable binary stream (e.g. werkzeug FileStorage.stream)
+        threshold (int): Size in bytes above which the buffer moves to disk
+
+    Returns:
+        SpooledTemporaryFile: Buffer positioned at the start; close it to
+            release the memory or delete the spilled file
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=threshold)
+    try:
+        shutil.copyfileobj(stream, buffer, COPY_BLOCK_BYTES)
+        buffer.seek(0)
+    except Exception:
+        buffer.close()
+        raise
+    return buffer
+
+
+def is_on_disk(fileobj):
+    """Whether a file object is backed by a real file descriptor"""
+    if isinstance(fileobj, tempfile.SpooledTemporaryFile):
+        # fileno() would force an in-memory buffer onto disk
+        return fileobj._rolled
+    try:
+        fileobj.fileno()
+        return True
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def to_pcm(audio):
+    """Convert an AudioSegment to 16 kHz mono 16-bit PCM"""
+    return (
+        audio.set_channels(PCM_CHANNELS)
+        .set_sample_width(PCM_SAMPLE_WIDTH)
+        .set_frame_rate(PCM_SAMPLE_RATE)
+    )
+
+
+def decode_wav(fileobj):
+    """
+    Decode PCM WAV data from a file object without ffmpeg
+
+    Args:
+        fileobj: Readable binary file object positioned at the start
+
+    Returns:
+        AudioSegment: 16 kHz mono 16-bit audio
+    """
+    with wave.open(fileobj, "rb") as wav:
+        audio = AudioSegment(
+            data=wav.readframes(wav.getnframes()),
+            sample_width=wav.getsampwidth(),
+            frame_rate=wav.getframerate(),
+            channels=wav.getnchannels(),
+        )
+    return to_pcm(audio)
+
+
+def decode_with_ffmpeg(fileobj, audio_format):
+    """
+    Decode compressed audio by piping it through ffmpeg
+
+    Args:
+        fileobj: Readable binary file object positioned at the start
+        audio_format (str): File extension such as "mp3"
+
+    Returns:
+        AudioSegment: 16 kHz mono 16-bit audio
+    """
+    ffmpeg = which("ffmpeg") or which("avconv")
+    if not ffmpeg:
+        raise RuntimeError(f"ffmpeg is required to decode {audio_format} audio. Upload a WAV file or install ffmpeg.")
+
+    output_args = [
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ac", str(PCM_CHANNELS), "-ar", str(PCM_SAMPLE_RATE), "pipe:1",
+    ]
+
+    if audio_format in SEEKABLE_FORMATS:
+        # ffmpeg needs a seekable input for these containers
+        with tempfile.NamedTemporaryFile(suffix="." + audio_format) as seekable:
+            shutil.copyfileobj(fileobj, seekable, COPY_BLOCK_BYTES)
+            seekable.flush()
+            result = subprocess.run(
+                [ffmpeg, "-hide_banner", "-loglevel", "error", "-i", seekable.name] + output_args,
+                stdin=subprocess.DEVNULL, capture_output=True,
+            )
+    else:
+        command = [ffmpeg, "-hide_banner", "-loglevel", "error", "-i", "pipe:0"] + output_args
+        if is_on_disk(fileobj):
+            # A real file can be handed to ffmpeg without reading it into memory
+            result = subprocess.run(command, stdin=fileobj, capture_output=True)
+        else:
+            result = subprocess.run(command, input=fileobj.read(), capture_output=True)
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not decode {audio_format} audio: {result.stderr.decode(errors='replace').strip()}")
+
+    return AudioSegment(
+        data=result.stdout, sample_width=PCM_SAMPLE_WIDTH,
+        frame_rate=PCM_SAMPLE_RATE, channels=PCM_CHANNELS,
+    )
+
+
+def decode_audio(fileobj, audio_format):
+    """
+    Decode an audio file object to 16 kHz mono 16-bit PCM
+
+    WAV files are read directly; other formats go through ffmpeg. A WAV
+    file the wave module cannot read (e.g. float samples) is retried with
+    ffmpeg.
+
+    Args:
+        fileobj: Readable binary file object positioned at the start
+        audio_format (str): File extension, with or without the dot
+
+    Returns:
+        AudioSegment: 16 kHz mono 16-bit audio
+    """
+    audio_format = audio_format.lower().lstrip(".")
+    if audio_format == "aif":
+        audio_format = "aiff"
+
+    if audio_format == "wav":
+        try:
+            return decode_wav(fileobj)
+        except (wave.Error, EOFError) as e:
+            print(f"WAV decode failed ({e}), retrying with ffmpeg")
+            fileobj.seek(0)
+
+    return decode_with_ffmpeg(fileobj, audio_format)
+
+
+def decode_audio_file(file_path):
+    """
+    Decode an audio file on disk to 16 kHz mono 16-bit PCM
+
+    Args:
+        file_path (str): Path to the audio file
+
+    Returns:
+        AudioSegment
+    """
+    with open(file_path, "rb") as f:
+        return decode_audio(f, os.path.splitext(file_path)[1])
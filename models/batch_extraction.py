@@ -0,0 +1,108 @@
+"""
+Batch Extraction module for Health Companion app
+
+Runs the regex extractor over many notes in parallel using a process pool.
+The extraction patterns are compiled at import time in notes_processor, so
+each worker process compiles them once and reuses them for every note it
+handles.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .notes_processor import basic_extraction, clean_extracted_info
+from .database import get_notes_for_reprocessing, save_summaries
+
+# Below this many notes the process pool costs more than it saves
+MIN_PARALLEL_NOTES = 64
+
+# Upper bound on the number of notes sent to a worker at once
+MAX_CHUNK_SIZE = 500
+
+
+def extract_chunk(texts):
+    """
+    Run basic extraction over a chunk of notes (executed inside a worker)
+
+    Args:
+        texts (list): Note texts
+
+    Returns:
+        list: Cleaned summaries in the same order as the input
+    """
+    return [clean_extracted_info(basic_extraction(text)) for text in texts]
+
+
+def chunk_texts(texts, chunk_size):
+    """
+    Split a list of notes into consecutive chunks
+
+    Args:
+        texts (list): Note texts
+        chunk_size (int): Number of notes per chunk
+
+    Returns:
+        list: List of note chunks, in order
+    """
+    return [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+
+def extract_notes_parallel(texts, workers=None, chunk_size=None):
+    """
+    Extract medical information from many notes using a process pool
+
+    Notes are distributed to workers in chunks to keep inter-process
+    overhead low, and results are returned in the order of the input.
+
+    Args:
+        texts (list): Note texts
+        workers (int): Number of worker processes (defaults to CPU count)
+        chunk_size (int): Notes per chunk (defaults to ~4 chunks per worker)
+
+    Returns:
+        list: Cleaned summaries, one per input note
+    """
+    texts = list(texts)
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(texts) < MIN_PARALLEL_NOTES:
+        return extract_chunk(texts)
+
+    if not chunk_size:
+        chunk_size = -(-len(texts) // (workers * 4))
+    chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # executor.map yields chunk results in submission order
+        for chunk_result in executor.map(extract_chunk, chunk_texts(texts, chunk_size)):
+            results.extend(chunk_result)
+
+    return results
+
+
+def reprocess_notes(include_existing=False, workers=None, chunk_size=None):
+    """
+    Regenerate summaries for stored notes with the parallel extractor
+
+    Notes with summaries edited by a doctor are never overwritten.
+
+    Args:
+        include_existing (bool): Also regenerate unedited existing summaries
+            (by default only notes without a summary are processed)
+        workers (int): Number of worker processes
+        chunk_size (int): Notes per chunk
+
+    Returns:
+        int: Number of summaries written
+    """
+    rows = get_notes_for_reprocessing(include_existing)
+    if not rows:
+        print("No notes to reprocess")
+        return 0
+
+    note_ids = [row[0] for row in rows]
+    summaries = extract_notes_parallel([row[1] for row in rows], workers, chunk_size)
+
+    saved = save_summaries(list(zip(note_ids, summaries)))
+    print(f"Reprocessed {saved} of {len(rows)} notes")
+    return saved
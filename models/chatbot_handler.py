@@ -1,23 +1,75 @@
 """
 Chatbot Handler module for Health Companion app
+
+AI answers are cached by normalized question, so common questions ("how to
+sleep better") are answered without calling the model again until the entry
+expires. Identical questions arriving while the model is still answering
+wait for that one call instead of making their own.
 """
+import os
 import re
 import json
+import threading
+import time
+from collections import OrderedDict
+
+# Cached AI answers expire after this many seconds
+CHATBOT_CACHE_TTL_SECONDS = int(os.environ.get("CHATBOT_CACHE_TTL_SECONDS", 3600))
+
+# Number of distinct questions whose answers are kept
+CHATBOT_CACHE_SIZE = int(os.environ.get("CHATBOT_CACHE_SIZE", 512))
+
+# Seconds a question waits for an identical model call in progress before
+# asking the model itself
+CHATBOT_FLIGHT_WAIT_SECONDS = float(os.environ.get("CHATBOT_FLIGHT_WAIT_SECONDS", 60))
+
+QUESTION_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+
+
+def normalize_question(user_message):
+    """
+    Cache key for a question: lowercase words without punctuation
+
+    Args:
+        user_message (str): User's message
+
+    Returns:
+        str: Normalized question ("How to sleep better?" -> "how to sleep better")
+    """
+    return " ".join(QUESTION_PUNCTUATION_PATTERN.sub(" ", (user_message or "").lower()).split())
+
+
+class _Flight:
+    """A model call in progress that identical questions wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
 
 class ChatbotHandler:
     """
     Handler for health chatbot interactions
     """
     
-    def __init__(self, ai_model=None):
+    def __init__(self, ai_model=None, cache_ttl=CHATBOT_CACHE_TTL_SECONDS, cache_size=CHATBOT_CACHE_SIZE):
         """
         Initialize the chatbot handler
         
         Args:
             ai_model: Optional AI model for advanced responses (e.g., Gemini)
+            cache_ttl (int): Seconds an AI answer is reused (0 disables the cache)
+            cache_size (int): Number of distinct questions kept
         """
         self.ai_model = ai_model
         self.system_prompt = self._get_system_prompt()
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+
+        self._cache_lock = threading.Lock()
+        self._cache = OrderedDict()  # question -> (expires_at, response)
+        self._in_flight = {}  # question -> _Flight
+        self._cache_stats = {"requests": 0, "hits": 0, "coalesced": 0, "misses": 0, "model_calls": 0, "model_errors": 0}
         
     def _get_system_prompt(self):
         """
@@ -54,7 +106,7 @@ class ChatbotHandler:
         try:
             # Use AI model if available
             if self.ai_model:
-                return self._get_ai_response(user_message)
+                return self._get_cached_ai_response(user_message)
             else:
                 # Fallback to rule-based responses
                 return self._get_rule_based_response(user_message)
@@ -65,6 +117,103 @@ class ChatbotHandler:
                 'isHtml': True
             }
     
+    def _get_cached_ai_response(self, user_message):
+        """
+        Answer from the cache, from an identical call in progress, or from the model
+
+        Args:
+            user_message (str): User's message
+
+        Returns:
+            dict: Response with text and HTML flag
+        """
+        key = normalize_question(user_message)
+        if not key or self.cache_ttl <= 0:
+            return self._call_ai_model(user_message)[0]
+
+        with self._cache_lock:
+            self._cache_stats["requests"] += 1
+            entry = self._cache.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._cache.move_to_end(key)
+                    self._cache_stats["hits"] += 1
+                    return dict(entry[1])
+                del self._cache[key]
+
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                self._cache_stats["misses"] += 1
+            else:
+                self._cache_stats["coalesced"] += 1
+
+        if not leader:
+            # Someone is already asking the model the same question; if that
+            # call hangs or dies, ask the model directly
+            if flight.done.wait(CHATBOT_FLIGHT_WAIT_SECONDS) and flight.response is not None:
+                return dict(flight.response)
+            return self._call_ai_model(user_message)[0]
+
+        response, ok = None, False
+        try:
+            # _call_ai_model turns every model error into an error response
+            response, ok = self._call_ai_model(user_message)
+        except BaseException as e:
+            response = self._ai_error_response(e)
+            raise
+        finally:
+            # Cache the answer and retire the call in one step, so an identical
+            # question arriving now finds one or the other. This runs even if
+            # the call raised, so waiters are never left blocked.
+            with self._cache_lock:
+                if ok:
+                    self._cache[key] = (time.monotonic() + self.cache_ttl, dict(response))
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                self._in_flight.pop(key, None)
+
+            flight.response = response
+            flight.done.set()
+
+        return dict(response)
+
+    def _call_ai_model(self, user_message):
+        """Ask the model; returns (response, True) or an error response and False"""
+        with self._cache_lock:
+            self._cache_stats["model_calls"] += 1
+        try:
+            return self._get_ai_response(user_message), True
+        except Exception as e:
+            with self._cache_lock:
+                self._cache_stats["model_errors"] += 1
+            return self._ai_error_response(e), False
+
+    def get_cache_stats(self):
+        """
+        Get counters describing how often AI answers came from the cache
+
+        Returns:
+            dict: requests, hits, coalesced (served by an identical call in
+                progress), misses, model_calls, model_errors, hit_rate and
+                the current cache size
+        """
+        with self._cache_lock:
+            stats = dict(self._cache_stats)
+            stats["cached_questions"] = len(self._cache)
+
+        served = stats["hits"] + stats["coalesced"]
+        stats["hit_rate"] = round(served / stats["requests"], 4) if stats["requests"] else 0.0
+        stats["ttl_seconds"] = self.cache_ttl
+        return stats
+
+    def clear_cache(self):
+        """Forget every cached AI answer"""
+        with self._cache_lock:
+            self._cache.clear()
+
     def _get_ai_response(self, user_message):
         """
         Generate response using AI model
@@ -74,69 +223,81 @@ class ChatbotHandler:
             
         Returns:
             dict: Response with text and HTML flag
+
+        Raises:
+            Exception: If the model call fails (see _ai_error_response)
         """
-        try:
-            # Combine prompts for AI model
-            combined_prompt = f"{self.system_prompt}\n\nUser: {user_message}\n\nPlease format your response with proper HTML."
-            
-            # Generate AI response
-            response = self.ai_model.generate_content(combined_prompt)
-            
-            # Process AI response text
-            chatbot_reply = response.text
-            
-            # Check if the model wrapped the response in code blocks and remove them
-            chatbot_reply = re.sub(r'```html|```', '', chatbot_reply)
+        # Combine prompts for AI model
+        combined_prompt = f"{self.system_prompt}\n\nUser: {user_message}\n\nPlease format your response with proper HTML."
+        
+        # Generate AI response
+        response = self.ai_model.generate_content(combined_prompt)
+        
+        # Process AI response text
+        chatbot_reply = response.text
+        
+        # Check if the model wrapped the response in code blocks and remove them
+        chatbot_reply = re.sub(r'```html|```', '', chatbot_reply)
+        
+        # Ensure it contains HTML formatting
+        if '<p>' not in chatbot_reply and '<li>' not in chatbot_reply:
+            # If there's no HTML, add basic formatting
+            paragraphs = chatbot_reply.split('\n\n')
+            formatted_reply = ""
             
-            # Ensure it contains HTML formatting
-            if '<p>' not in chatbot_reply and '<li>' not in chatbot_reply:
-                # If there's no HTML, add basic formatting
-                paragraphs = chatbot_reply.split('\n\n')
-                formatted_reply = ""
-                
-                for para in paragraphs:
-                    if not para.strip():
-                        continue
-                    
-                    # Check if this paragraph is a list (starts with * or -)
-                    if re.search(r'^\s*[\*\-]', para, re.MULTILINE):
-                        # Convert to HTML list
-                        items = re.split(r'\s*[\*\-]\s+', para)
-                        formatted_reply += '<ul>'
-                        for item in items:
-                            if item.strip():
-                                formatted_reply += f'<li>{item.strip()}</li>'
-                        formatted_reply += '</ul>'
-                    else:
-                        # Regular paragraph
-                        formatted_reply += f'<p>{para}</p>'
+            for para in paragraphs:
+                if not para.strip():
+                    continue
                 
-                chatbot_reply = formatted_reply if formatted_reply else f'<p>{chatbot_reply}</p>'
-            
-            # Format keywords with bold
-            health_keywords = ['Rest', 'Hydration', 'Diet', 'Exercise', 'Sleep', 'Water', 'Medication']
-            for keyword in health_keywords:
-                chatbot_reply = re.sub(fr'\b{keyword}\b', f'<b>{keyword}</b>', chatbot_reply)
-            
-            return {
-                'response': chatbot_reply,
-                'isHtml': True
-            }
-            
-        except Exception as e:
-            error_msg = str(e)
-            
-            # Give a more user-friendly error for quota issues
-            if "429" in error_msg or "quota" in error_msg.lower():
-                return {
-                    'response': '<p>I\'m currently experiencing high demand. Please try again in a few minutes.</p>',
-                    'isHtml': True
-                }
+                # Check if this paragraph is a list (starts with * or -)
+                if re.search(r'^\s*[\*\-]', para, re.MULTILINE):
+                    # Convert to HTML list
+                    items = re.split(r'\s*[\*\-]\s+', para)
+                    formatted_reply += '<ul>'
+                    for item in items:
+                        if item.strip():
+                            formatted_reply += f'<li>{item.strip()}</li>'
+                    formatted_reply += '</ul>'
+                else:
+                    # Regular paragraph
+                    formatted_reply += f'<p>{para}</p>'
             
+            chatbot_reply = formatted_reply if formatted_reply else f'<p>{chatbot_reply}</p>'
+        
+        # Format keywords with bold
+        health_keywords = ['Rest', 'Hydration', 'Diet', 'Exercise', 'Sleep', 'Water', 'Medication']
+        for keyword in health_keywords:
+            chatbot_reply = re.sub(fr'\b{keyword}\b', f'<b>{keyword}</b>', chatbot_reply)
+        
+        return {
+            'response': chatbot_reply,
+            'isHtml': True
+        }
+        
+    def _ai_error_response(self, error):
+        """
+        Response shown when the model call fails
+
+        Args:
+            error (Exception): The error raised by the model
+
+        Returns:
+            dict: Response with text and HTML flag
+        """
+        error_msg = str(error)
+        print(f"Error getting AI chatbot response: {error_msg}")
+
+        # Give a more user-friendly error for quota issues
+        if "429" in error_msg or "quota" in error_msg.lower():
             return {
-                'response': f"<p>Sorry, I couldn't process that right now. Please try again later.</p>",
+                'response': '<p>I\'m currently experiencing high demand. Please try again in a few minutes.</p>',
                 'isHtml': True
             }
+
+        return {
+            'response': "<p>Sorry, I couldn't process that right now. Please try again later.</p>",
+            'isHtml': True
+        }
     
     def _get_rule_based_response(self, user_message):
         """
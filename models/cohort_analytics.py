@@ -0,0 +1,322 @@
+"""
+Cohort Analytics module for Health Companion app
+
+Treatment efficacy across every patient in the database. Each note's
+treatments and symptom observations are collected once into two pandas
+DataFrames (the patient event timeline); the per-medication statistics are
+then computed with grouped and merged DataFrame operations rather than by
+walking each patient's visits in Python. The timeline frames are kept
+between reports and rebuilt only after notes or summaries change.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from models.database import get_notes_version, get_notes_with_summaries
+from models.medications import dose_mg
+from models.treatment_efficacy import build_timelines, extract_base_med_name
+
+SYMPTOM_COLUMNS = ["patient", "note_id", "date", "symptom", "severity", "change"]
+TREATMENT_COLUMNS = ["patient", "note_id", "date", "medication", "dosage"]
+
+_timeline_lock = threading.Lock()
+_timeline_cache = {"version": None, "frames": None}
+
+
+def get_patient_key(summary):
+    """
+    Normalized patient name from a summary, as get_patient_notes matches it
+
+    Args:
+        summary (dict): Note summary
+
+    Returns:
+        str: Lowercase patient name, or None if the summary names no patient
+    """
+    if not isinstance(summary, dict):
+        return None
+    details = summary.get("patient_details")
+    if not isinstance(details, dict):
+        details = summary.get("patient") if isinstance(summary.get("patient"), dict) else {}
+    name = (details.get("name") or "").lower().strip()
+    return name or None
+
+
+def load_event_timeline(notes=None):
+    """
+    Load the treatments and symptom observations of every patient
+
+    Notes are grouped by patient and run through the same timeline
+    extraction as the per-patient analysis, so both agree on what was
+    prescribed and how severe each symptom was.
+
+    Args:
+        notes (list): Note dicts with id, original, created_at and summary
+            (defaults to every note in the database)
+
+    Returns:
+        tuple: (symptoms DataFrame with patient, note_id, date, symptom,
+            severity (0-10) and change (+1 improved, -1 worsened);
+            treatments DataFrame with patient, note_id, date, medication
+            and dosage_mg)
+    """
+    if notes is None:
+        notes = get_notes_with_summaries()
+
+    notes_by_patient = {}
+    for note in notes:
+        patient = get_patient_key(note.get("summary"))
+        if patient:
+            notes_by_patient.setdefault(patient, []).append(note)
+
+    symptom_rows = []
+    treatment_rows = []
+    for patient, patient_notes in notes_by_patient.items():
+        patient_notes.sort(key=lambda x: x.get("created_at") or "")
+        treatments_timeline, symptoms_timeline = build_timelines(patient_notes)
+
+        treatment_rows.extend(
+            (patient, entry["note_id"], entry["date"], extract_base_med_name(entry["treatment"]), entry["dosage"])
+            for entry in treatments_timeline
+        )
+        symptom_rows.extend(
+            (patient, entry["note_id"], entry["date"], entry["symptom"], entry.get("severity_score"), entry.get("change"))
+            for entry in symptoms_timeline
+        )
+
+    symptoms = pd.DataFrame(symptom_rows, columns=SYMPTOM_COLUMNS)
+    symptoms["date"] = pd.to_datetime(symptoms["date"], errors="coerce")
+    symptoms["symptom"] = symptoms["symptom"].astype(str).str.strip().str.lower()
+    symptoms["severity"] = symptoms["severity"].astype(float)
+    symptoms["change"] = symptoms["change"].map({"improved": 1, "worsened": -1}).astype(float)
+
+    treatments = pd.DataFrame(treatment_rows, columns=TREATMENT_COLUMNS)
+    treatments["date"] = pd.to_datetime(treatments["date"], errors="coerce")
+    treatments["medication"] = treatments["medication"].astype(str).str.strip().str.lower()
+    treatments["dosage_mg"] = dosage_mg(treatments.pop("dosage"))
+
+    return symptoms.dropna(subset=["date"]), treatments.dropna(subset=["date"])
+
+
+def dosage_mg(dosages):
+    """
+    Convert extracted dosages to milligrams
+
+    Dosages are parsed by models.medications, as the per-patient analysis
+    does, and each distinct dosage string is parsed once.
+
+    Args:
+        dosages (pandas.Series): Values from extract_dosage ("500mg", "2 g", ...)
+
+    Returns:
+        pandas.Series: Float milligrams, NaN for missing or non-mass dosages
+    """
+    milligrams = {dosage: dose_mg(dosage) for dosage in dosages.dropna().unique() if isinstance(dosage, str)}
+    return dosages.map(milligrams).astype(float)
+
+
+def compute_cohort_efficacy(symptoms, treatments, medication=None, symptom=None,
+                            start_date=None, end_date=None, min_patients=1):
+    """
+    Per-medication efficacy statistics across patients
+
+    A patient's course of a medication starts at the first visit listing it.
+    A symptom counts as improved after that when a later visit rates it
+    below its last severity on or before the start, or explicitly mentions
+    it improving (worsened likewise). Patients are evaluable when at least
+    one symptom can be compared this way.
+
+    Args:
+        symptoms (pandas.DataFrame): Symptoms from load_event_timeline
+        treatments (pandas.DataFrame): Treatments from load_event_timeline
+        medication (str): Only medications whose name contains this
+        symptom (str): Only symptoms whose name contains this
+        start_date (str): Only visits on or after this date (YYYY-MM-DD)
+        end_date (str): Only visits on or before this date (YYYY-MM-DD)
+        min_patients (int): Leave out medications taken by fewer patients
+
+    Returns:
+        list: One dict per medication, most widely used first, with
+            patients, evaluable_patients, improved_patients,
+            worsened_patients, improvement_rate,
+            median_days_to_improvement and dosage_changes
+    """
+    if start_date:
+        start = pd.Timestamp(start_date)
+        symptoms = symptoms[symptoms["date"] >= start]
+        treatments = treatments[treatments["date"] >= start]
+    if end_date:
+        # Include the whole end day
+        end = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+        symptoms = symptoms[symptoms["date"] < end]
+        treatments = treatments[treatments["date"] < end]
+    if medication:
+        treatments = treatments[treatments["medication"].str.contains(medication.lower(), regex=False)]
+    if symptom:
+        symptoms = symptoms[symptoms["symptom"].str.contains(symptom.lower(), regex=False)]
+
+    courses = (
+        treatments.groupby(["patient", "medication"], as_index=False)["date"].min()
+        .rename(columns={"date": "start_date"})
+    )
+    if courses.empty:
+        return []
+
+    # Every symptom observation of each patient, against each of their courses
+    observations = courses.merge(symptoms, on="patient")
+    keys = ["patient", "medication", "symptom"]
+
+    baseline = (
+        observations[(observations["date"] <= observations["start_date"]) & observations["severity"].notna()]
+        .sort_values("date")
+        .groupby(keys)["severity"].last()
+        .rename("baseline")
+    )
+    after = observations[observations["date"] > observations["start_date"]].join(baseline, on=keys)
+
+    compared = after["severity"].notna() & after["baseline"].notna()
+    improved = (compared & (after["severity"] < after["baseline"])) | (after["change"] == 1)
+    worsened = (compared & (after["severity"] > after["baseline"])) | (after["change"] == -1)
+    evaluable = compared | after["change"].notna()
+
+    first_improvement = after[improved].groupby(["patient", "medication"]).agg(
+        start_date=("start_date", "first"), improved_at=("date", "min")
+    )
+    first_improvement["days"] = (
+        (first_improvement["improved_at"] - first_improvement["start_date"]).dt.total_seconds() / 86400
+    )
+    by_medication = first_improvement.groupby(level="medication")
+
+    stats = pd.DataFrame({
+        "patients": courses.groupby("medication")["patient"].nunique(),
+        "evaluable_patients": after[evaluable].groupby("medication")["patient"].nunique(),
+        "improved_patients": by_medication.size(),
+        "worsened_patients": after[worsened].groupby("medication")["patient"].nunique(),
+        "median_days_to_improvement": by_medication["days"].median(),
+    })
+    count_columns = ["patients", "evaluable_patients", "improved_patients", "worsened_patients"]
+    stats[count_columns] = stats[count_columns].fillna(0).astype(int)
+    stats["improvement_rate"] = stats["improved_patients"] / stats["evaluable_patients"].replace(0, np.nan)
+    stats = stats[stats["patients"] >= min_patients].sort_values(
+        ["patients", "improvement_rate"], ascending=[False, False]
+    )
+
+    dosage_effects = compute_dosage_change_effects(symptoms, treatments)
+
+    results = []
+    for name, row in stats.iterrows():
+        results.append({
+            "medication": name,
+            "patients": int(row["patients"]),
+            "evaluable_patients": int(row["evaluable_patients"]),
+            "improved_patients": int(row["improved_patients"]),
+            "worsened_patients": int(row["worsened_patients"]),
+            "improvement_rate": _round(row["improvement_rate"], 3),
+            "median_days_to_improvement": _round(row["median_days_to_improvement"], 1),
+            "dosage_changes": dosage_effects.get(name, {}),
+        })
+    return results
+
+
+def compute_dosage_change_effects(symptoms, treatments):
+    """
+    How symptom severity moved after dosage increases and decreases
+
+    For each visit where a patient's dosage of a medication differs from
+    their previous one, the mean severity of their symptoms at that visit is
+    compared with the mean at their next visit. Changes without a rated
+    visit on both sides are not counted.
+
+    Args:
+        symptoms (pandas.DataFrame): Symptoms from load_event_timeline
+        treatments (pandas.DataFrame): Treatments from load_event_timeline
+
+    Returns:
+        dict: medication -> {"increase"|"decrease": {"count",
+            "mean_severity_change"}} (negative changes mean symptoms eased)
+    """
+    doses = (
+        treatments.dropna(subset=["dosage_mg"])
+        .sort_values(["patient", "medication", "date"])
+        .drop_duplicates(["patient", "medication", "date"], keep="last")
+    )
+    doses["previous_mg"] = doses.groupby(["patient", "medication"])["dosage_mg"].shift()
+    changes = doses[doses["previous_mg"].notna() & (doses["dosage_mg"] != doses["previous_mg"])].copy()
+    if changes.empty:
+        return {}
+    changes["direction"] = np.where(changes["dosage_mg"] > changes["previous_mg"], "increase", "decrease")
+
+    visit_severity = (
+        symptoms.dropna(subset=["severity"])
+        .groupby(["patient", "date"], as_index=False)["severity"].mean()
+        .sort_values("date")
+    )
+    changes = changes.sort_values("date")
+    changes = pd.merge_asof(
+        changes, visit_severity.rename(columns={"severity": "severity_before"}),
+        on="date", by="patient", direction="backward",
+    )
+    changes = pd.merge_asof(
+        changes, visit_severity.rename(columns={"severity": "severity_after"}),
+        on="date", by="patient", direction="forward", allow_exact_matches=False,
+    )
+    changes["severity_change"] = changes["severity_after"] - changes["severity_before"]
+
+    summary = changes.groupby(["medication", "direction"]).agg(
+        count=("severity_change", "count"), mean_severity_change=("severity_change", "mean")
+    )
+
+    effects = {}
+    for (name, direction), row in summary.iterrows():
+        effects.setdefault(name, {})[direction] = {
+            "count": int(row["count"]),
+            "mean_severity_change": _round(row["mean_severity_change"], 2),
+        }
+    return effects
+
+
+def analyze_cohort_efficacy(**filters):
+    """
+    Cohort efficacy report for every patient in the database
+
+    Args:
+        **filters: medication, symptom, start_date, end_date and
+            min_patients, as for compute_cohort_efficacy
+
+    Returns:
+        dict: Report with the cohort size and per-medication results
+    """
+    symptoms, treatments = get_event_timeline()
+    return {
+        "patients": int(pd.concat([symptoms["patient"], treatments["patient"]]).nunique()),
+        "visits": int(pd.concat([symptoms["note_id"], treatments["note_id"]]).nunique()),
+        "medications": compute_cohort_efficacy(symptoms, treatments, **filters),
+    }
+
+
+def get_event_timeline():
+    """
+    Get the cohort's event timeline, reusing it while no note has changed
+
+    Returns:
+        tuple: (symptoms, treatments) DataFrames, see load_event_timeline
+    """
+    version = get_notes_version()
+    with _timeline_lock:
+        if version is not None and _timeline_cache["version"] == version:
+            return _timeline_cache["frames"]
+
+    # Built from the notes as of `version` or later, so a change made while
+    # loading only causes one extra rebuild
+    frames = load_event_timeline()
+
+    with _timeline_lock:
+        _timeline_cache["version"] = version
+        _timeline_cache["frames"] = frames
+    return frames
+
+
+def _round(value, digits):
+    """Round a float for JSON, mapping NaN to None"""
+    return None if pd.isna(value) else round(float(value), digits)
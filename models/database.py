@@ -4,6 +4,9 @@ import json
 import os
 from datetime import datetime
 
+from . import events
+from .summary import Summary
+
 # Database file path
 DB_PATH = "medical_notes.db"
 
@@ -35,6 +38,19 @@ def init_db():
     """)
 
     # Create follow_up_actions table for the new feature
+    ensure_follow_up_actions_table(cursor)
+    backfill_follow_up_schedule(cursor)
+
+    ensure_notes_version_table(cursor)
+    ensure_transcription_job_tables(cursor)
+    ensure_transcription_cache_table(cursor)
+
+    conn.commit()
+    conn.close()
+
+
+def ensure_follow_up_actions_table(cursor):
+    """Create the follow_up_actions table and its one-row-per-note index"""
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS follow_up_actions (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -45,8 +61,160 @@ def init_db():
     )
     """)
 
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_follow_up_actions_note_id ON follow_up_actions (note_id)"
+        )
+    except sqlite3.IntegrityError:
+        # Older databases may hold several rows per note; keep the newest
+        cursor.execute("""
+        DELETE FROM follow_up_actions
+        WHERE id NOT IN (SELECT MAX(id) FROM follow_up_actions GROUP BY note_id)
+        """)
+        cursor.execute(
+            "CREATE UNIQUE INDEX idx_follow_up_actions_note_id ON follow_up_actions (note_id)"
+        )
+
+    ensure_follow_up_schedule_table(cursor)
+
+
+def ensure_follow_up_schedule_table(cursor):
+    """Create the follow_up_schedule table (one row per note with a follow-up date)"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS follow_up_schedule (
+        note_id INTEGER PRIMARY KEY,
+        patient_name TEXT,
+        follow_up_date TEXT NOT NULL,
+        urgency_level TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE CASCADE
+    )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_follow_up_schedule_date ON follow_up_schedule (follow_up_date)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_follow_up_schedule_urgency_date ON follow_up_schedule (urgency_level, follow_up_date)"
+    )
+
+
+def ensure_notes_version_table(cursor):
+    """Create the notes version counter and the triggers that bump it
+
+    Every insert, update or delete on notes or summaries increments the
+    counter, whichever code path or worker process made the change, so
+    analyses derived from all notes can tell whether they are still current
+    with a single-row read.
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('notes', 0)")
+    for table in ("notes", "summaries"):
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS bump_notes_version_{table}_{operation.lower()}
+            AFTER {operation} ON {table}
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE name = 'notes';
+            END
+            """)
+
+
+def get_notes_version():
+    """Get the counter bumped by every change to notes or summaries
+
+    Returns:
+        int: Current version, or None if the database has not been
+            initialized with init_db
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute("SELECT version FROM data_versions WHERE name = 'notes'").fetchone()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def ensure_transcription_job_tables(cursor):
+    """Create the tables holding background transcription jobs and their segments"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS transcription_jobs (
+        id TEXT PRIMARY KEY,
+        filename TEXT,
+        status TEXT NOT NULL,
+        progress REAL NOT NULL DEFAULT 0,
+        chunks_total INTEGER NOT NULL DEFAULT 0,
+        chunks_done INTEGER NOT NULL DEFAULT 0,
+        duration REAL,
+        vad TEXT,
+        cached BOOLEAN DEFAULT 0,
+        text TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS transcription_job_segments (
+        job_id TEXT NOT NULL,
+        segment_index INTEGER NOT NULL,
+        segment_data TEXT NOT NULL,
+        PRIMARY KEY (job_id, segment_index),
+        FOREIGN KEY (job_id) REFERENCES transcription_jobs(id) ON DELETE CASCADE
+    )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transcription_jobs_status_updated ON transcription_jobs (status, updated_at)"
+    )
+
+
+def ensure_transcription_cache_table(cursor):
+    """Create the transcription_cache table and its least-recently-used index"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS transcription_cache (
+        cache_key TEXT PRIMARY KEY,
+        backend TEXT NOT NULL,
+        language TEXT NOT NULL,
+        result_data TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_used_at REAL NOT NULL
+    )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_transcription_cache_last_used ON transcription_cache (last_used_at)"
+    )
+
+
+def backfill_follow_up_schedule(cursor):
+    """Fill an empty follow_up_schedule from follow-up actions saved before it existed"""
+    if cursor.execute("SELECT 1 FROM follow_up_schedule LIMIT 1").fetchone():
+        return
+
+    cursor.execute("""
+    SELECT f.note_id, f.actions_data, s.summary_data
+    FROM follow_up_actions f
+    LEFT JOIN summaries s ON f.note_id = s.note_id
+    """)
+    follow_ups = []
+    for note_id, actions_data, summary_data in cursor.fetchall():
+        try:
+            actions = json.loads(actions_data)
+            summary = json.loads(summary_data) if summary_data else {}
+        except json.JSONDecodeError:
+            continue
+        patient_name = (summary.get("patient_details") or {}).get("name")
+        follow_ups.append((note_id, actions, patient_name))
+
+    _write_follow_up_schedule(cursor, follow_ups)
+    if follow_ups:
+        print(f"Backfilled follow-up schedule from {len(follow_ups)} saved follow-ups")
 
 
 def get_patient_notes(patient_name):
@@ -75,7 +243,7 @@ def get_patient_notes(patient_name):
 
         if row["summary_data"]:
             try:
-                summary = json.loads(row["summary_data"])
+                summary = Summary.from_json(row["summary_data"]).to_dict()
                 # More flexible patient name matching
                 is_match = False
 
@@ -127,6 +295,7 @@ def save_note(note_text):
         conn.close()
 
         print(f"Note saved with unique ID: {unique_id}")
+        events.emit(events.NOTE_SAVED, note_id=unique_id)
         return unique_id
 
     except Exception as e:
@@ -167,12 +336,7 @@ def save_summary(note_id, summary_data, is_edited=False):
         if not summary_data:
             print("Warning: Attempt to save empty summary")
             # Create a minimal summary
-            summary_data = {
-                "patient_details": {"name": "Unknown Patient"},
-                "chief_complaints": [],
-                "symptoms": [],
-                "allergies": [],
-            }
+            summary_data = {"patient_details": {"name": "Unknown Patient"}}
 
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
@@ -191,8 +355,8 @@ def save_summary(note_id, summary_data, is_edited=False):
 
         conn.commit()
 
-        # Convert dict to JSON string for storage
-        summary_json = json.dumps(summary_data)
+        # Normalize and convert to JSON for storage
+        summary_json = Summary.from_dict(summary_data).to_json()
 
         # Check if a summary already exists for this note
         cursor.execute("SELECT id FROM summaries WHERE note_id = ?", (note_id,))
@@ -216,6 +380,7 @@ def save_summary(note_id, summary_data, is_edited=False):
 
         # Print a confirmation message for debugging
         print(f"Summary saved for note ID: {note_id}, Is edited: {is_edited}")
+        events.emit(events.SUMMARY_SAVED, note_id=note_id, is_edited=is_edited)
 
         return True
 
@@ -256,15 +421,7 @@ def get_all_notes():
         """)
 
         # Ensure follow_up_actions table exists
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS follow_up_actions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            note_id INTEGER NOT NULL,
-            actions_data TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE CASCADE
-        )
-        """)
+        ensure_follow_up_actions_table(cursor)
 
         conn.commit()
 
@@ -285,15 +442,12 @@ def get_all_notes():
 
             if row["summary_data"]:
                 try:
-                    note["summary"] = json.loads(row["summary_data"])
+                    note["summary"] = Summary.from_json(row["summary_data"]).to_dict()
                 except json.JSONDecodeError:
                     print(f"Warning: Invalid JSON in summary_data for note {row['id']}")
-                    note["summary"] = {
-                        "patient_details": {"name": "Unknown Patient"},
-                        "chief_complaints": [],
-                        "symptoms": [],
-                        "allergies": [],
-                    }
+                    note["summary"] = Summary.from_dict(
+                        {"patient_details": {"name": "Unknown Patient"}}
+                    ).to_dict()
             else:
                 note["summary"] = None
 
@@ -332,6 +486,8 @@ def update_note_text(note_id, new_text):
         conn.commit()
         conn.close()
 
+        if success:
+            events.emit(events.NOTE_EDITED, note_id=note_id)
         return success
     except Exception as e:
         print(f"Error updating note text: {str(e)}")
@@ -361,10 +517,12 @@ def get_note_by_id(note_id):
 
     note = {"id": row["id"], "original": row["text"], "created_at": row["created_at"]}
 
+    note["summary"] = None
     if row["summary_data"]:
-        note["summary"] = json.loads(row["summary_data"])
-    else:
-        note["summary"] = None
+        try:
+            note["summary"] = Summary.from_json(row["summary_data"]).to_dict()
+        except ValueError:
+            print(f"Warning: Invalid JSON in summary_data for note {row['id']}")
 
     conn.close()
     return note
@@ -380,6 +538,7 @@ def delete_note(note_id):
 
     # Delete related follow-up actions
     cursor.execute("DELETE FROM follow_up_actions WHERE note_id = ?", (note_id,))
+    cursor.execute("DELETE FROM follow_up_schedule WHERE note_id = ?", (note_id,))
 
     # Then delete the note
     cursor.execute("DELETE FROM notes WHERE id = ?", (note_id,))
@@ -389,6 +548,8 @@ def delete_note(note_id):
     conn.commit()
     conn.close()
 
+    if deleted:
+        events.emit(events.NOTE_DELETED, note_id=note_id)
     return deleted
 
 
@@ -441,43 +602,244 @@ def get_follow_up_actions(note_id):
     return None
 
 
+# Upsert keeping one row of follow-up actions per note. Rows are only
+# written while the note exists, so actions generated for a note that was
+# deleted in the meantime are dropped instead of being left orphaned.
+UPSERT_FOLLOW_UP_ACTIONS_SQL = """
+INSERT INTO follow_up_actions (note_id, actions_data)
+SELECT ?, ? WHERE EXISTS (SELECT 1 FROM notes WHERE id = ?)
+ON CONFLICT (note_id) DO UPDATE SET actions_data = excluded.actions_data
+"""
+
+UPSERT_FOLLOW_UP_SCHEDULE_SQL = """
+INSERT INTO follow_up_schedule (note_id, patient_name, follow_up_date, urgency_level)
+SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM notes WHERE id = ?)
+ON CONFLICT (note_id) DO UPDATE SET
+    patient_name = excluded.patient_name,
+    follow_up_date = excluded.follow_up_date,
+    urgency_level = excluded.urgency_level,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def _write_follow_up_schedule(cursor, follow_ups):
+    """Mirror the follow-up date and urgency of each note into follow_up_schedule
+
+    Args:
+        cursor: Cursor of the transaction the actions are saved in
+        follow_ups (list): (note_id, actions, patient_name) tuples
+    """
+    scheduled = []
+    unscheduled = []
+    for note_id, actions, patient_name in follow_ups:
+        if actions.get("follow_up_date"):
+            scheduled.append(
+                (note_id, patient_name, actions["follow_up_date"], actions.get("urgency_level") or "routine", note_id)
+            )
+        else:
+            unscheduled.append((note_id,))
+
+    cursor.executemany(UPSERT_FOLLOW_UP_SCHEDULE_SQL, scheduled)
+    cursor.executemany("DELETE FROM follow_up_schedule WHERE note_id = ?", unscheduled)
+
+
 # Function to save follow-up actions
-def save_follow_up_actions(note_id, actions):
-    """Save follow-up actions to the database"""
+def save_follow_up_actions(note_id, actions, patient_name=None):
+    """Save follow-up actions to the database, replacing any earlier ones
+
+    Args:
+        note_id: ID of the note
+        actions (dict): Generated follow-up actions
+        patient_name (str): Patient the note is about, recorded in the schedule
+
+    Returns:
+        bool: False if the note no longer exists and nothing was saved
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
-    # Create follow_up_actions table if it doesn't exist
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS follow_up_actions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        note_id INTEGER NOT NULL,
-        actions_data TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE CASCADE
-    )
-    """)
+    ensure_follow_up_actions_table(cursor)
+    cursor.execute(UPSERT_FOLLOW_UP_ACTIONS_SQL, (note_id, json.dumps(actions), note_id))
+    saved = cursor.rowcount > 0
+    if saved:
+        _write_follow_up_schedule(cursor, [(note_id, actions, patient_name)])
 
-    # Check if we already have actions for this note
-    cursor.execute("SELECT id FROM follow_up_actions WHERE note_id = ?", (note_id,))
-    existing = cursor.fetchone()
+    conn.commit()
+    conn.close()
 
-    actions_json = json.dumps(actions)
+    return saved
 
-    if existing:
-        # Update existing actions
-        cursor.execute(
-            "UPDATE follow_up_actions SET actions_data = ? WHERE note_id = ?",
-            (actions_json, note_id),
-        )
+
+def save_follow_up_actions_batch(follow_ups):
+    """Save follow-up actions for many notes in a single transaction
+
+    Args:
+        follow_ups (list): (note_id, actions, patient_name) tuples
+
+    Returns:
+        int: Number of notes written (notes deleted in the meantime are skipped)
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        ensure_follow_up_actions_table(cursor)
+        rows = [(note_id, json.dumps(actions), note_id) for note_id, actions, _ in follow_ups]
+        cursor.executemany(UPSERT_FOLLOW_UP_ACTIONS_SQL, rows)
+        saved = cursor.rowcount
+        _write_follow_up_schedule(cursor, follow_ups)
+        conn.commit()
+        return saved
+    except Exception as e:
+        conn.rollback()
+        print(f"Error in save_follow_up_actions_batch: {str(e)}")
+        return 0
+    finally:
+        conn.close()
+
+
+def get_due_follow_ups(start_date, end_date, urgency_levels=None):
+    """Get scheduled follow-ups due in a date range
+
+    Args:
+        start_date (str): First date to include (YYYY-MM-DD)
+        end_date (str): Last date to include (YYYY-MM-DD)
+        urgency_levels (list): Only include these urgency levels (defaults to all)
+
+    Returns:
+        list: Dicts with note_id, patient_name, follow_up_date and
+            urgency_level, ordered by date
+    """
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+
+    query = """
+    SELECT note_id, patient_name, follow_up_date, urgency_level
+    FROM follow_up_schedule
+    WHERE follow_up_date BETWEEN ? AND ?
+    """
+    params = [start_date, end_date]
+    if urgency_levels:
+        query += f" AND urgency_level IN ({', '.join('?' for _ in urgency_levels)})"
+        params.extend(urgency_levels)
+    query += " ORDER BY follow_up_date, note_id"
+
+    cursor.execute(query, params)
+    follow_ups = [dict(row) for row in cursor.fetchall()]
+
+    conn.close()
+    return follow_ups
+
+
+def get_notes_with_summaries(note_ids=None):
+    """Get notes and their raw summaries in one query
+
+    Args:
+        note_ids (list): Notes to load (defaults to every note)
+
+    Returns:
+        list: Note dicts with id, original, created_at and summary, ordered by ID
+    """
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+
+    query = """
+    SELECT n.id, n.text, n.created_at, s.summary_data
+    FROM notes n
+    LEFT JOIN summaries s ON n.id = s.note_id
+    """
+    if note_ids is None:
+        cursor.execute(query + " ORDER BY n.id")
     else:
-        # Insert new actions
-        cursor.execute(
-            "INSERT INTO follow_up_actions (note_id, actions_data) VALUES (?, ?)",
-            (note_id, actions_json),
-        )
+        placeholders = ", ".join("?" for _ in note_ids)
+        cursor.execute(query + f" WHERE n.id IN ({placeholders}) ORDER BY n.id", list(note_ids))
+
+    notes = []
+    for row in cursor.fetchall():
+        if notes and notes[-1]["id"] == row["id"]:
+            continue  # the first summary wins, as in get_note_by_id
+        note = {"id": row["id"], "original": row["text"], "created_at": row["created_at"], "summary": None}
+        if row["summary_data"]:
+            try:
+                note["summary"] = Summary.from_json(row["summary_data"]).to_dict()
+            except ValueError:
+                print(f"Warning: Invalid JSON in summary_data for note {row['id']}")
+        notes.append(note)
 
-    conn.commit()
     conn.close()
+    return notes
 
-    return True
+
+def get_notes_for_reprocessing(include_existing=False):
+    """Get notes whose summaries can be regenerated by batch extraction
+
+    Args:
+        include_existing (bool): Also return notes that already have an
+            unedited summary. Notes with edited summaries are never returned.
+
+    Returns:
+        list: (note_id, text) tuples ordered by note ID
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    if include_existing:
+        cursor.execute("""
+        SELECT n.id, n.text
+        FROM notes n
+        LEFT JOIN summaries s ON n.id = s.note_id
+        WHERE s.id IS NULL OR s.is_edited = 0
+        ORDER BY n.id
+        """)
+    else:
+        cursor.execute("""
+        SELECT n.id, n.text
+        FROM notes n
+        LEFT JOIN summaries s ON n.id = s.note_id
+        WHERE s.id IS NULL
+        ORDER BY n.id
+        """)
+
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def save_summaries(summaries):
+    """Save many generated summaries in a single transaction
+
+    Args:
+        summaries (list): (note_id, summary_data) tuples
+
+    Returns:
+        int: Number of summaries written
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        rows = [
+            (note_id, Summary.from_dict(summary).to_json())
+            for note_id, summary in summaries
+        ]
+        note_ids = [(note_id,) for note_id, _ in rows]
+
+        cursor.executemany(
+            "DELETE FROM summaries WHERE note_id = ? AND is_edited = 0", note_ids
+        )
+        cursor.executemany(
+            "INSERT INTO summaries (note_id, summary_data, is_edited) VALUES (?, ?, 0)",
+            rows,
+        )
+        conn.commit()
+        # One event for the whole batch, so subscribers can handle it in one go
+        events.emit(events.SUMMARIES_SAVED, note_ids=[note_id for (note_id,) in note_ids])
+        return len(rows)
+    except Exception as e:
+        conn.rollback()
+        print(f"Error in save_summaries: {str(e)}")
+        return 0
+    finally:
+        conn.close()
@@ -0,0 +1,222 @@
+"""
+Dictation module for Health Companion app
+
+Live dictation: the browser streams raw microphone audio and the server
+splits it into utterances at pauses as it arrives. While an utterance is
+still being spoken its audio so far is recognized for a partial transcript;
+once the speaker pauses the whole utterance is recognized for the final
+text. Recognition runs on a worker thread per session so reading audio
+never waits for the recognizer.
+"""
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import speech_recognition as sr
+
+from .speech_backends import get_speech_backend
+from .transcription import MAX_CHUNK_MS
+from .vad import FRAME_MS, MIN_SILENCE_MS, MIN_SPEECH_MS, PADDING_MS, SILENCE_FLOOR_DB, speech_threshold
+
+# Sample format clients stream in (16-bit little-endian mono)
+DICTATION_SAMPLE_WIDTH = 2
+DEFAULT_SAMPLE_RATE = 16000
+
+# A partial transcript is produced each time an utterance grows by this much
+PARTIAL_INTERVAL_MS = 1000
+
+# Frame energies the speech threshold is estimated from
+NOISE_WINDOW_MS = 10000
+
+
+class DictationSession:
+    """
+    Incremental recognizer for one live dictation
+
+    Feed it PCM audio as it arrives with feed(); transcript messages are
+    collected with messages(). Each message is a dict with "type":
+
+    - "partial": {"utterance", "text"} best guess for the utterance in progress
+    - "final": {"utterance", "start", "end", "text"} recognized utterance
+      (times in seconds from the start of the stream)
+    - "error": {"utterance", "error"} the recognizer could not be reached
+    """
+
+    def __init__(self, backend=None, language="en-US", sample_rate=DEFAULT_SAMPLE_RATE):
+        """
+        Start a dictation session
+
+        Args:
+            backend (SpeechBackend): Recognizer to use (defaults to the configured backend)
+            language (str): Language code
+            sample_rate (int): Sample rate of the streamed audio
+        """
+        self.backend = backend or get_speech_backend()
+        self.language = language
+        self.sample_rate = sample_rate
+        self.frame_bytes = int(sample_rate * FRAME_MS / 1000) * DICTATION_SAMPLE_WIDTH
+
+        self._pending = bytearray()  # audio not yet split into frames
+        self._preroll = deque(maxlen=max(1, PADDING_MS // FRAME_MS))
+        self._energies = deque(maxlen=NOISE_WINDOW_MS // FRAME_MS)
+        self._utterance = bytearray()
+        self._utterance_start_ms = 0
+        self._speech_ms = 0
+        self._silence_ms = 0
+        self._partial_at_ms = 0
+        self._partial_pending = False
+        self._position_ms = 0
+        self._utterance_index = 0
+
+        self._finals = []
+        self._lock = threading.Lock()
+        self._messages = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dictation")
+
+    def feed(self, pcm):
+        """
+        Add streamed audio
+
+        Args:
+            pcm (bytes): 16-bit little-endian mono samples
+        """
+        self._pending.extend(pcm)
+        while len(self._pending) >= self.frame_bytes:
+            frame = bytes(self._pending[:self.frame_bytes])
+            del self._pending[:self.frame_bytes]
+            self._process_frame(frame)
+
+    def _process_frame(self, frame):
+        """Track speech and pauses for one frame of audio"""
+        samples = np.frombuffer(frame, dtype="<i2").astype(np.float64)
+        rms = np.sqrt(np.mean(samples * samples))
+        energy = 20 * np.log10(rms / 32768.0 + 1e-10)
+        self._energies.append(energy)
+        self._position_ms += FRAME_MS
+
+        threshold = speech_threshold(np.fromiter(self._energies, dtype=np.float64))
+        is_speech = threshold is not None and energy > max(threshold, SILENCE_FLOOR_DB)
+
+        if not self._utterance:
+            if is_speech:
+                # Start the utterance with a little audio from before the speech
+                self._utterance_start_ms = self._position_ms - FRAME_MS * (len(self._preroll) + 1)
+                for previous in self._preroll:
+                    self._utterance.extend(previous)
+                self._utterance.extend(frame)
+                self._preroll.clear()
+                self._speech_ms = FRAME_MS
+                self._silence_ms = 0
+                self._partial_at_ms = 0
+            else:
+                self._preroll.append(frame)
+            return
+
+        self._utterance.extend(frame)
+        if is_speech:
+            self._speech_ms += FRAME_MS
+            self._silence_ms = 0
+        else:
+            self._silence_ms += FRAME_MS
+
+        utterance_ms = self._utterance_ms()
+        if self._silence_ms >= MIN_SILENCE_MS or utterance_ms >= MAX_CHUNK_MS:
+            self._finish_utterance()
+        elif utterance_ms - self._partial_at_ms >= PARTIAL_INTERVAL_MS and not self._partial_pending:
+            self._partial_at_ms = utterance_ms
+            self._partial_pending = True
+            self._executor.submit(self._recognize_partial, self._utterance_index, bytes(self._utterance))
+
+    def _utterance_ms(self):
+        return len(self._utterance) * 1000 // (self.sample_rate * DICTATION_SAMPLE_WIDTH)
+
+    def _finish_utterance(self):
+        """Queue the utterance in progress for final recognition"""
+        if self._speech_ms >= MIN_SPEECH_MS:
+            start_ms = max(0, self._utterance_start_ms)
+            self._executor.submit(
+                self._recognize_final, self._utterance_index, bytes(self._utterance),
+                start_ms, start_ms + self._utterance_ms(),
+            )
+            self._utterance_index += 1
+        self._utterance = bytearray()
+        self._speech_ms = 0
+        self._silence_ms = 0
+
+    def _recognize(self, pcm):
+        audio_data = sr.AudioData(pcm, self.sample_rate, DICTATION_SAMPLE_WIDTH)
+        try:
+            return self.backend.transcribe(audio_data, self.language).strip()
+        except sr.UnknownValueError:
+            return ""
+
+    def _recognize_partial(self, index, pcm):
+        """Recognize the utterance so far (runs on the session worker)"""
+        try:
+            text = self._recognize(pcm)
+            if text:
+                self._messages.put({"type": "partial", "utterance": index, "text": text})
+        except sr.RequestError as e:
+            print(f"Partial dictation recognition failed: {e}")
+        finally:
+            self._partial_pending = False
+
+    def _recognize_final(self, index, pcm, start_ms, end_ms):
+        """Recognize a finished utterance (runs on the session worker)"""
+        try:
+            text = self._recognize(pcm)
+        except sr.RequestError as e:
+            print(f"Dictation recognition failed: {e}")
+            self._messages.put({"type": "error", "utterance": index, "error": str(e)})
+            return
+
+        segment = {"start": round(start_ms / 1000, 2), "end": round(end_ms / 1000, 2), "text": text}
+        with self._lock:
+            self._finals.append(segment)
+        self._messages.put(dict(segment, type="final", utterance=index))
+
+    def messages(self, timeout=None):
+        """
+        Collect transcript messages produced since the last call
+
+        Args:
+            timeout (float): Seconds to wait for the first message (None
+                returns immediately)
+
+        Returns:
+            list: Message dicts in the order they were produced
+        """
+        collected = []
+        try:
+            if timeout is not None:
+                collected.append(self._messages.get(timeout=timeout))
+            while True:
+                collected.append(self._messages.get_nowait())
+        except queue.Empty:
+            pass
+        return collected
+
+    def finish(self):
+        """
+        End the dictation: recognize any utterance still in progress and
+        wait for outstanding recognition
+
+        Returns:
+            list: The remaining transcript messages
+        """
+        if self._utterance:
+            self._finish_utterance()
+        self._executor.shutdown(wait=True)
+        return self.messages()
+
+    def close(self):
+        """Stop the session without waiting for outstanding recognition"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def text(self):
+        """Transcript of all finished utterances"""
+        with self._lock:
+            return " ".join(s["text"] for s in self._finals if s["text"])
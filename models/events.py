@@ -0,0 +1,75 @@
+"""
+Events module for Health Companion app
+
+A small publish/subscribe hook system for the data layer. The database
+functions emit an event after each change is committed, and other modules
+subscribe to keep derived data (such as follow-up actions) up to date
+without the routes having to remember to do it.
+"""
+import threading
+
+# A new note was stored; payload: note_id
+NOTE_SAVED = "note_saved"
+
+# A note's text was changed; payload: note_id
+NOTE_EDITED = "note_edited"
+
+# A note's summary was stored or replaced; payload: note_id, is_edited
+SUMMARY_SAVED = "summary_saved"
+
+# Summaries of many notes were stored in one batch; payload: note_ids
+SUMMARIES_SAVED = "summaries_saved"
+
+# A note and its related rows were deleted; payload: note_id
+NOTE_DELETED = "note_deleted"
+
+EVENTS = (NOTE_SAVED, NOTE_EDITED, SUMMARY_SAVED, SUMMARIES_SAVED, NOTE_DELETED)
+
+_subscribers_lock = threading.Lock()
+_subscribers = {event: [] for event in EVENTS}
+
+
+def subscribe(event, handler):
+    """
+    Call a handler every time an event is emitted
+
+    Handlers run synchronously in the thread that made the change, so
+    anything slow should be handed off to a background worker.
+
+    Args:
+        event (str): One of EVENTS
+        handler (callable): Called with the event's payload as keyword arguments
+    """
+    if event not in _subscribers:
+        raise ValueError(f"Unknown event '{event}'. Available: {', '.join(EVENTS)}")
+    with _subscribers_lock:
+        if handler not in _subscribers[event]:
+            _subscribers[event].append(handler)
+
+
+def unsubscribe(event, handler):
+    """Stop calling a handler for an event"""
+    with _subscribers_lock:
+        if handler in _subscribers.get(event, []):
+            _subscribers[event].remove(handler)
+
+
+def emit(event, **payload):
+    """
+    Notify the subscribers of an event
+
+    A failing handler is logged and does not stop the others or the change
+    that emitted the event.
+
+    Args:
+        event (str): One of EVENTS
+        **payload: Event details passed to each handler
+    """
+    with _subscribers_lock:
+        handlers = list(_subscribers[event])
+
+    for handler in handlers:
+        try:
+            handler(**payload)
+        except Exception as e:
+            print(f"Error in {event} handler {getattr(handler, '__name__', handler)}: {str(e)}")
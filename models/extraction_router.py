@@ -0,0 +1,230 @@
+"""
+Hybrid Extraction Router module for Health Companion app
+
+Runs the regex extractor first, scores how much each field can be trusted,
+and asks the AI model only for the fields that scored low, using a compact
+prompt that describes just those fields.
+"""
+import copy
+import re
+import threading
+
+from .notes_processor import (
+    SUMMARY_FIELDS,
+    basic_extraction,
+    clean_extracted_info,
+)
+from .partial_json import parse_json_object
+
+# Fields scoring below this are sent to the AI model
+DEFAULT_CONFIDENCE_THRESHOLD = 0.5
+
+# Words the name patterns pick up that are not names ("Patient Details: ...")
+NON_NAME_WORDS = {
+    "details", "reports", "report", "has", "had", "is", "was", "with", "and",
+    "the", "complains", "presented", "presents", "came", "comes", "history",
+}
+
+# Keywords suggesting a section exists even though its regex found nothing
+FIELD_TRIGGERS = {
+    "past_history": re.compile(r"\b(?:history|surgery|operation|underwent|previous)\b", re.IGNORECASE),
+    "drug_history": re.compile(r"\b(?:mg|mcg|tablets?|medications?|medicines?|prescri\w*|taking)\b", re.IGNORECASE),
+    "family_history": re.compile(r"\b(?:family|father|mother|brother|sister|parents?)\b", re.IGNORECASE),
+    "allergies": re.compile(r"\ballerg\w*", re.IGNORECASE),
+    "lifestyle": re.compile(r"\b(?:smok\w*|alcohol|cigarettes?|tobacco)\b", re.IGNORECASE),
+    "chronic_diseases": re.compile(r"\b(?:chronic|since \d+ years|known case)\b", re.IGNORECASE),
+}
+
+# Output format of each field, used to build the targeted prompt
+FIELD_SCHEMAS = {
+    "patient_details": ('Patient Details (name, age, gender, marital status, residence)',
+                        '{"name": "string or null", "age": "string or null", "gender": "string or null", '
+                        '"marital_status": "string or null", "residence": "string or null"}'),
+    "chief_complaints": ('Chief Complaints (primary symptoms and duration)', '["complaint with duration", ...]'),
+    "chief_complaint_details": ('Chief Complaint Details (location in body, severity on scale 1-10)',
+                                '[{"complaint": "string", "location": "string or null", '
+                                '"severity": "string or null", "duration": "string or null"}, ...]'),
+    "past_history": ('Past History (previous illnesses, surgeries)', '["previous illness/surgery", ...]'),
+    "chronic_diseases": ('Chronic Diseases (diabetes, hypertension, etc.)', '["disease", ...]'),
+    "lifestyle": ('Lifestyle (smoking, alcohol, recreational drugs with frequency)',
+                  '[{"habit": "string", "frequency": "string or null", "duration": "string or null"}, ...]'),
+    "drug_history": ('Drug History (current medications)', '["medication", ...]'),
+    "family_history": ('Family History (conditions in family members)', '["condition with relation", ...]'),
+    "allergies": ('Allergies (especially medication allergies)', '["allergy", ...]'),
+    "symptoms": ('Symptoms (all mentioned symptoms)', '["symptom", ...]'),
+    "possible_diseases": ('Possible Diseases (based on mentioned symptoms)', '["disease", ...]'),
+}
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "notes": 0,
+    "llm_calls": 0,
+    "llm_failures": 0,
+    "prompt_chars": 0,
+    "fields": {field: {"regex": 0, "llm": 0} for field in SUMMARY_FIELDS},
+}
+
+
+def score_patient_details(details):
+    """
+    Score regex-extracted patient details
+
+    Args:
+        details (dict): Extracted patient details
+
+    Returns:
+        float: Confidence between 0 and 1
+    """
+    name = details.get("name") or ""
+    if not name or name.split()[0].lower() in NON_NAME_WORDS or not name[0].isupper():
+        name_score = 0.2
+    else:
+        name_score = 0.8
+
+    age_score = 0.9 if details.get("age") else 0.3
+    gender_score = 0.8 if details.get("gender") else 0.3
+
+    return min(name_score, age_score, gender_score)
+
+
+def score_extraction_confidence(extracted_info, text):
+    """
+    Estimate how reliable each regex-extracted field is
+
+    Empty fields are trusted only when the note has no keywords suggesting
+    the information is there; fields built from fixed keyword lists score
+    lower than fields taken from an explicit section header.
+
+    Args:
+        extracted_info (dict): Result of basic_extraction
+        text (str): The note text
+
+    Returns:
+        dict: Field name -> confidence between 0 and 1
+    """
+    scores = {"patient_details": score_patient_details(extracted_info["patient_details"])}
+
+    # Every note has a presenting complaint, so an empty result is a miss
+    scores["chief_complaints"] = 0.8 if extracted_info["chief_complaints"] else 0.2
+    scores["chief_complaint_details"] = 0.6 if extracted_info["chief_complaint_details"] else 0.2
+
+    # Section-based fields: found under a header, or absent with no hint of them
+    for field in ["past_history", "drug_history", "family_history", "allergies"]:
+        if extracted_info[field]:
+            scores[field] = 0.9
+        else:
+            scores[field] = 0.3 if FIELD_TRIGGERS[field].search(text) else 0.9
+
+    # Keyword-list fields only know a fixed vocabulary
+    for field in ["chronic_diseases", "lifestyle"]:
+        if extracted_info[field]:
+            scores[field] = 0.7
+        else:
+            scores[field] = 0.4 if FIELD_TRIGGERS[field].search(text) else 0.8
+
+    scores["symptoms"] = 0.6 if extracted_info["symptoms"] else 0.3
+
+    # Disease suggestions are looked up from the matched symptoms, so they are
+    # as good as those symptoms; with no suggestions they go to the model only
+    # together with the symptoms they depend on
+    if extracted_info["possible_diseases"]:
+        scores["possible_diseases"] = 0.7
+    else:
+        scores["possible_diseases"] = scores["symptoms"]
+
+    return scores
+
+
+def build_targeted_prompt(text, fields):
+    """
+    Build a compact prompt asking only for the given fields
+
+    Args:
+        text (str): The medical note text
+        fields (list): Fields to extract
+
+    Returns:
+        str: Prompt text
+    """
+    descriptions = "\n".join(
+        f"{i}. {FIELD_SCHEMAS[field][0]}" for i, field in enumerate(fields, 1)
+    )
+    schema = ",\n".join(f'  "{field}": {FIELD_SCHEMAS[field][1]}' for field in fields)
+
+    return f"""Extract only the following fields from the medical note as JSON:
+{descriptions}
+
+Extract only if clearly mentioned. Use null for missing strings and [] for empty lists.
+
+Medical Note: "{text}"
+
+Output Format JSON:
+{{
+{schema}
+}}
+"""
+
+
+def extract_hybrid(text, model, threshold=DEFAULT_CONFIDENCE_THRESHOLD):
+    """
+    Extract medical information with regex first and the AI model only for low-confidence fields
+
+    Args:
+        text (str): The medical note text
+        model: AI model instance (e.g., Gemini), or None for regex only
+        threshold (float): Fields scoring below this are sent to the model
+
+    Returns:
+        dict: Structured medical information
+    """
+    extracted_info = basic_extraction(text)
+    scores = score_extraction_confidence(extracted_info, text)
+    llm_fields = [field for field in SUMMARY_FIELDS if scores[field] < threshold] if model else []
+
+    llm_ok = True
+    if llm_fields:
+        prompt = build_targeted_prompt(text, llm_fields)
+        try:
+            response = model.generate_content(prompt)
+            llm_info, _ = parse_json_object(response.text)
+            for field in llm_fields:
+                if field not in llm_info:
+                    continue
+                if field == "patient_details" and isinstance(llm_info[field], dict):
+                    # Keep regex details the model left empty
+                    for key, value in llm_info[field].items():
+                        if value:
+                            extracted_info[field][key] = value
+                else:
+                    extracted_info[field] = llm_info[field]
+        except Exception as e:
+            llm_ok = False
+            print(f"Error in targeted AI extraction: {str(e)}")
+
+    with _metrics_lock:
+        _metrics["notes"] += 1
+        if llm_fields:
+            _metrics["llm_calls"] += 1
+            _metrics["prompt_chars"] += len(prompt)
+            if not llm_ok:
+                _metrics["llm_failures"] += 1
+        for field in SUMMARY_FIELDS:
+            _metrics["fields"][field]["llm" if field in llm_fields else "regex"] += 1
+
+    return clean_extracted_info(extracted_info)
+
+
+def get_extraction_metrics():
+    """
+    Get counters describing how fields were routed
+
+    Returns:
+        dict: Copy of the routing metrics
+    """
+    with _metrics_lock:
+        metrics = copy.deepcopy(_metrics)
+
+    total_fields = sum(f["regex"] + f["llm"] for f in metrics["fields"].values())
+    llm_fields = sum(f["llm"] for f in metrics["fields"].values())
+    metrics["llm_field_ratio"] = llm_fields / total_fields if total_fields else 0.0
+    return metrics
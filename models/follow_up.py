@@ -1,17 +1,271 @@
 """
 Follow-up Action Items Generator
+
+Every pattern is compiled once: fixed patterns at import time and patterns
+built around a symptom, medication or complaint the first time that term is
+seen. Generated actions are cached per note and content, so regenerating
+follow-ups for an unchanged note does no work.
 """
 
+import copy
+import hashlib
 import json
-import sqlite3
 import re
-from datetime import datetime, timedelta
-from .database import DB_PATH
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from .database import (
+    get_note_by_id,
+    get_notes_with_summaries,
+    save_follow_up_actions,
+    save_follow_up_actions_batch,
+)
+from . import events
+from .note_document import as_note_document, forget_note_document, get_note_document
+
+# Number of generated follow-up results kept per process
+FOLLOW_UP_CACHE_SIZE = 256
+
+# Number of symptoms, medications and complaints whose patterns are kept compiled
+TERM_PATTERN_CACHE_SIZE = 1024
+
+# Background threads regenerating follow-ups after notes change
+FOLLOW_UP_REGENERATION_WORKERS = 1
+
+# Common symptoms and their standard monitoring/management actions
+SYMPTOM_ACTIONS = {
+    "fever": {
+        "action": "Monitor temperature daily",
+        "priority": "medium",
+        "context": "For fever management",
+    },
+    "headache": {
+        "action": "Track headache frequency, intensity, and triggers",
+        "priority": "medium",
+        "context": "For headache management",
+    },
+    "cough": {
+        "action": "Monitor cough characteristics and note any changes",
+        "priority": "medium",
+        "context": "For respiratory symptom tracking",
+    },
+    "pain": {
+        "action": "Rate pain level daily on a scale of 1-10",
+        "priority": "medium",
+        "context": "For pain management",
+    },
+    "dizziness": {
+        "action": "Avoid driving and hazardous activities while experiencing dizziness",
+        "priority": "high",
+        "context": "For safety",
+    },
+    "breathing": {
+        "action": "Monitor breathing difficulty and seek immediate care if it worsens",
+        "priority": "high",
+        "context": "For respiratory safety",
+    },
+    "chest pain": {
+        "action": "Seek emergency care immediately if chest pain occurs",
+        "priority": "high",
+        "context": "For cardiac safety",
+    },
+    "blood pressure": {
+        "action": "Measure blood pressure daily and keep a log",
+        "priority": "high",
+        "context": "For blood pressure management",
+    },
+}
+
+# Explicit lifestyle recommendations in the note text
+LIFESTYLE_PATTERNS = [
+    re.compile(r"(?:recommend|suggest|advise)[^\.]* (?:to) ([^\.]+) (?:for|to improve)", re.IGNORECASE),
+    re.compile(r"(?:increase|decrease|reduce|limit|avoid|quit)[^\.]* ([^\.]+)", re.IGNORECASE),
+    re.compile(r"(?:exercise|diet|nutrition|sleep|stress)[^\.]* (?:should|need to|must) ([^\.]+)", re.IGNORECASE),
+    re.compile(r"(?:important|essential|crucial|critical) (?:to|that you) ([^\.]+)", re.IGNORECASE),
+]
+
+# Explicit follow-up timing such as "come back in two weeks"
+FOLLOW_UP_TIMING_PATTERN = re.compile(
+    r"(?:follow up|follow-up|see me|come back)[^\.]* (?:in|after) ([^\.,]+)", re.IGNORECASE
+)
+
+# Issues that call for a follow-up within a week
+URGENT_KEYWORDS = ["severe", "acute", "intense", "worst", "emergency", "unbearable"]
+URGENT_SYMPTOMS = [
+    "chest pain",
+    "difficulty breathing",
+    "shortness of breath",
+    "severe pain",
+]
+
+NUMBER_PATTERN = re.compile(r"(\d+)")
+WORD_TO_NUM = {
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+    "eleven": 11,
+    "twelve": 12,
+    "couple": 2,
+    "few": 3,
+    "several": 4,
+}
+
+# Patterns for patient instructions
+PATIENT_INSTRUCTION_PATTERNS = [
+    re.compile(r"(?:you should|you need to|make sure to|be sure to|remember to|don't forget to|please) ([^\.]+)", re.IGNORECASE),
+    re.compile(r"(?:I want you to|I'd like you to|I recommend|I suggest) ([^\.]+)", re.IGNORECASE),
+    re.compile(r"(?:it's important|it is important|it's crucial|it is crucial) (?:to|that you) ([^\.]+)", re.IGNORECASE),
+]
+
+# Patterns for doctor's own reminders
+DOCTOR_INSTRUCTION_PATTERNS = [
+    re.compile(r"(?:I should|I need to|I'll|I will|we should|we need to|we'll|we will) ([^\.]+)", re.IGNORECASE),
+    re.compile(r"(?:need to|should|must|have to|let's|we'll) (?:check|follow up on|remember|monitor|track|review) ([^\.]+)", re.IGNORECASE),
+    re.compile(r"(?:remember to|don't forget to|make a note to) ([^\.]+)", re.IGNORECASE),
+]
+
+# Ordered tests and referrals
+TEST_REFERRAL_PATTERNS = [
+    re.compile(r"(?:order|get|need|require|recommend)(?:\s+an?)?\s+([\w\s]+(?:test|scan|x-ray|mri|ct|ultrasound|blood\s+work))", re.IGNORECASE),
+    re.compile(r"(?:refer|send)(?:\s+to)?\s+(?:a|an)?\s+([\w\s]+(?:specialist|doctor|cardiologist|neurologist|dermatologist|surgeon))", re.IGNORECASE),
+]
+TEST_WORDS = ["test", "scan", "x-ray", "mri", "ct", "ultrasound", "blood"]
+
+_results_lock = threading.Lock()
+_results_cache = OrderedDict()
+
+_regeneration_lock = threading.Lock()
+_pending_regenerations = set()
+_regeneration_executor = None
+
+
+@lru_cache(maxsize=TERM_PATTERN_CACHE_SIZE)
+def _symptom_patterns(symptom):
+    """Instruction patterns for one symptom, compiled on first use"""
+    symptom = re.escape(symptom)
+    return (
+        re.compile(rf"(?:for|with) (?:the|your) {symptom}[,\s]+(?:you should|please) ([^\.]+)", re.IGNORECASE),
+        re.compile(rf"(?:to manage|to treat|to handle|for) (?:the|your) {symptom}[,\s]+([^\.]+)", re.IGNORECASE),
+        re.compile(rf"(?:I recommend|I suggest|try|consider) ([^\.]+) for (?:the|your) {symptom}", re.IGNORECASE),
+        re.compile(rf"{symptom}[^\.]+ (?:can be managed by|can be treated with|should be) ([^\.]+)", re.IGNORECASE),
+    )
+
+
+@lru_cache(maxsize=TERM_PATTERN_CACHE_SIZE)
+def _medication_patterns(medication):
+    """
+    Patterns for one medication, compiled on first use
+
+    Returns:
+        tuple: (dosing instruction patterns, new-medication pattern, refill pattern)
+    """
+    medication = re.escape(medication)
+    dosing = (
+        re.compile(rf"{medication}[^\.]* (\d+\s*\w+(?:\s+\d+\s*\w+)?\s+(?:once|twice|three times|every|daily|weekly|monthly)[^\.]+)", re.IGNORECASE),
+        re.compile(rf"[tT]ake[^\.]* {medication}[^\.]* (\d+\s*\w+(?:\s+\d+\s*\w+)?\s+(?:once|twice|three times|every|daily|weekly|monthly)[^\.]+)", re.IGNORECASE),
+        re.compile(rf"{medication}[^\.]* (\d+\s*\w+(?:\s+\d+\s*\w+)?)[^\.]* (?:once|twice|three times|every|daily|weekly|monthly)[^\.]+", re.IGNORECASE),
+        re.compile(rf"[pP]rescrib\w+[^\.]* {medication}[^\.]* (\d+\s*\w+(?:\s+\d+\s*\w+)?)[^\.]* (?:once|twice|three times|every|daily|weekly|monthly)[^\.]+", re.IGNORECASE),
+    )
+    new_medication = re.compile(rf"(?:start|begin|new|prescrib\w+|initiat\w+)[^\.]*{medication}", re.IGNORECASE)
+    refill = re.compile(rf"(?:refill|renew)[^\.]*{medication}[^\.]* (?:in|after|before) ([^\.]+)", re.IGNORECASE)
+    return dosing, new_medication, refill
+
+
+@lru_cache(maxsize=TERM_PATTERN_CACHE_SIZE)
+def _complaint_patterns(complaint):
+    """Patterns for doctor actions about one chief complaint, compiled on first use"""
+    complaint = re.escape(complaint)
+    return (
+        re.compile(rf"(?:I'll|I will|we'll|we will|need to)[^\.]* (?:check|evaluate|assess|monitor|review)[^\.]* {complaint}[^\.]* (?:at|during|in|next)[^\.]+", re.IGNORECASE),
+        re.compile(rf"(?:let's|let us|will)[^\.]* (?:see|check|evaluate|assess|review)[^\.]* {complaint}[^\.]* (?:again|next)[^\.]+", re.IGNORECASE),
+        re.compile(rf"(?:important|essential|critical|crucial)[^\.]* (?:to|that I)[^\.]* (?:review|check|evaluate|monitor|follow up on)[^\.]* {complaint}", re.IGNORECASE),
+    )
+
+
+def follow_up_cache_key(note):
+    """
+    Key identifying a note's content for the follow-up cache
+
+    Follow-up dates are relative to today, so the key changes each day.
+
+    Args:
+        note (dict): Note from get_note_by_id
+
+    Returns:
+        tuple: (note ID, hash of the note text and summary, today's date)
+    """
+    digest = hashlib.sha256((note.get("original") or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(note.get("summary"), sort_keys=True).encode("utf-8"))
+    return (note["id"], digest.hexdigest(), date.today().isoformat())
+
+
+def forget_follow_up_actions(note_id):
+    """Drop a note's cached follow-up results (e.g. after the note is deleted)"""
+    with _results_lock:
+        for key in [key for key in _results_cache if key[0] == note_id]:
+            del _results_cache[key]
+
+
+def compute_follow_up_actions(note):
+    """
+    Compute follow-up actions for a loaded note without touching the database
+
+    Args:
+        note (dict): Note with id, original and summary (see get_note_by_id)
+
+    Returns:
+        dict: Follow-up actions for both doctor and patient
+    """
+    actions, _ = _compute_follow_up_actions(note)
+    return actions
+
+
+def _compute_follow_up_actions(note):
+    """Compute a note's actions, or take them from the cache; returns (actions, cached)"""
+    cache_key = follow_up_cache_key(note)
+    with _results_lock:
+        cached = _results_cache.get(cache_key)
+        if cached is not None:
+            _results_cache.move_to_end(cache_key)
+            return copy.deepcopy(cached), True
+
+    return _build_follow_up_actions(note["id"], note), False
+
+
+def _remember_follow_up_actions(note, actions):
+    """Cache actions that were saved for a note's current content"""
+    cache_key = follow_up_cache_key(note)
+    with _results_lock:
+        _results_cache[cache_key] = copy.deepcopy(actions)
+        _results_cache.move_to_end(cache_key)
+        while len(_results_cache) > FOLLOW_UP_CACHE_SIZE:
+            _results_cache.popitem(last=False)
+
+
+def get_patient_name(note):
+    """Patient name from a note's summary, or None"""
+    summary = note.get("summary") or {}
+    return (summary.get("patient_details") or {}).get("name")
 
 
 def generate_follow_up_actions(note_id):
     """
-    Generate AI-based follow-up action items from a medical note
+    Generate AI-based follow-up action items from a medical note and save them
+
+    Saved results are cached by note content, so calling this again for a
+    note whose text and summary have not changed returns the earlier actions
+    without recomputing or rewriting them. Nothing is cached if the save
+    fails, so the next call tries again.
 
     Args:
         note_id: ID of the note to analyze
@@ -24,6 +278,118 @@ def generate_follow_up_actions(note_id):
     if not note:
         return {"error": "Note not found"}
 
+    actions, cached = _compute_follow_up_actions(note)
+
+    # Only results that were saved are cached; nothing is saved if the
+    # note was deleted while its actions were being generated
+    if not cached and save_follow_up_actions(note_id, actions, get_patient_name(note)):
+        _remember_follow_up_actions(note, actions)
+
+    return actions
+
+
+def generate_follow_up_actions_batch(note_ids=None):
+    """
+    Generate follow-up actions for many notes and save them in one transaction
+
+    Args:
+        note_ids (list): Notes to process (defaults to every note)
+
+    Returns:
+        int: Number of notes whose actions were saved
+    """
+    notes = []
+    follow_ups = []
+    for note in get_notes_with_summaries(note_ids):
+        try:
+            follow_ups.append((note["id"], compute_follow_up_actions(note), get_patient_name(note)))
+            notes.append(note)
+        except Exception as e:
+            print(f"Error generating follow-up actions for note {note['id']}: {str(e)}")
+
+    saved = save_follow_up_actions_batch(follow_ups)
+
+    # The batch is one transaction, so either every note was saved or none
+    # (or some were deleted meanwhile, and which ones is not known)
+    if follow_ups and saved == len(follow_ups):
+        for note, (_, actions, _) in zip(notes, follow_ups):
+            _remember_follow_up_actions(note, actions)
+
+    return saved
+
+
+def _submit_regeneration(fn, *args):
+    """Run fn on the regeneration pool (call with _regeneration_lock held)"""
+    global _regeneration_executor
+    if _regeneration_executor is None:
+        _regeneration_executor = ThreadPoolExecutor(
+            max_workers=FOLLOW_UP_REGENERATION_WORKERS, thread_name_prefix="follow-up"
+        )
+    _regeneration_executor.submit(fn, *args)
+
+
+def _queue_regeneration(note_id, **_):
+    """Regenerate a note's follow-ups in the background, merging repeated changes"""
+    with _regeneration_lock:
+        if note_id in _pending_regenerations:
+            return
+        _pending_regenerations.add(note_id)
+        _submit_regeneration(_regenerate, note_id)
+
+
+def _queue_batch_regeneration(note_ids, **_):
+    """Regenerate the follow-ups of a batch of notes in one background run"""
+    if not note_ids:
+        return
+    with _regeneration_lock:
+        _submit_regeneration(_regenerate_batch, list(note_ids))
+
+
+def _regenerate(note_id):
+    """Regenerate and save one note's follow-ups (runs on the regeneration pool)"""
+    # Changes arriving from here on queue another run
+    with _regeneration_lock:
+        _pending_regenerations.discard(note_id)
+    try:
+        actions = generate_follow_up_actions(note_id)
+        if "error" in actions:
+            print(f"Could not regenerate follow-up actions for note {note_id}: {actions['error']}")
+    except Exception as e:
+        print(f"Error regenerating follow-up actions for note {note_id}: {str(e)}")
+
+
+def _regenerate_batch(note_ids):
+    """Regenerate and save a batch of follow-ups in one transaction (runs on the regeneration pool)"""
+    try:
+        saved = generate_follow_up_actions_batch(note_ids)
+        print(f"Regenerated follow-up actions for {saved} of {len(note_ids)} notes")
+    except Exception as e:
+        print(f"Error regenerating follow-up actions for {len(note_ids)} notes: {str(e)}")
+
+
+def _forget_deleted_note(note_id, **_):
+    """Drop cached data for a deleted note"""
+    forget_follow_up_actions(note_id)
+    forget_note_document(note_id)
+
+
+def start_follow_up_subscriber():
+    """
+    Keep stored follow-up actions current as notes change
+
+    Subscribes to the data layer's events: saving or editing a note or its
+    summary regenerates that note's follow-ups in the background, a batch
+    of saved summaries regenerates the batch's follow-ups in one
+    transaction, and deleting a note drops its cached results.
+    """
+    for event in (events.NOTE_SAVED, events.NOTE_EDITED, events.SUMMARY_SAVED):
+        events.subscribe(event, _queue_regeneration)
+    events.subscribe(events.SUMMARIES_SAVED, _queue_batch_regeneration)
+    events.subscribe(events.NOTE_DELETED, _forget_deleted_note)
+
+
+def _build_follow_up_actions(note_id, note):
+    """Run every analyzer over a note and assemble its follow-up actions"""
     # Initialize actions structure
     actions = {
         "patient_actions": [],
@@ -33,8 +399,8 @@ def generate_follow_up_actions(note_id):
         "generated_at": datetime.now().isoformat(),
     }
 
-    # Extract information from the original note (raw conversation text)
-    note_text = note.get("original", "")
+    # Scan the original note (raw conversation text) once for all analyzers
+    note_text = get_note_document(note_id, note.get("original", ""))
 
     # Process the extracted summary (if available)
     if note.get("summary"):
@@ -97,12 +463,11 @@ def generate_follow_up_actions(note_id):
     # Extract all explicit instructions from conversation regardless of summary
     explicit_instructions = extract_explicit_instructions(note_text)
 
-    # Add explicit patient instructions
+    # Add explicit patient instructions not already covered by an action
+    seen_patient = {action["action"].lower() for action in actions["patient_actions"]}
     for instruction in explicit_instructions.get("patient", []):
-        if not any(
-            action["action"].lower() == instruction.lower()
-            for action in actions["patient_actions"]
-        ):
+        if instruction.lower() not in seen_patient:
+            seen_patient.add(instruction.lower())
             actions["patient_actions"].append(
                 {
                     "action": instruction,
@@ -112,12 +477,11 @@ def generate_follow_up_actions(note_id):
                 }
             )
 
-    # Add explicit doctor follow-up actions
+    # Add explicit doctor follow-up actions not already covered by an action
+    seen_doctor = {action["action"].lower() for action in actions["doctor_actions"]}
     for instruction in explicit_instructions.get("doctor", []):
-        if not any(
-            action["action"].lower() == instruction.lower()
-            for action in actions["doctor_actions"]
-        ):
+        if instruction.lower() not in seen_doctor:
+            seen_doctor.add(instruction.lower())
             actions["doctor_actions"].append(
                 {
                     "action": instruction,
@@ -150,160 +514,13 @@ def generate_follow_up_actions(note_id):
             }
         )
 
-    # Save the follow-up actions to the database
-    save_follow_up_actions(note_id, actions)
-
     return actions
 
 
-def get_note_by_id(note_id):
-    """Get a specific note by its ID"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-    SELECT n.id, n.text, n.created_at, s.summary_data
-    FROM notes n
-    LEFT JOIN summaries s ON n.id = s.note_id
-    WHERE n.id = ?
-    """,
-        (note_id,),
-    )
-
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        return None
-
-    note = {"id": row["id"], "original": row["text"], "created_at": row["created_at"]}
-
-    if row["summary_data"]:
-        try:
-            note["summary"] = json.loads(row["summary_data"])
-        except json.JSONDecodeError:
-            note["summary"] = None
-    else:
-        note["summary"] = None
-
-    conn.close()
-    return note
-
-
-def save_follow_up_actions(note_id, actions):
-    """Save follow-up actions to the database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Create follow_up_actions table if it doesn't exist
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS follow_up_actions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        note_id INTEGER NOT NULL,
-        actions_data TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE CASCADE
-    )
-    """)
-
-    # Check if we already have actions for this note
-    cursor.execute("SELECT id FROM follow_up_actions WHERE note_id = ?", (note_id,))
-    existing = cursor.fetchone()
-
-    actions_json = json.dumps(actions)
-
-    if existing:
-        # Update existing actions
-        cursor.execute(
-            "UPDATE follow_up_actions SET actions_data = ? WHERE note_id = ?",
-            (actions_json, note_id),
-        )
-    else:
-        # Insert new actions
-        cursor.execute(
-            "INSERT INTO follow_up_actions (note_id, actions_data) VALUES (?, ?)",
-            (note_id, actions_json),
-        )
-
-    conn.commit()
-    conn.close()
-
-
-def get_follow_up_actions(note_id):
-    """Get follow-up actions for a note"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-    SELECT actions_data
-    FROM follow_up_actions
-    WHERE note_id = ?
-    """,
-        (note_id,),
-    )
-
-    row = cursor.fetchone()
-    conn.close()
-
-    if row and row["actions_data"]:
-        try:
-            return json.loads(row["actions_data"])
-        except json.JSONDecodeError:
-            return None
-
-    return None
-
-
 def generate_symptom_actions(symptoms, note_text):
     """Generate action items based on reported symptoms"""
     actions = []
-
-    # Common symptoms and their standard monitoring/management actions
-    symptom_actions = {
-        "fever": {
-            "action": "Monitor temperature daily",
-            "priority": "medium",
-            "context": "For fever management",
-        },
-        "headache": {
-            "action": "Track headache frequency, intensity, and triggers",
-            "priority": "medium",
-            "context": "For headache management",
-        },
-        "cough": {
-            "action": "Monitor cough characteristics and note any changes",
-            "priority": "medium",
-            "context": "For respiratory symptom tracking",
-        },
-        "pain": {
-            "action": "Rate pain level daily on a scale of 1-10",
-            "priority": "medium",
-            "context": "For pain management",
-        },
-        "dizziness": {
-            "action": "Avoid driving and hazardous activities while experiencing dizziness",
-            "priority": "high",
-            "context": "For safety",
-        },
-        "breathing": {
-            "action": "Monitor breathing difficulty and seek immediate care if it worsens",
-            "priority": "high",
-            "context": "For respiratory safety",
-        },
-        "chest pain": {
-            "action": "Seek emergency care immediately if chest pain occurs",
-            "priority": "high",
-            "context": "For cardiac safety",
-        },
-        "blood pressure": {
-            "action": "Measure blood pressure daily and keep a log",
-            "priority": "high",
-            "context": "For blood pressure management",
-        },
-    }
+    document = as_note_document(note_text)
 
     # Add actions for each recognized symptom
     for symptom in symptoms:
@@ -311,7 +528,7 @@ def generate_symptom_actions(symptoms, note_text):
         symptom_lower = symptom.lower()
 
         # Find specific instructions in note text related to this symptom
-        custom_instruction = find_symptom_instruction(note_text, symptom)
+        custom_instruction = find_symptom_instruction(document, symptom)
         if custom_instruction:
             actions.append(
                 {
@@ -326,7 +543,7 @@ def generate_symptom_actions(symptoms, note_text):
 
         # Otherwise use standard actions
         matched = False
-        for key, action_info in symptom_actions.items():
+        for key, action_info in SYMPTOM_ACTIONS.items():
             if key in symptom_lower:
                 actions.append(
                     {
@@ -357,18 +574,18 @@ def generate_symptom_actions(symptoms, note_text):
 
 def find_symptom_instruction(note_text, symptom):
     """Find specific instructions for managing a symptom in the note text"""
-    # Common instruction phrases
-    instruction_patterns = [
-        rf"(?:for|with) (?:the|your) {symptom}[,\s]+(?:you should|please) ([^\.]+)",
-        rf"(?:to manage|to treat|to handle|for) (?:the|your) {symptom}[,\s]+([^\.]+)",
-        rf"(?:I recommend|I suggest|try|consider) ([^\.]+) for (?:the|your) {symptom}",
-        rf"{symptom}[^\.]+ (?:can be managed by|can be treated with|should be) ([^\.]+)",
-    ]
-
-    for pattern in instruction_patterns:
-        match = re.search(pattern, note_text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
+    document = as_note_document(note_text)
+
+    # Every pattern stays within one sentence, so only sentences naming the symptom can match
+    sentences = document.sentences_containing(symptom)
+    if not sentences:
+        return None
+
+    for pattern in _symptom_patterns(symptom):
+        for sentence in sentences:
+            match = pattern.search(sentence)
+            if match:
+                return match.group(1).strip()
 
     return None
 
@@ -376,6 +593,7 @@ def find_symptom_instruction(note_text, symptom):
 def generate_medication_actions(medications, note_text):
     """Generate action items based on medications"""
     actions = []
+    document = as_note_document(note_text)
 
     for medication in medications:
         # Extract medication name from potentially complex string
@@ -383,7 +601,7 @@ def generate_medication_actions(medications, note_text):
         med_name = med_parts[0]  # Default to first word as medication name
 
         # Look for dosing instructions in the original text
-        dosing_instruction = find_medication_instruction(note_text, med_name)
+        dosing_instruction = find_medication_instruction(document, med_name)
 
         # Create the action based on whether we found specific instructions
         if dosing_instruction:
@@ -402,9 +620,11 @@ def generate_medication_actions(medications, note_text):
             }
         )
 
+        _, new_med_pattern, refill_pattern = _medication_patterns(med_name)
+        sentences = document.sentences_containing(med_name)
+
         # Check if it's a new medication (look for keywords in note)
-        new_med_pattern = rf"(?:start|begin|new|prescrib\w+|initiat\w+)[^\.]*{med_name}"
-        if re.search(new_med_pattern, note_text, re.IGNORECASE):
+        if _search_sentences(new_med_pattern, sentences):
             actions.append(
                 {
                     "action": f"Watch for side effects from {med_name} and report them to your doctor",
@@ -416,10 +636,7 @@ def generate_medication_actions(medications, note_text):
             )
 
         # Check for refill instructions
-        refill_pattern = (
-            rf"(?:refill|renew)[^\.]*{med_name}[^\.]* (?:in|after|before) ([^\.]+)"
-        )
-        refill_match = re.search(refill_pattern, note_text, re.IGNORECASE)
+        refill_match = _search_sentences(refill_pattern, sentences)
         if refill_match:
             actions.append(
                 {
@@ -436,42 +653,35 @@ def generate_medication_actions(medications, note_text):
 
 def find_medication_instruction(note_text, medication):
     """Find specific dosing instructions for a medication in the note text"""
-    # Common dosing instruction patterns
-    instruction_patterns = [
-        rf"{medication}[^\.]* (\d+\s*\w+(?:\s+\d+\s*\w+)?\s+(?:once|twice|three times|every|daily|weekly|monthly)[^\.]+)",
-        rf"[tT]ake[^\.]* {medication}[^\.]* (\d+\s*\w+(?:\s+\d+\s*\w+)?\s+(?:once|twice|three times|every|daily|weekly|monthly)[^\.]+)",
-        rf"{medication}[^\.]* (\d+\s*\w+(?:\s+\d+\s*\w+)?)[^\.]* (?:once|twice|three times|every|daily|weekly|monthly)[^\.]+",
-        rf"[pP]rescrib\w+[^\.]* {medication}[^\.]* (\d+\s*\w+(?:\s+\d+\s*\w+)?)[^\.]* (?:once|twice|three times|every|daily|weekly|monthly)[^\.]+",
-    ]
-
-    for pattern in instruction_patterns:
-        match = re.search(pattern, note_text, re.IGNORECASE)
+    sentences = as_note_document(note_text).sentences_containing(medication)
+    if not sentences:
+        return None
+
+    for pattern in _medication_patterns(medication)[0]:
+        match = _search_sentences(pattern, sentences)
         if match:
             return match.group(1).strip()
 
     return None
 
 
+def _search_sentences(pattern, sentences):
+    """First match of a pattern in the given sentences, in note order"""
+    for sentence in sentences:
+        match = pattern.search(sentence)
+        if match:
+            return match
+    return None
+
+
 def generate_lifestyle_actions(lifestyle_info, note_text):
     """Generate action items based on lifestyle recommendations"""
     actions = []
 
     # Extract explicit lifestyle recommendations from the note text
-    lifestyle_patterns = [
-        r"(?:recommend|suggest|advise)[^\.]* (?:to) ([^\.]+) (?:for|to improve)",
-        r"(?:increase|decrease|reduce|limit|avoid|quit)[^\.]* ([^\.]+)",
-        r"(?:exercise|diet|nutrition|sleep|stress)[^\.]* (?:should|need to|must) ([^\.]+)",
-        r"(?:important|essential|crucial|critical) (?:to|that you) ([^\.]+)",
-    ]
-
-    lifestyle_recommendations = []
-
-    for pattern in lifestyle_patterns:
-        matches = re.finditer(pattern, note_text, re.IGNORECASE)
-        for match in matches:
-            recommendation = match.group(1).strip()
-            if len(recommendation) > 10:  # Ensure it's a substantial recommendation
-                lifestyle_recommendations.append(recommendation)
+    lifestyle_recommendations = as_note_document(note_text).memoize(
+        "lifestyle_recommendations", _extract_lifestyle_recommendations
+    )
 
     # Add the extracted lifestyle recommendations
     for recommendation in lifestyle_recommendations:
@@ -532,9 +742,21 @@ def generate_lifestyle_actions(lifestyle_info, note_text):
     return actions
 
 
+def _extract_lifestyle_recommendations(document):
+    """Scan a NoteDocument for explicit lifestyle recommendations"""
+    recommendations = []
+    for pattern in LIFESTYLE_PATTERNS:
+        for match in pattern.finditer(document.text):
+            recommendation = match.group(1).strip()
+            if len(recommendation) > 10:  # Ensure it's a substantial recommendation
+                recommendations.append(recommendation)
+    return recommendations
+
+
 def generate_complaint_actions(complaints, note_text):
     """Generate action items for the doctor based on chief complaints"""
     actions = []
+    document = as_note_document(note_text)
 
     for complaint in complaints:
         # Default action for follow-up
@@ -549,14 +771,9 @@ def generate_complaint_actions(complaints, note_text):
         )
 
         # Look for specific doctor actions mentioned in the note for this complaint
-        complaint_patterns = [
-            rf"(?:I'll|I will|we'll|we will|need to)[^\.]* (?:check|evaluate|assess|monitor|review)[^\.]* {complaint}[^\.]* (?:at|during|in|next)[^\.]+",
-            rf"(?:let's|let us|will)[^\.]* (?:see|check|evaluate|assess|review)[^\.]* {complaint}[^\.]* (?:again|next)[^\.]+",
-            rf"(?:important|essential|critical|crucial)[^\.]* (?:to|that I)[^\.]* (?:review|check|evaluate|monitor|follow up on)[^\.]* {complaint}",
-        ]
-
-        for pattern in complaint_patterns:
-            match = re.search(pattern, note_text, re.IGNORECASE)
+        sentences = document.sentences_containing(complaint)
+        for pattern in _complaint_patterns(complaint) if sentences else ():
+            match = _search_sentences(pattern, sentences)
             if match:
                 action_text = match.group(0).strip()
                 actions.append(
@@ -633,13 +850,10 @@ def generate_follow_up_recommendation(
 ):
     """Generate follow-up recommendation based on the medical context"""
     today = datetime.now()
+    note_text = as_note_document(note_text).text
 
     # First check for explicit follow-up timing in the note
-    follow_up_match = re.search(
-        r"(?:follow up|follow-up|see me|come back)[^\.]* (?:in|after) ([^\.,]+)",
-        note_text,
-        re.IGNORECASE,
-    )
+    follow_up_match = FOLLOW_UP_TIMING_PATTERN.search(note_text)
 
     if follow_up_match:
         time_frame = follow_up_match.group(1).strip().lower()
@@ -676,15 +890,6 @@ def generate_follow_up_recommendation(
         "urgency": "routine",
     }
 
-    # Check for urgent conditions that require immediate follow-up
-    urgent_keywords = ["severe", "acute", "intense", "worst", "emergency", "unbearable"]
-    urgent_symptoms = [
-        "chest pain",
-        "difficulty breathing",
-        "shortness of breath",
-        "severe pain",
-    ]
-
     # Check complaints and symptoms for urgent conditions
     all_issues = complaints + symptoms
 
@@ -692,13 +897,13 @@ def generate_follow_up_recommendation(
         issue_lower = issue.lower()
 
         # Check for urgent keywords
-        if any(keyword in issue_lower for keyword in urgent_keywords):
+        if any(keyword in issue_lower for keyword in URGENT_KEYWORDS):
             follow_up["date"] = (today + timedelta(days=7)).strftime("%Y-%m-%d")
             follow_up["urgency"] = "urgent"
             break
 
         # Check for urgent symptoms
-        if any(symptom in issue_lower for symptom in urgent_symptoms):
+        if any(symptom in issue_lower for symptom in URGENT_SYMPTOMS):
             follow_up["date"] = (today + timedelta(days=7)).strftime("%Y-%m-%d")
             follow_up["urgency"] = "urgent"
             break
@@ -713,30 +918,12 @@ def generate_follow_up_recommendation(
 def extract_number_from_text(text):
     """Extract a number from text like 'two weeks' or '3 months'"""
     # First try to find numeric value
-    num_match = re.search(r"(\d+)", text)
+    num_match = NUMBER_PATTERN.search(text)
     if num_match:
         return int(num_match.group(1))
 
     # If no numeric value, check for written numbers
-    word_to_num = {
-        "one": 1,
-        "two": 2,
-        "three": 3,
-        "four": 4,
-        "five": 5,
-        "six": 6,
-        "seven": 7,
-        "eight": 8,
-        "nine": 9,
-        "ten": 10,
-        "eleven": 11,
-        "twelve": 12,
-        "couple": 2,
-        "few": 3,
-        "several": 4,
-    }
-
-    for word, num in word_to_num.items():
+    for word, num in WORD_TO_NUM.items():
         if word in text:
             return num
 
@@ -746,81 +933,61 @@ def extract_number_from_text(text):
 
 def extract_explicit_instructions(note_text):
     """Extract explicit instructions from the note text"""
-    instructions = {"patient": [], "doctor": []}
+    # The result only depends on the note, so it is computed once per document
+    return as_note_document(note_text).memoize(
+        "explicit_instructions", _extract_explicit_instructions
+    )
 
-    # Patterns for patient instructions
-    patient_patterns = [
-        r"(?:you should|you need to|make sure to|be sure to|remember to|don't forget to|please) ([^\.]+)",
-        r"(?:I want you to|I'd like you to|I recommend|I suggest) ([^\.]+)",
-        r"(?:it's important|it is important|it's crucial|it is crucial) (?:to|that you) ([^\.]+)",
-    ]
 
-    # Patterns for doctor's own reminders
-    doctor_patterns = [
-        r"(?:I should|I need to|I'll|I will|we should|we need to|we'll|we will) ([^\.]+)",
-        r"(?:need to|should|must|have to|let's|we'll) (?:check|follow up on|remember|monitor|track|review) ([^\.]+)",
-        r"(?:remember to|don't forget to|make a note to) ([^\.]+)",
-    ]
+def _extract_explicit_instructions(document):
+    """Scan a NoteDocument for patient instructions and doctor reminders"""
+    instructions = {"patient": [], "doctor": []}
+    seen = {"patient": set(), "doctor": set()}
 
     # Extract patient instructions
-    for pattern in patient_patterns:
-        matches = re.finditer(pattern, note_text, re.IGNORECASE)
-        for match in matches:
+    for pattern in PATIENT_INSTRUCTION_PATTERNS:
+        for match in pattern.finditer(document.text):
             instruction = match.group(1).strip()
-            if len(instruction) > 5 and not any(
-                i.lower() == instruction.lower() for i in instructions["patient"]
-            ):
+            key = instruction.lower()
+            if len(instruction) > 5 and key not in seen["patient"]:
+                seen["patient"].add(key)
                 instructions["patient"].append(instruction)
 
     # Extract doctor reminders
-    for pattern in doctor_patterns:
-        matches = re.finditer(pattern, note_text, re.IGNORECASE)
-        for match in matches:
-            try:
-                # Different patterns may have the instruction in different capture groups
-                instruction = (
-                    match.group(1).strip() if match.group(1) else match.group(0).strip()
-                )
-                if len(instruction) > 5 and not any(
-                    i.lower() == instruction.lower() for i in instructions["doctor"]
-                ):
-                    instructions["doctor"].append(instruction)
-            except IndexError:
-                continue
+    for pattern in DOCTOR_INSTRUCTION_PATTERNS:
+        for match in pattern.finditer(document.text):
+            # Different patterns may have the instruction in different capture groups
+            instruction = (
+                match.group(1).strip() if match.group(1) else match.group(0).strip()
+            )
+            key = instruction.lower()
+            if len(instruction) > 5 and key not in seen["doctor"]:
+                seen["doctor"].add(key)
+                instructions["doctor"].append(instruction)
 
     return instructions
 
 
 def extract_tests_and_referrals(note_text):
     """Extract mentioned tests or referrals from the note text"""
-    test_referrals = []
+    return as_note_document(note_text).memoize(
+        "tests_and_referrals", _extract_tests_and_referrals
+    )
+
 
-    # Look for test patterns
-    test_patterns = [
-        r"(?:order|get|need|require|recommend)(?:\s+an?)?\s+([\w\s]+(?:test|scan|x-ray|mri|ct|ultrasound|blood\s+work))",
-        r"(?:refer|send)(?:\s+to)?\s+(?:a|an)?\s+([\w\s]+(?:specialist|doctor|cardiologist|neurologist|dermatologist|surgeon))",
-    ]
+def _extract_tests_and_referrals(document):
+    """Scan a NoteDocument for ordered tests and referrals"""
+    test_referrals = []
 
-    for pattern in test_patterns:
-        matches = re.finditer(pattern, note_text, re.IGNORECASE)
+    for pattern in TEST_REFERRAL_PATTERNS:
+        matches = pattern.finditer(document.text)
         for match in matches:
             item_name = match.group(1).strip()
 
             # Determine if it's a test or referral
             item_type = (
                 "test"
-                if any(
-                    word in item_name.lower()
-                    for word in [
-                        "test",
-                        "scan",
-                        "x-ray",
-                        "mri",
-                        "ct",
-                        "ultrasound",
-                        "blood",
-                    ]
-                )
+                if any(word in item_name.lower() for word in TEST_WORDS)
                 else "referral"
             )
 
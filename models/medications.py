@@ -0,0 +1,277 @@
+"""
+Medications module for Health Companion app
+
+Normalizes medication strings such as "Glucophage 500mg BID" into a
+canonical drug name ("Metformin"), a dose with its unit and a frequency.
+Names are resolved through an in-memory index of canonical names and their
+brand/generic synonyms, loaded once from a bundled data file, so resolving a
+name is a dictionary lookup. Parsed strings are memoized, since the same
+medication is listed at visit after visit.
+"""
+import os
+import re
+import threading
+from functools import lru_cache
+
+# "Canonical: synonym, synonym" per line; MEDICATIONS_FILE overrides the bundled list
+MEDICATIONS_FILE = os.environ.get(
+    "MEDICATIONS_FILE", os.path.join(os.path.dirname(__file__), "data", "medications.txt")
+)
+
+# Used when the medications file cannot be read
+DEFAULT_MEDICATIONS = {
+    "Metformin": ["Glucophage"],
+    "Lisinopril": ["Zestril", "Prinivil"],
+    "Atorvastatin": ["Lipitor"],
+    "Amlodipine": ["Norvasc"],
+    "Acetaminophen": ["paracetamol", "Tylenol"],
+    "Ibuprofen": ["Advil", "Motrin"],
+    "Aspirin": ["acetylsalicylic acid", "ASA"],
+    "Omeprazole": ["Prilosec"],
+    "Levothyroxine": ["Synthroid"],
+    "Albuterol": ["salbutamol", "Ventolin"],
+}
+
+# Number of distinct medication strings whose parse is kept
+MEDICATION_CACHE_SIZE = 4096
+
+DOSE_PATTERN = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(mcg|µg|ug|mg|g|ml|units?|iu|tablets?|tabs?|caps?|capsules?|pills?|puffs?)\b",
+    re.IGNORECASE,
+)
+
+# Frequency phrases and the canonical frequency they mean; longer phrases first
+FREQUENCIES = [
+    (r"four times (?:a |per )?day|four times daily|qid", "four times daily"),
+    (r"three times (?:a |per )?day|three times daily|tid", "three times daily"),
+    (r"twice (?:a |per )?day|twice daily|two times (?:a |per )?day|bid", "twice daily"),
+    (r"once (?:a |per )?day|once daily|every day|per day|daily|qd", "daily"),
+    (r"at bedtime|nightly|qhs", "at bedtime"),
+    (r"once (?:a |per )?week|weekly", "weekly"),
+    (r"as needed|prn", "as needed"),
+]
+FREQUENCY_PATTERN = re.compile(
+    r"(?<!\w)(?:" + "|".join(f"({phrases})" for phrases, _ in FREQUENCIES) + r")(?!\w)",
+    re.IGNORECASE,
+)
+
+# Where the name ends: the first dose or frequency
+NAME_END_PATTERN = re.compile(
+    r"\s+(?:\d|(?:once|twice|three times|four times|daily|BID|TID|QID|QD|PRN|as needed)\b)",
+    re.IGNORECASE,
+)
+
+# Written units and the unit they are reported in
+UNIT_ALIASES = {
+    "µg": "mcg", "ug": "mcg", "unit": "units", "iu": "units",
+    "tablets": "tablet", "tab": "tablet", "tabs": "tablet",
+    "cap": "capsule", "caps": "capsule", "capsules": "capsule",
+    "pills": "pill", "puffs": "puff",
+}
+
+# Mass units converted to milligrams so doses in different units compare
+MG_PER_UNIT = {"mcg": 0.001, "mg": 1.0, "g": 1000.0}
+
+
+def load_medications(path=MEDICATIONS_FILE):
+    """
+    Read canonical medication names and synonyms from a data file
+
+    Args:
+        path (str): File with "Canonical: synonym, synonym" lines; blank
+            lines and lines starting with # are skipped
+
+    Returns:
+        dict: Canonical name -> list of synonyms, in file order
+    """
+    medications = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            name, _, synonyms = line.partition(":")
+            medications[name.strip()] = [s.strip() for s in synonyms.split(",") if s.strip()]
+    return medications
+
+
+def _name_key(name):
+    """Lookup key for a medication name: lowercase, single spaces, no edge punctuation"""
+    return " ".join(name.lower().replace("-", " ").split()).strip(" ,;:()")
+
+
+def _unknown_name(written_name):
+    """
+    Name for a medication missing from the index
+
+    Case and spacing are normalized, so "Foo 5mg" and "foo  5mg" both
+    become "Foo" and share a timeline.
+    """
+    name = " ".join(written_name.lower().split())
+    return name[:1].upper() + name[1:]
+
+
+class MedicationIndex:
+    """In-memory index from every known name of a medication to its canonical name"""
+
+    def __init__(self, medications):
+        """
+        Build the index
+
+        Args:
+            medications (dict): Canonical name -> list of synonyms
+        """
+        self.canonical = {}
+        for name, synonyms in medications.items():
+            for alias in [name, *synonyms]:
+                # The first medication listing a synonym keeps it
+                self.canonical.setdefault(_name_key(alias), name)
+        self.max_words = max((len(key.split()) for key in self.canonical), default=0)
+
+    def canonical_name(self, name):
+        """
+        Canonical name for a medication name as written
+
+        Trailing words are dropped until a known name is left, so
+        "Metformin ER" and "metoprolol succinate tablets" still resolve.
+
+        Args:
+            name (str): Medication name without dose or frequency
+
+        Returns:
+            str: The canonical name, or None if the name is not in the index
+        """
+        words = _name_key(name).split()[:self.max_words]
+        while words:
+            canonical = self.canonical.get(" ".join(words))
+            if canonical is not None:
+                return canonical
+            words.pop()
+        return None
+
+    def parse(self, medication):
+        """
+        Split a medication string into name, dose and frequency
+
+        Args:
+            medication (str): Medication as listed, e.g. "Glucophage 500 mg BID"
+
+        Returns:
+            dict: name (canonical name, or the normalized written name if unknown),
+                written_name, known, dose (float), unit, frequency
+                (e.g. "twice daily"); dose, unit and frequency are None when
+                not given
+        """
+        text = medication.strip()
+        end = NAME_END_PATTERN.search(text)
+        written_name = (text[:end.start()] if end else text).strip()
+        canonical = self.canonical_name(written_name)
+
+        dose = unit = None
+        dose_match = DOSE_PATTERN.search(text)
+        if dose_match:
+            dose = float(dose_match.group(1))
+            unit = dose_match.group(2).lower()
+            unit = UNIT_ALIASES.get(unit, unit)
+
+        frequency = None
+        # "500mg/day" reads as "500mg per day"
+        frequency_match = FREQUENCY_PATTERN.search(text.replace("/", " per "))
+        if frequency_match:
+            frequency = FREQUENCIES[frequency_match.lastindex - 1][1]
+
+        return {
+            "name": canonical or _unknown_name(written_name),
+            "written_name": written_name,
+            "known": canonical is not None,
+            "dose": dose,
+            "unit": unit,
+            "frequency": frequency,
+        }
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_medication_index():
+    """
+    Get the shared medication index, loading the data file on first use
+
+    Returns:
+        MedicationIndex
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                medications = load_medications()
+            except OSError as e:
+                print(f"Could not read medications from {MEDICATIONS_FILE} ({e}), using the built-in list")
+                medications = DEFAULT_MEDICATIONS
+            _index = MedicationIndex(medications)
+        return _index
+
+
+@lru_cache(maxsize=MEDICATION_CACHE_SIZE)
+def _parse_medication(medication):
+    return get_medication_index().parse(medication)
+
+
+def normalize_medication(medication):
+    """
+    Parse a medication string with the shared index (memoized)
+
+    Args:
+        medication (str): Medication as listed in a note or summary
+
+    Returns:
+        dict: See MedicationIndex.parse
+    """
+    return dict(_parse_medication(medication))
+
+
+def same_dosage(first, second):
+    """
+    Whether two written dosages are the same dose
+
+    Amounts are compared after converting masses to mg, so "500mg" and
+    "0.5 g" match. Frequencies are compared only when both dosages give one.
+    Dosages without a recognizable amount are compared as text.
+
+    Args:
+        first (str): Dosage as written
+        second (str): Dosage as written
+
+    Returns:
+        bool
+    """
+    a, b = normalize_medication(first), normalize_medication(second)
+    if a["dose"] is None or b["dose"] is None:
+        return " ".join(first.lower().split()) == " ".join(second.lower().split())
+    if _dose_amount(a) != _dose_amount(b):
+        return False
+    return not (a["frequency"] and b["frequency"] and a["frequency"] != b["frequency"])
+
+
+def dose_mg(medication):
+    """
+    Dose of a medication string in milligrams
+
+    Args:
+        medication (str): Medication or dosage as written, e.g. "0.5 g daily"
+
+    Returns:
+        float: The dose in mg, or None if no mass dose is given
+    """
+    parsed = normalize_medication(medication)
+    if parsed["dose"] is None or parsed["unit"] not in MG_PER_UNIT:
+        return None
+    return _dose_amount(parsed)[0]
+
+
+def _dose_amount(parsed):
+    """(amount, unit) of a parsed dose, with masses converted to mg"""
+    if parsed["unit"] in MG_PER_UNIT:
+        return (round(parsed["dose"] * MG_PER_UNIT[parsed["unit"]], 6), "mg")
+    return (parsed["dose"], parsed["unit"])
@@ -0,0 +1,180 @@
+"""
+Note Document module for Health Companion app
+
+A NoteDocument is built once per note and shared by the analyzers. It holds
+the lowercase text and the sentence spans, so an analyzer looking for a term
+can go straight to the sentences naming it instead of re-scanning and
+re-lowercasing the raw note.
+"""
+import copy
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+# Number of documents kept in the per-process cache
+DOCUMENT_CACHE_SIZE = 256
+
+
+class NoteDocument:
+    """
+    Pre-scanned view of a note's text
+
+    Sentences are the spans between periods, the same boundaries the
+    analyzers' ``[^\\.]+`` patterns stop at, so running a pattern over each
+    candidate sentence finds the same matches as running it over the note.
+    """
+
+    def __init__(self, text):
+        self.text = text or ""
+        self.lower = self.text.lower()
+        self.sentence_spans = self._split_sentences()
+        self._sentence_starts = [start for start, _ in self.sentence_spans]
+        self._memo = {}
+
+    def _split_sentences(self):
+        """Find the (start, end) span of every period-delimited sentence"""
+        spans = []
+        start = 0
+        text = self.text
+        while True:
+            end = text.find(".", start)
+            if end == -1:
+                if start < len(text):
+                    spans.append((start, len(text)))
+                break
+            if end > start:
+                spans.append((start, end))
+            start = end + 1
+        return spans
+
+    def sentence(self, index):
+        """Text of the sentence at the given index"""
+        start, end = self.sentence_spans[index]
+        return self.text[start:end]
+
+    def sentence_index_at(self, offset):
+        """Index of the sentence containing a character offset, or None"""
+        index = bisect_right(self._sentence_starts, offset) - 1
+        if index >= 0 and offset < self.sentence_spans[index][1]:
+            return index
+        return None
+
+    def find_all(self, term):
+        """
+        Character offsets of every case-insensitive occurrence of a term
+
+        Args:
+            term (str): Literal text to look for
+
+        Returns:
+            list: Start offsets in the note text
+        """
+        term = term.lower()
+        if not term:
+            return []
+        offsets = []
+        position = self.lower.find(term)
+        while position != -1:
+            offsets.append(position)
+            position = self.lower.find(term, position + 1)
+        return offsets
+
+    def sentences_containing(self, term):
+        """
+        Sentences that contain a term (case-insensitive), in note order
+
+        Args:
+            term (str): Literal text to look for
+
+        Returns:
+            list: Sentence texts
+        """
+        return [self.sentence(i) for i in self.sentence_indexes_containing(term)]
+
+    def sentence_indexes_containing(self, term):
+        """
+        Indexes of the sentences that contain a term (case-insensitive)
+
+        Args:
+            term (str): Literal text to look for
+
+        Returns:
+            list: Sentence indexes, in note order
+        """
+        indexes = []
+        for offset in self.find_all(term):
+            index = self.sentence_index_at(offset)
+            if index is not None and (not indexes or indexes[-1] != index):
+                # Skip occurrences that straddle a period
+                start, end = self.sentence_spans[index]
+                if offset + len(term) <= end:
+                    indexes.append(index)
+        return indexes
+
+    def memoize(self, key, compute):
+        """
+        Compute a per-note result once and reuse it for later callers
+
+        Args:
+            key (str): Name of the cached result
+            compute (callable): Called with this document on a cache miss
+
+        Returns:
+            A copy of the cached result, so callers may modify it
+        """
+        if key not in self._memo:
+            self._memo[key] = compute(self)
+        return copy.deepcopy(self._memo[key])
+
+
+_cache_lock = threading.Lock()
+_document_cache = OrderedDict()
+
+
+def as_note_document(note):
+    """
+    Return a NoteDocument for either raw text or an existing document
+
+    Args:
+        note: Note text (str) or NoteDocument
+
+    Returns:
+        NoteDocument
+    """
+    if isinstance(note, NoteDocument):
+        return note
+    return NoteDocument(note)
+
+
+def get_note_document(note_id, text):
+    """
+    Get the cached NoteDocument for a note, building it if the text changed
+
+    Args:
+        note_id: Database ID of the note
+        text (str): Current text of the note
+
+    Returns:
+        NoteDocument
+    """
+    with _cache_lock:
+        document = _document_cache.get(note_id)
+        if document is not None and document.text == (text or ""):
+            _document_cache.move_to_end(note_id)
+            return document
+
+    document = NoteDocument(text)
+
+    with _cache_lock:
+        _document_cache[note_id] = document
+        _document_cache.move_to_end(note_id)
+        while len(_document_cache) > DOCUMENT_CACHE_SIZE:
+            _document_cache.popitem(last=False)
+
+    return document
+
+
+def forget_note_document(note_id):
+    """Drop a note's cached document (e.g. after the note is deleted)"""
+    with _cache_lock:
+        _document_cache.pop(note_id, None)
@@ -4,18 +4,116 @@ Enhanced Notes Processor module with audio transcription
 import json
 import re
 import os
-import speech_recognition as sr
-from pydub import AudioSegment
-import tempfile
 from datetime import datetime
+from difflib import SequenceMatcher
+from .note_document import as_note_document
+from .partial_json import PartialJSONObjectParser, parse_json_object
+from .summary import SUMMARY_FIELDS, SUMMARY_LIST_FIELDS, Summary, normalize_field
+from .term_normalizer import get_term_normalizer
 
-def extract_medical_info(text, ai_model=None):
+# How notes are sent to the AI model: "hybrid" (regex first, AI for
+# low-confidence fields only) or "full" (whole note to the AI model)
+EXTRACTION_STRATEGY = os.environ.get("EXTRACTION_STRATEGY", "hybrid")
+
+# Lifestyle habits recognised by the regex extractor (search term -> habit label)
+LIFESTYLE_HABITS = [
+    {"term": "smok", "habit": "Smoking"},
+    {"term": "alcohol", "habit": "Alcohol"},
+    {"term": "drink", "habit": "Drinking"},
+    {"term": "drug", "habit": "Recreational drugs"}
+]
+
+# Regex patterns used by basic_extraction, compiled once at import time
+NAME_PATTERNS = [
+    re.compile(r'(?:patient|name)[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2})', re.IGNORECASE),
+    re.compile(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2})[,\s]+(?:aged?|a)\s+\d+', re.IGNORECASE)
+]
+# Whitespace after the end of a sentence and the next sentence's first letter
+SENTENCE_BREAK_PATTERN = re.compile(r'(?<=[.!?])\s+([^\s.!?])?')
+AGE_PATTERN = re.compile(r'\b(\d{1,3})[\s-]*(years?|yrs?|y\.o\.?|year old)\b', re.IGNORECASE)
+GENDER_PATTERNS = [
+    re.compile(r'\b(male|female|m/f|f/m|m|f)\b', re.IGNORECASE),
+    re.compile(r'\b(man|woman|boy|girl)\b', re.IGNORECASE)
+]
+MARITAL_PATTERNS = [
+    re.compile(r'\b(single|married|divorced|widowed|separated)\b', re.IGNORECASE)
+]
+RESIDENCE_PATTERNS = [
+    re.compile(r'residing in\s+([A-Za-z\s]+)', re.IGNORECASE),
+    re.compile(r'resident of\s+([A-Za-z\s]+)', re.IGNORECASE),
+    re.compile(r'lives in\s+([A-Za-z\s]+)', re.IGNORECASE),
+    re.compile(r'from\s+([A-Za-z\s]+)', re.IGNORECASE)
+]
+COMPLAINT_PATTERNS = [
+    re.compile(r'(?:chief|main|primary)\s+complaints?[:\s]+([^.;]+)[.;]', re.IGNORECASE),
+    re.compile(r'complains of\s+([^.;]+)[.;]', re.IGNORECASE),
+    re.compile(r'presented with\s+([^.;]+)[.;]', re.IGNORECASE)
+]
+LIST_SPLIT_PATTERN = re.compile(r',\s*(?:and\s+)?|\s+and\s+')
+LOCATION_PATTERN = re.compile(r'(?:in|on|at)\s+(?:the\s+)?([a-z\s]+)', re.IGNORECASE)
+SEVERITY_PATTERN = re.compile(r'(mild|moderate|severe|\d+/10)', re.IGNORECASE)
+COMPLAINT_DURATION_PATTERNS = [
+    re.compile(r'for\s+([^.;]+)', re.IGNORECASE),
+    re.compile(r'(?:since|past|last)\s+([^.;]+)', re.IGNORECASE)
+]
+PAST_HISTORY_PATTERN = re.compile(r'(?:past|previous|medical)\s+history[:\s]+([^.]+)[.]', re.IGNORECASE)
+SURGERY_PATTERN = re.compile(r'(?:history of|previous|underwent)\s+([^.;]+(?:surgery|operation|procedure))[.;]', re.IGNORECASE)
+CHRONIC_DISEASE_PATTERNS = [
+    (disease, re.compile(r'\b' + disease + r'\b', re.IGNORECASE))
+    for disease in ["diabetes", "hypertension", "asthma", "copd", "arthritis",
+                    "cancer", "heart disease", "kidney disease", "liver disease"]
+]
+LIFESTYLE_PATTERNS = [
+    (habit_info, re.compile(r'\b' + habit_info["term"] + r'[a-z]*\b[^.;]*', re.IGNORECASE))
+    for habit_info in LIFESTYLE_HABITS
+]
+HABIT_FREQUENCY_PATTERNS = [
+    re.compile(r'(\d+)[^.;]*(?:times|per|a)\s+(?:day|week|month|year)', re.IGNORECASE),
+    re.compile(r'(?:daily|weekly|monthly|occasionally|rarely|frequently)', re.IGNORECASE)
+]
+HABIT_DURATION_PATTERNS = [
+    re.compile(r'for\s+([^.;]+)', re.IGNORECASE),
+    re.compile(r'(?:since|past|last)\s+([^.;]+)', re.IGNORECASE),
+    re.compile(r'(\d+)\s+(?:years|months)', re.IGNORECASE)
+]
+DRUG_HISTORY_PATTERN = re.compile(r'(?:drug|medication|prescription)\s+history[:\s]+([^.]+)[.]', re.IGNORECASE)
+FAMILY_HISTORY_PATTERN = re.compile(r'family\s+history[:\s]+([^.]+)[.]', re.IGNORECASE)
+FAMILY_CONDITION_PATTERNS = [
+    re.compile(r'\b' + condition + r'\b[^.;]*(?:(?:in|with)\s+(?:father|mother|brother|sister|parent|grandparent))?', re.IGNORECASE)
+    for condition in ["diabetes", "hypertension", "cancer", "heart disease",
+                      "asthma", "stroke", "alzheimer", "arthritis"]
+]
+ALLERGY_PATTERN = re.compile(r'(?:allerg(?:y|ies)|allergic)[:\s]+([^.]+)[.]', re.IGNORECASE)
+# Patterns whose match is keyed on a header or lead-in phrase, so a match
+# split across sentences cannot be re-extracted from one sentence alone
+SECTION_PATTERNS = COMPLAINT_PATTERNS + [
+    PAST_HISTORY_PATTERN, SURGERY_PATTERN, DRUG_HISTORY_PATTERN, FAMILY_HISTORY_PATTERN, ALLERGY_PATTERN
+]
+SYMPTOM_PATTERNS = [
+    (symptom, re.compile(r'\b' + symptom + r'\b', re.IGNORECASE))
+    for symptom in ["fever", "headache", "fatigue", "cough", "nausea", "vomiting",
+                    "dizziness", "pain", "rash", "sore throat", "shortness of breath",
+                    "chest pain", "back pain", "abdominal pain", "diarrhea", "weakness",
+                    "chills", "sweating", "itching", "loss of appetite", "swelling"]
+]
+SYMPTOM_TO_DISEASE = {
+    "fever": ["Common Cold", "Flu", "COVID-19", "Infection"],
+    "headache": ["Migraine", "Tension Headache", "Sinus Infection"],
+    "cough": ["Common Cold", "Bronchitis", "Asthma", "COVID-19"],
+    "nausea": ["Food Poisoning", "Migraine", "Vertigo", "Pregnancy"],
+    "fatigue": ["Anemia", "Depression", "Sleep Apnea", "Hypothyroidism"],
+    "sore throat": ["Strep Throat", "Common Cold", "Tonsillitis"]
+}
+
+def extract_medical_info(text, ai_model=None, strategy=None):
     """
     Extract comprehensive medical information from notes text
     
     Args:
         text (str): The medical note text to process
         ai_model: Optional AI model for advanced extraction (e.g., Gemini)
+        strategy (str): "hybrid" sends only low-confidence fields to the AI
+            model, "full" sends the whole note. Defaults to EXTRACTION_STRATEGY.
         
     Returns:
         dict: Structured medical information
@@ -23,6 +121,9 @@ def extract_medical_info(text, ai_model=None):
     # If AI model is provided, use it for advanced extraction
     if ai_model:
         try:
+            if (strategy or EXTRACTION_STRATEGY) == "hybrid":
+                from .extraction_router import extract_hybrid
+                return extract_hybrid(text, ai_model)
             return extract_with_ai(text, ai_model)
         except Exception as e:
             print(f"Error with AI extraction: {str(e)}")
@@ -32,6 +133,78 @@ def extract_medical_info(text, ai_model=None):
     extracted_info = basic_extraction(text)
     return clean_extracted_info(extracted_info)
 
+def build_extraction_prompt(text):
+    """
+    Build the prompt asking the AI model for the full structured summary
+    
+    Args:
+        text (str): The medical note text
+        
+    Returns:
+        str: Prompt text
+    """
+    # Structure the prompt for better extraction
+    return f"""Extract the following medical information from the given medical note in a structured JSON format:
+
+    1. Patient Details (name, age, gender, marital status, residence)
+    2. Chief Complaints (primary symptoms and duration)
+    3. Chief Complaint Details (location in body, severity on scale 1-10)
+    4. Past History (previous illnesses, surgeries)
+    5. Chronic Diseases (diabetes, hypertension, etc.)
+    6. Lifestyle (smoking, alcohol, recreational drugs with frequency)
+    7. Drug History (current medications)
+    8. Family History (conditions in family members)
+    9. Allergies (especially medication allergies)
+    10. Symptoms (all mentioned symptoms)
+    11. Possible Diseases (based on mentioned symptoms)
+    
+    Instructions:
+    - Extract only if clearly mentioned
+    - Be concise but thorough
+    - IMPORTANT: Return ALL fields in the JSON structure exactly as shown below, even if no information is found
+    - For empty fields, use null for string fields and empty arrays [] for list fields
+    - Prioritize medical relevance
+    - For allergies, be especially thorough - this is critical patient safety information
+
+    Medical Note: "{text}"
+
+    Output Format JSON:
+    {{
+        "patient_details": {{
+            "name": "string or null",
+            "age": "string or null",
+            "gender": "string or null",
+            "marital_status": "string or null",
+            "residence": "string or null"
+        }},
+        "chief_complaints": ["complaint with duration", ...],
+        "chief_complaint_details": [
+            {{
+                "complaint": "string",
+                "location": "string or null",
+                "severity": "string or null", 
+                "duration": "string or null"
+            }},
+            ...
+        ],
+        "past_history": ["previous illness/surgery", ...],
+        "chronic_diseases": ["disease", ...],
+        "lifestyle": [
+            {{
+                "habit": "string",
+                "frequency": "string or null",
+                "duration": "string or null"
+            }},
+            ...
+        ],
+        "drug_history": ["medication", ...],
+        "family_history": ["condition with relation", ...],
+        "allergies": ["allergy", ...],
+        "symptoms": ["symptom", ...],
+        "possible_diseases": ["disease", ...]
+    }}
+    """
+
 def extract_with_ai(text, model):
     """
     Use AI model to extract structured medical information
@@ -44,97 +217,98 @@ def extract_with_ai(text, model):
         dict: Structured medical information
     """
     try:
-        # Structure the prompt for better extraction
-        prompt = f"""Extract the following medical information from the given medical note in a structured JSON format:
-
-        1. Patient Details (name, age, gender, marital status, residence)
-        2. Chief Complaints (primary symptoms and duration)
-        3. Chief Complaint Details (location in body, severity on scale 1-10)
-        4. Past History (previous illnesses, surgeries)
-        5. Chronic Diseases (diabetes, hypertension, etc.)
-        6. Lifestyle (smoking, alcohol, recreational drugs with frequency)
-        7. Drug History (current medications)
-        8. Family History (conditions in family members)
-        9. Allergies (especially medication allergies)
-        10. Symptoms (all mentioned symptoms)
-        11. Possible Diseases (based on mentioned symptoms)
-        
-        Instructions:
-        - Extract only if clearly mentioned
-        - Be concise but thorough
-        - IMPORTANT: Return ALL fields in the JSON structure exactly as shown below, even if no information is found
-        - For empty fields, use null for string fields and empty arrays [] for list fields
-        - Prioritize medical relevance
-        - For allergies, be especially thorough - this is critical patient safety information
-
-        Medical Note: "{text}"
-
-        Output Format JSON:
-        {{
-            "patient_details": {{
-                "name": "string or null",
-                "age": "string or null",
-                "gender": "string or null",
-                "marital_status": "string or null",
-                "residence": "string or null"
-            }},
-            "chief_complaints": ["complaint with duration", ...],
-            "chief_complaint_details": [
-                {{
-                    "complaint": "string",
-                    "location": "string or null",
-                    "severity": "string or null", 
-                    "duration": "string or null"
-                }},
-                ...
-            ],
-            "past_history": ["previous illness/surgery", ...],
-            "chronic_diseases": ["disease", ...],
-            "lifestyle": [
-                {{
-                    "habit": "string",
-                    "frequency": "string or null",
-                    "duration": "string or null"
-                }},
-                ...
-            ],
-            "drug_history": ["medication", ...],
-            "family_history": ["condition with relation", ...],
-            "allergies": ["allergy", ...],
-            "symptoms": ["symptom", ...],
-            "possible_diseases": ["disease", ...]
-        }}
-        """
+        prompt = build_extraction_prompt(text)
         
         # Generate response from AI model
         response = model.generate_content(prompt)
         
-        # Clean up response
-        response_text = response.text.replace('```json', '').replace('```', '').strip()
-        
-        # Parse JSON response
-        try:
-            extracted_info = json.loads(response_text)
-            return clean_extracted_info(extracted_info)
-        except json.JSONDecodeError:
-            # Fall back to basic extraction if JSON is malformed
-            print("Failed to parse AI response as JSON. Falling back to basic extraction.")
-            return basic_extraction(text)
+        # Parse JSON response, keeping any valid fields if it is malformed
+        extracted_info, is_complete = parse_json_object(response.text)
+        if not is_complete:
+            print(f"AI response was not valid JSON, salvaged fields: {', '.join(extracted_info) or 'none'}")
+        return fill_missing_fields(extracted_info, text)
             
     except Exception as e:
         print(f"Error in AI extraction: {str(e)}")
-        return basic_extraction(text)
+        return clean_extracted_info(basic_extraction(text))
+
+def fill_missing_fields(extracted_info, text):
+    """
+    Complete a partial AI extraction with regex results for the missing fields
+    
+    Args:
+        extracted_info (dict): Fields parsed from the AI response
+        text (str): The note text
+        
+    Returns:
+        dict: Cleaned information with every field present
+    """
+    missing = [field for field in SUMMARY_FIELDS if field not in extracted_info]
+    if missing:
+        basic_info = basic_extraction(text)
+        extracted_info = dict(extracted_info)
+        for field in missing:
+            extracted_info[field] = basic_info[field]
+    return clean_extracted_info(extracted_info)
+
+def stream_extract_medical_info(text, model=None):
+    """
+    Extract medical information while the AI response is still streaming
+    
+    Each top-level field is yielded as soon as its JSON value is complete,
+    so patient details (first in the prompt's output format) reach the
+    client early. Fields missing from a truncated or malformed response are
+    filled in with regex extraction.
+    
+    Args:
+        text (str): The medical note text
+        model: Optional AI model supporting generate_content(..., stream=True)
+        
+    Yields:
+        dict: {"type": "field", "field", "value"} events, then a final
+            {"type": "complete", "summary", "salvaged"} event
+    """
+    parser = PartialJSONObjectParser()
+    
+    if model:
+        try:
+            response = model.generate_content(build_extraction_prompt(text), stream=True)
+            for chunk in response:
+                try:
+                    chunk_text = chunk.text
+                except ValueError:
+                    # Chunks without text (e.g. safety metadata) carry nothing to parse
+                    continue
+                for field, value in parser.feed(chunk_text):
+                    if field in SUMMARY_FIELDS:
+                        yield {"type": "field", "field": field, "value": normalize_field(field, value)}
+        except Exception as e:
+            print(f"Error in streaming AI extraction: {str(e)}")
+    
+    extracted_info = parser.fields if parser.complete else parser.salvage()
+    summary = fill_missing_fields(extracted_info, text)
+    
+    for field in SUMMARY_FIELDS:
+        if field not in parser.fields:
+            yield {"type": "field", "field": field, "value": summary[field]}
+    
+    yield {"type": "complete", "summary": summary, "salvaged": not parser.complete}
 
 def basic_extraction(text):
     """
     Basic extraction using regex patterns for comprehensive medical information
     
     Args:
-        text (str): The text to analyze
+        text (str or NoteDocument): The text to analyze
         
     Returns:
         dict: Structured medical information
     """
+    # Keyword lists are checked against the shared lowercase copy first, so
+    # only keywords the note contains are matched with their patterns
+    document = as_note_document(text)
+    text = document.text
+
     # Initialize the structure with all required fields
     extracted_info = {
         "patient_details": {
@@ -158,30 +332,20 @@ def basic_extraction(text):
     
     # Extract patient details
     # Name extraction
-    name_patterns = [
-        r'(?:patient|name)[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2})',
-        r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2})[,\s]+(?:aged?|a)\s+\d+'
-    ]
-    
-    for pattern in name_patterns:
-        name_match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in NAME_PATTERNS:
+        name_match = pattern.search(text)
         if name_match:
             extracted_info["patient_details"]["name"] = name_match.group(1)
             break
     
     # Age and gender extraction
-    age_match = re.search(r'\b(\d{1,3})[\s-]*(years?|yrs?|y\.o\.?|year old)\b', text, re.IGNORECASE)
+    age_match = AGE_PATTERN.search(text)
     if age_match:
         extracted_info["patient_details"]["age"] = age_match.group(1) + " years"
     
     # Gender extraction
-    gender_patterns = [
-        r'\b(male|female|m/f|f/m|m|f)\b',
-        r'\b(man|woman|boy|girl)\b'
-    ]
-    
-    for pattern in gender_patterns:
-        gender_match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in GENDER_PATTERNS:
+        gender_match = pattern.search(text)
         if gender_match:
             gender = gender_match.group(1).lower()
             if gender in ['m', 'male', 'man', 'boy']:
@@ -191,66 +355,46 @@ def basic_extraction(text):
             break
     
     # Marital status
-    marital_patterns = [
-        r'\b(single|married|divorced|widowed|separated)\b'
-    ]
-    
-    for pattern in marital_patterns:
-        marital_match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in MARITAL_PATTERNS:
+        marital_match = pattern.search(text)
         if marital_match:
             extracted_info["patient_details"]["marital_status"] = marital_match.group(1).capitalize()
             break
     
     # Residence
-    residence_patterns = [
-        r'residing in\s+([A-Za-z\s]+)',
-        r'resident of\s+([A-Za-z\s]+)',
-        r'lives in\s+([A-Za-z\s]+)',
-        r'from\s+([A-Za-z\s]+)'
-    ]
-    
-    for pattern in residence_patterns:
-        residence_match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in RESIDENCE_PATTERNS:
+        residence_match = pattern.search(text)
         if residence_match:
             extracted_info["patient_details"]["residence"] = residence_match.group(1).strip()
             break
     
     # Extract chief complaints
-    complaint_patterns = [
-        r'(?:chief|main|primary)\s+complaints?[:\s]+([^.;]+)[.;]',
-        r'complains of\s+([^.;]+)[.;]',
-        r'presented with\s+([^.;]+)[.;]'
-    ]
-    
-    for pattern in complaint_patterns:
-        complaint_match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in COMPLAINT_PATTERNS:
+        complaint_match = pattern.search(text)
         if complaint_match:
             complaints_text = complaint_match.group(1)
-            complaints = re.split(r',\s*(?:and\s+)?|\s+and\s+', complaints_text)
+            complaints = LIST_SPLIT_PATTERN.split(complaints_text)
             extracted_info["chief_complaints"] = [c.strip() for c in complaints if c.strip()]
             
+            # Severity is looked up in the whole note, so it is the same for every complaint
+            severity_match = SEVERITY_PATTERN.search(text)
+            
             # Try to extract details for each complaint
             for complaint in extracted_info["chief_complaints"]:
                 detail = {"complaint": complaint, "location": None, "severity": None, "duration": None}
                 
                 # Extract location
-                location_match = re.search(r'(?:in|on|at)\s+(?:the\s+)?([a-z\s]+)', complaint, re.IGNORECASE)
+                location_match = LOCATION_PATTERN.search(complaint)
                 if location_match:
                     detail["location"] = location_match.group(1).strip()
                 
                 # Extract severity
-                severity_match = re.search(r'(mild|moderate|severe|\d+/10)', text, re.IGNORECASE)
                 if severity_match:
                     detail["severity"] = severity_match.group(1)
                 
                 # Extract duration
-                duration_patterns = [
-                    r'for\s+([^.;]+)',
-                    r'(?:since|past|last)\s+([^.;]+)'
-                ]
-                
-                for d_pattern in duration_patterns:
-                    duration_match = re.search(d_pattern, complaint, re.IGNORECASE)
+                for d_pattern in COMPLAINT_DURATION_PATTERNS:
+                    duration_match = d_pattern.search(complaint)
                     if duration_match:
                         detail["duration"] = duration_match.group(1).strip()
                         break
@@ -260,60 +404,39 @@ def basic_extraction(text):
             break
     
     # Extract past history
-    past_history_section = re.search(r'(?:past|previous|medical)\s+history[:\s]+([^.]+)[.]', text, re.IGNORECASE)
+    past_history_section = PAST_HISTORY_PATTERN.search(text)
     if past_history_section:
         history_text = past_history_section.group(1)
-        histories = re.split(r',\s*(?:and\s+)?|\s+and\s+', history_text)
+        histories = LIST_SPLIT_PATTERN.split(history_text)
         extracted_info["past_history"] = [h.strip() for h in histories if h.strip()]
     
     # Look for surgeries specifically
-    surgery_match = re.search(r'(?:history of|previous|underwent)\s+([^.;]+(?:surgery|operation|procedure))[.;]', text, re.IGNORECASE)
+    surgery_match = SURGERY_PATTERN.search(text)
     if surgery_match:
         extracted_info["past_history"].append(surgery_match.group(1).strip())
     
     # Extract chronic diseases
-    chronic_diseases = ["diabetes", "hypertension", "asthma", "copd", "arthritis", 
-                        "cancer", "heart disease", "kidney disease", "liver disease"]
-    
-    for disease in chronic_diseases:
-        if re.search(r'\b' + disease + r'\b', text, re.IGNORECASE):
+    for disease, pattern in CHRONIC_DISEASE_PATTERNS:
+        if disease in document.lower and pattern.search(text):
             extracted_info["chronic_diseases"].append(disease.capitalize())
     
     # Extract lifestyle information
-    lifestyle_habits = [
-        {"term": "smok", "habit": "Smoking"},
-        {"term": "alcohol", "habit": "Alcohol"},
-        {"term": "drink", "habit": "Drinking"},
-        {"term": "drug", "habit": "Recreational drugs"}
-    ]
-    
-    for habit_info in lifestyle_habits:
-        habit_match = re.search(r'\b' + habit_info["term"] + r'[a-z]*\b[^.;]*', text, re.IGNORECASE)
+    for habit_info, pattern in LIFESTYLE_PATTERNS:
+        habit_match = pattern.search(text) if habit_info["term"] in document.lower else None
         if habit_match:
             habit_text = habit_match.group(0)
             detail = {"habit": habit_info["habit"], "frequency": None, "duration": None}
             
             # Try to extract frequency
-            frequency_patterns = [
-                r'(\d+)[^.;]*(?:times|per|a)\s+(?:day|week|month|year)',
-                r'(?:daily|weekly|monthly|occasionally|rarely|frequently)'
-            ]
-            
-            for f_pattern in frequency_patterns:
-                frequency_match = re.search(f_pattern, habit_text, re.IGNORECASE)
+            for f_pattern in HABIT_FREQUENCY_PATTERNS:
+                frequency_match = f_pattern.search(habit_text)
                 if frequency_match:
                     detail["frequency"] = frequency_match.group(0)
                     break
             
             # Try to extract duration
-            duration_patterns = [
-                r'for\s+([^.;]+)',
-                r'(?:since|past|last)\s+([^.;]+)',
-                r'(\d+)\s+(?:years|months)'
-            ]
-            
-            for d_pattern in duration_patterns:
-                duration_match = re.search(d_pattern, habit_text, re.IGNORECASE)
+            for d_pattern in HABIT_DURATION_PATTERNS:
+                duration_match = d_pattern.search(habit_text)
                 if duration_match:
                     detail["duration"] = duration_match.group(0)
                     break
@@ -321,64 +444,43 @@ def basic_extraction(text):
             extracted_info["lifestyle"].append(detail)
     
     # Extract drug history
-    drug_history_section = re.search(r'(?:drug|medication|prescription)\s+history[:\s]+([^.]+)[.]', text, re.IGNORECASE)
+    drug_history_section = DRUG_HISTORY_PATTERN.search(text)
     if drug_history_section:
         drug_text = drug_history_section.group(1)
-        drugs = re.split(r',\s*(?:and\s+)?|\s+and\s+', drug_text)
+        drugs = LIST_SPLIT_PATTERN.split(drug_text)
         extracted_info["drug_history"] = [d.strip() for d in drugs if d.strip()]
     
     # Extract family history
-    family_history_section = re.search(r'family\s+history[:\s]+([^.]+)[.]', text, re.IGNORECASE)
+    family_history_section = FAMILY_HISTORY_PATTERN.search(text)
     if family_history_section:
         history_text = family_history_section.group(1)
-        family_conditions = ["diabetes", "hypertension", "cancer", "heart disease", 
-                           "asthma", "stroke", "alzheimer", "arthritis"]
         
         # Look for conditions with relations
-        for condition in family_conditions:
-            condition_pattern = r'\b' + condition + r'\b[^.;]*(?:(?:in|with)\s+(?:father|mother|brother|sister|parent|grandparent))?'
-            condition_matches = re.finditer(condition_pattern, history_text, re.IGNORECASE)
-            
-            for match in condition_matches:
+        for condition_pattern in FAMILY_CONDITION_PATTERNS:
+            for match in condition_pattern.finditer(history_text):
                 extracted_info["family_history"].append(match.group(0).strip())
     
     # Extract allergies - highest priority
-    allergy_section = re.search(r'(?:allerg(?:y|ies)|allergic)[:\s]+([^.]+)[.]', text, re.IGNORECASE)
+    allergy_section = ALLERGY_PATTERN.search(text)
     if allergy_section:
         allergy_text = allergy_section.group(1)
-        allergies = re.split(r',\s*(?:and\s+)?|\s+and\s+', allergy_text)
+        allergies = LIST_SPLIT_PATTERN.split(allergy_text)
         extracted_info["allergies"] = [a.strip() for a in allergies if a.strip()]
     
     # Extract symptoms - looking for common physical symptoms
-    common_symptoms = [
-        "fever", "headache", "fatigue", "cough", "nausea", "vomiting", 
-        "dizziness", "pain", "rash", "sore throat", "shortness of breath",
-        "chest pain", "back pain", "abdominal pain", "diarrhea", "weakness",
-        "chills", "sweating", "itching", "loss of appetite", "swelling"
-    ]
-    
-    for symptom in common_symptoms:
-        if re.search(r'\b' + symptom + r'\b', text, re.IGNORECASE):
+    for symptom, pattern in SYMPTOM_PATTERNS:
+        if symptom in document.lower and pattern.search(text):
             extracted_info["symptoms"].append(symptom.title())
     
     # Extract possible diseases based on symptoms and mentioned conditions
     # This is a simplified approach - in reality, would use a medical knowledge base
-    symptom_to_disease = {
-        "fever": ["Common Cold", "Flu", "COVID-19", "Infection"],
-        "headache": ["Migraine", "Tension Headache", "Sinus Infection"],
-        "cough": ["Common Cold", "Bronchitis", "Asthma", "COVID-19"],
-        "nausea": ["Food Poisoning", "Migraine", "Vertigo", "Pregnancy"],
-        "fatigue": ["Anemia", "Depression", "Sleep Apnea", "Hypothyroidism"],
-        "sore throat": ["Strep Throat", "Common Cold", "Tonsillitis"]
-    }
-    
     for symptom in extracted_info["symptoms"]:
         symptom_lower = symptom.lower()
-        if symptom_lower in symptom_to_disease:
-            extracted_info["possible_diseases"].extend(symptom_to_disease[symptom_lower])
+        if symptom_lower in SYMPTOM_TO_DISEASE:
+            extracted_info["possible_diseases"].extend(SYMPTOM_TO_DISEASE[symptom_lower])
     
-    # Remove duplicates
-    extracted_info["possible_diseases"] = list(set(extracted_info["possible_diseases"]))
+    # Remove duplicates (keeping first-seen order so results are stable across processes)
+    extracted_info["possible_diseases"] = list(dict.fromkeys(extracted_info["possible_diseases"]))
     
     return extracted_info
 
@@ -392,81 +494,200 @@ def clean_extracted_info(extracted_info):
     Returns:
         dict: Cleaned information with consistent structure
     """
-    # Initialize with complete template structure regardless of what was found
-    complete_template = {
-        "patient_details": {
-            "name": None,
-            "age": None,
-            "gender": None,
-            "marital_status": None,
-            "residence": None
-        },
-        "chief_complaints": [],
-        "chief_complaint_details": [],
-        "past_history": [],
-        "chronic_diseases": [],
-        "lifestyle": [],
-        "drug_history": [],
-        "family_history": [],
-        "allergies": [],
-        "symptoms": [],
-        "possible_diseases": []
-    }
-    
-    # Start with the template and update with extracted values
-    if not extracted_info:
-        return complete_template
-    
-    result = complete_template.copy()
-    
-    # Update patient details
-    if "patient_details" in extracted_info and isinstance(extracted_info["patient_details"], dict):
-        for field in ["name", "age", "gender", "marital_status", "residence"]:
-            if field in extracted_info["patient_details"] and extracted_info["patient_details"][field]:
-                result["patient_details"][field] = extracted_info["patient_details"][field]
-    
-    # Update list fields with consistent structure
-    list_fields = [
-        "chief_complaints", "past_history", "chronic_diseases",
-        "drug_history", "family_history", "allergies", 
-        "symptoms", "possible_diseases"
+    return Summary.from_dict(extracted_info).to_dict(include_extras=False)
+
+def split_sentences(text):
+    """
+    Split note text into sentences for diffing
+
+    Args:
+        text (str): The note text
+
+    Returns:
+        list: Non-empty, stripped sentences in order
+    """
+    if not text:
+        return []
+    sentences = re.split(r'(?<=[.!?])\s+|\n+', text)
+    return [s.strip() for s in sentences if s and s.strip()]
+
+def diff_sentences(old_text, new_text):
+    """
+    Find the sentences that were removed from and added to a note
+
+    Args:
+        old_text (str): The note text before editing
+        new_text (str): The note text after editing
+
+    Returns:
+        tuple: (removed sentences, added sentences, fraction of sentences changed)
+    """
+    old_sentences = split_sentences(old_text)
+    new_sentences = split_sentences(new_text)
+
+    removed = []
+    added = []
+    matcher = SequenceMatcher(None, old_sentences, new_sentences, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        removed.extend(old_sentences[i1:i2])
+        added.extend(new_sentences[j1:j2])
+
+    total = max(len(old_sentences), len(new_sentences), 1)
+    changed_ratio = max(len(removed), len(added)) / total
+    return removed, added, changed_ratio
+
+def sentences_self_contained(text, sentences):
+    """
+    Check that no header-keyed section reaches outside the given sentences
+
+    basic_extraction reads sections such as "Allergies: ..." from the header
+    onwards, so a sentence that continues a section started in an earlier
+    sentence (or a header whose section runs past its sentence) extracts
+    differently on its own than in the full note.
+
+    Args:
+        text (str): The full note text
+        sentences (list): Sentences of the text, in order
+
+    Returns:
+        bool: True if every section overlapping a sentence lies inside it
+    """
+    section_spans = [match.span() for pattern in SECTION_PATTERNS for match in pattern.finditer(text)]
+    if not section_spans:
+        return True
+
+    position = 0
+    for sentence in sentences:
+        start = text.find(sentence, position)
+        if start < 0:
+            start = text.find(sentence)
+        if start < 0:
+            return False
+        end = start + len(sentence)
+        position = end
+        for section_start, section_end in section_spans:
+            overlaps = section_start < end and section_end > start
+            if overlaps and (section_start < start or section_end > end):
+                return False
+    return True
+
+def extract_changed_info(old_text, new_text, previous_summary, ai_model=None, max_changed_ratio=0.5):
+    """
+    Re-extract medical information only from the sentences changed by an edit
+
+    The extractors are run on the added and removed sentences only, and the
+    result is merged into the previous summary. Falls back to a full
+    extraction when there is no previous summary, most of the note changed,
+    or a changed sentence belongs to a section whose header is in another
+    sentence.
+
+    Args:
+        old_text (str): The note text before editing
+        new_text (str): The note text after editing
+        previous_summary (dict): The summary stored for the old text
+        ai_model: Optional AI model used for the added sentences
+        max_changed_ratio (float): Fraction of changed sentences above which
+            the whole note is re-extracted
+
+    Returns:
+        dict: Structured medical information for the edited note
+    """
+    if not previous_summary or not isinstance(previous_summary, dict):
+        return extract_medical_info(new_text, ai_model)
+
+    removed, added, changed_ratio = diff_sentences(old_text, new_text)
+
+    if not removed and not added:
+        return clean_extracted_info(previous_summary)
+
+    if changed_ratio > max_changed_ratio:
+        print(f"Edit changed {changed_ratio:.0%} of the note, running full extraction")
+        return extract_medical_info(new_text, ai_model)
+
+    if not (sentences_self_contained(old_text, removed) and sentences_self_contained(new_text, added)):
+        print("Edit falls inside a multi-sentence section, running full extraction")
+        return extract_medical_info(new_text, ai_model)
+
+    print(f"Incremental extraction: {len(removed)} sentences removed, {len(added)} added")
+
+    added_info = extract_medical_info(' '.join(added), ai_model) if added else Summary().to_dict()
+    removed_info = clean_extracted_info(basic_extraction(' '.join(removed))) if removed else Summary().to_dict()
+
+    return merge_extracted_info(clean_extracted_info(previous_summary), added_info, removed_info, new_text)
+
+def merge_extracted_info(previous, added_info, removed_info, new_text):
+    """
+    Merge information extracted from changed sentences into an existing summary
+
+    Values found in the removed sentences are dropped from the summary unless
+    they still appear somewhere in the edited text; values found in the added
+    sentences are appended.
+
+    Args:
+        previous (dict): Cleaned summary for the text before editing
+        added_info (dict): Cleaned extraction of the added sentences
+        removed_info (dict): Cleaned extraction of the removed sentences
+        new_text (str): The full edited note text
+
+    Returns:
+        dict: Merged summary
+    """
+    new_text_lower = new_text.lower()
+    result = previous
+
+    def still_mentioned(value):
+        return str(value).lower() in new_text_lower
+
+    # Patient details: replaced only when missing or when the sentence they came from was edited
+    for field, value in result["patient_details"].items():
+        added_value = added_info["patient_details"].get(field)
+        removed_value = removed_info["patient_details"].get(field)
+        if added_value and (not value or removed_value == value):
+            result["patient_details"][field] = added_value
+        elif value and removed_value == value and not still_mentioned(value):
+            result["patient_details"][field] = None
+
+    for field in SUMMARY_LIST_FIELDS:
+        removed_items = {str(x).lower() for x in removed_info[field]}
+        merged = [
+            x for x in result[field]
+            if str(x).lower() not in removed_items or still_mentioned(x)
+        ]
+        seen = {str(x).lower() for x in merged}
+        for item in added_info[field]:
+            if str(item).lower() not in seen:
+                seen.add(str(item).lower())
+                merged.append(item)
+        result[field] = merged
+
+    # Complaint details follow the surviving complaints
+    complaints = {str(c).lower() for c in result["chief_complaints"]}
+    details = [
+        d for d in result["chief_complaint_details"]
+        if str(d.get("complaint")).lower() in complaints
     ]
-    
-    for field in list_fields:
-        if field in extracted_info and isinstance(extracted_info[field], list):
-            # Remove duplicates while preserving order
-            seen = set()
-            result[field] = [
-                x for x in extracted_info[field] 
-                if x and not (str(x).lower() in seen or seen.add(str(x).lower()))
-            ]
-    
-    # Update structured list fields - chief_complaint_details and lifestyle
-    if "chief_complaint_details" in extracted_info and isinstance(extracted_info["chief_complaint_details"], list):
-        # Process each complaint detail object
-        for detail in extracted_info["chief_complaint_details"]:
-            if isinstance(detail, dict) and "complaint" in detail:
-                # Ensure all properties exist
-                formatted_detail = {
-                    "complaint": detail.get("complaint", "Unknown"),
-                    "location": detail.get("location"),
-                    "severity": detail.get("severity"),
-                    "duration": detail.get("duration")
-                }
-                result["chief_complaint_details"].append(formatted_detail)
-    
-    if "lifestyle" in extracted_info and isinstance(extracted_info["lifestyle"], list):
-        # Process each lifestyle object
-        for habit in extracted_info["lifestyle"]:
-            if isinstance(habit, dict) and "habit" in habit:
-                # Ensure all properties exist
-                formatted_habit = {
-                    "habit": habit.get("habit", "Unknown"),
-                    "frequency": habit.get("frequency"),
-                    "duration": habit.get("duration")
-                }
-                result["lifestyle"].append(formatted_habit)
-    
+    known_details = {str(d.get("complaint")).lower() for d in details}
+    for detail in added_info["chief_complaint_details"]:
+        if str(detail.get("complaint")).lower() not in known_details:
+            details.append(detail)
+    result["chief_complaint_details"] = details
+
+    # Lifestyle habits are matched on their search term
+    habit_terms = {h["habit"].lower(): h["term"] for h in LIFESTYLE_HABITS}
+    added_habits = {str(h.get("habit")).lower(): h for h in added_info["lifestyle"]}
+    removed_habits = {str(h.get("habit")).lower() for h in removed_info["lifestyle"]}
+    lifestyle = []
+    for habit in result["lifestyle"]:
+        key = str(habit.get("habit")).lower()
+        if key in added_habits:
+            lifestyle.append(added_habits.pop(key))
+        elif key not in removed_habits or habit_terms.get(key, key) in new_text_lower:
+            lifestyle.append(habit)
+    lifestyle.extend(added_habits.values())
+    result["lifestyle"] = lifestyle
+
     return result
 
 def get_edited_summary(note_id):
@@ -584,102 +805,14 @@ def save_edited_summary(note_id, edited_summary, original_summary=None):
         print(f"Error saving edited summary: {str(e)}")
         return False, str(e)
 
-def transcribe_audio(file_path):
-    """
-    Enhanced transcription function with improved accuracy settings
-    
-    Args:
-        file_path (str): Path to the audio file
-        
-    Returns:
-        str: Transcribed text
-    """
-    try:
-        # Initialize recognizer with enhanced settings
-        recognizer = sr.Recognizer()
-        
-        # Adjust recognition parameters for better accuracy
-        recognizer.energy_threshold = 300  # Increase energy threshold for better noise handling
-        recognizer.dynamic_energy_threshold = True  # Dynamically adjust for ambient noise
-        recognizer.pause_threshold = 0.8  # Longer pause threshold for better phrase detection
-        
-        # Determine file extension
-        file_ext = os.path.splitext(file_path)[1].lower()
-        
-        # Check if it's a WAV file
-        if file_ext != '.wav':
-            return """
-            This version only supports WAV files for direct transcription.
-            
-            For other audio formats, please:
-            1. Convert your audio to WAV format using an online converter
-            2. Upload the WAV file instead
-            3. Or install ffmpeg properly on your system
-            """
-        
-        # Direct transcription for WAV files with multiple attempts and settings
-        transcription_result = ""
-        
-        try:
-            # First attempt with standard settings
-            with sr.AudioFile(file_path) as source:
-                # Adjust for ambient noise
-                recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                # Record the entire audio file with higher quality
-                audio_data = recognizer.record(source)
-                
-                # Try to recognize using Google's service with additional language options
-                try:
-                    # First try with English (US) - best for medical terminology
-                    transcription_result = recognizer.recognize_google(
-                        audio_data, 
-                        language="en-US",
-                        show_all=False  # Only return the most likely result
-                    )
-                except:
-                    # If US English fails, try generic English
-                    transcription_result = recognizer.recognize_google(
-                        audio_data, 
-                        language="en",
-                        show_all=False
-                    )
-            
-            # If the result seems too short, try again with different settings
-            if len(transcription_result.split()) < 5:
-                with sr.AudioFile(file_path) as source:
-                    # Use a longer duration for noise adjustment
-                    recognizer.adjust_for_ambient_noise(source, duration=1.0)
-                    # Increase the phrase threshold for better sentence detection
-                    recognizer.pause_threshold = 1.0
-                    audio_data = recognizer.record(source)
-                    
-                    # Try with different settings for the Google API
-                    second_attempt = recognizer.recognize_google(
-                        audio_data,
-                        language="en-US",
-                        show_all=False
-                    )
-                    
-                    # Use the longer result
-                    if len(second_attempt.split()) > len(transcription_result.split()):
-                        transcription_result = second_attempt
-            
-            # Clean and format the transcription
-            transcription_result = clean_transcription(transcription_result)
-            
-            return transcription_result if transcription_result else "Transcription produced no results. Please try uploading a clearer audio file or entering text manually."
-            
-        except sr.UnknownValueError:
-            return "Speech recognition could not understand the audio. Please ensure the recording is clear and try again."
-        except sr.RequestError as e:
-            return f"Could not request results from Speech Recognition service; {e}. Check your internet connection."
-        except Exception as wav_error:
-            print(f"Error processing WAV file: {str(wav_error)}")
-            return f"Error processing audio: {str(wav_error)}. Please try again with a different file."
-    
-    except Exception as e:
-        print(f"Error in transcription process: {str(e)}")
-        return f"Error in transcription process: {str(e)}"
+def _capitalize_sentence_break(match):
+    """Replacement for SENTENCE_BREAK_PATTERN"""
+    first = match.group(1)
+    if first:
+        return " " + first.upper()
+    # Trailing whitespace after the last sentence is dropped
+    return "" if match.end() == len(match.string) else " "
+
 
 def clean_transcription(text):
     """
@@ -694,29 +827,13 @@ def clean_transcription(text):
     if not text:
         return ""
         
-    # Convert to proper capitalization
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    formatted_sentences = []
-    
-    for sentence in sentences:
-        if sentence:
-            # Capitalize first letter of each sentence
-            formatted = sentence[0].upper() + sentence[1:] if len(sentence) > 1 else sentence.upper()
-            formatted_sentences.append(formatted)
-    
-    # Rejoin with proper spacing
-    result = ' '.join(formatted_sentences)
-    
+    # Capitalize the first letter of each sentence and collapse the
+    # whitespace between sentences to a single space
+    result = text[0].upper() + text[1:]
+    result = SENTENCE_BREAK_PATTERN.sub(_capitalize_sentence_break, result)
+
     # Fix common medical term capitalization
-    medical_terms = [
-        'COVID', 'COVID-19', 'MRI', 'CT scan', 'EKG', 'ECG', 'IV', 'BP',
-        'HDL', 'LDL', 'VLDL', 'GERD', 'UTI', 'URI', 'PCP', 'COPD'
-    ]
-    
-    for term in medical_terms:
-        # Use word boundaries to replace only whole words
-        pattern = r'\b' + re.escape(term.lower()) + r'\b'
-        result = re.sub(pattern, term, result, flags=re.IGNORECASE)
+    result = get_term_normalizer().normalize(result)
     
     # Add periods to the end of sentences if missing
     if result and result[-1] not in '.!?':
@@ -0,0 +1,151 @@
+"""
+Partial JSON parsing module for Health Companion app
+
+Parses a JSON object that arrives in pieces (e.g. a streamed LLM response)
+and reports each top-level field as soon as its value is complete. Fields
+from truncated or malformed output can be salvaged instead of discarded.
+"""
+import json
+
+
+class PartialJSONObjectParser:
+    """
+    Incremental parser for a single top-level JSON object
+
+    Text before the opening brace (such as a ```json code fence) and after
+    the closing brace is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.complete = False
+        self._pos = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+        self._stack = []
+        self._member_start = None
+        # (offset, open brackets) of commas inside the current member's value
+        self._cut_points = []
+
+    def feed(self, chunk):
+        """
+        Add streamed text to the parser
+
+        Args:
+            chunk (str): The next piece of the response
+
+        Returns:
+            list: (field, value) tuples completed by this chunk
+        """
+        if not chunk or self.complete:
+            return []
+
+        self.buffer += chunk
+        completed = []
+        buffer = self.buffer
+
+        while self._pos < len(buffer) and not self.complete:
+            char = buffer[self._pos]
+
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    self._stack.append('}')
+                    self._member_start = self._pos + 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._stack.append('}' if char == '{' else ']')
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    completed.extend(self._finish_member(self._pos))
+                    self.complete = True
+            elif char == ',':
+                if len(self._stack) == 1:
+                    completed.extend(self._finish_member(self._pos))
+                    self._member_start = self._pos + 1
+                else:
+                    self._cut_points.append((self._pos, tuple(self._stack)))
+
+            self._pos += 1
+
+        return completed
+
+    def _finish_member(self, end):
+        """Parse the member between the last top-level comma and end"""
+        member = self.buffer[self._member_start:end]
+        self._cut_points = []
+
+        if not member.strip():
+            return []
+
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            print(f"Skipping malformed JSON field: {member.strip()[:80]}")
+            return []
+
+        self.fields.update(parsed)
+        return list(parsed.items())
+
+    def salvage(self):
+        """
+        Recover whatever can be parsed from an incomplete response
+
+        The trailing, unfinished field is cut back to its last complete list
+        item or object member and closed, so partially streamed values are
+        kept without inventing half-written strings.
+
+        Returns:
+            dict: All fields that could be parsed
+        """
+        if self.complete or not self._started or self._member_start is None:
+            return dict(self.fields)
+
+        member = self.buffer[self._member_start:]
+        candidates = [(len(member), tuple(self._stack), self._in_string)]
+        for offset, stack in reversed(self._cut_points):
+            candidates.append((offset - self._member_start, stack, False))
+
+        for length, stack, in_string in candidates:
+            if in_string:
+                continue
+            # The outermost closer belongs to the top-level object
+            closers = ''.join(reversed(stack[1:]))
+            try:
+                parsed = json.loads("{" + member[:length] + closers + "}")
+            except json.JSONDecodeError:
+                continue
+            self.fields.update(parsed)
+            break
+
+        return dict(self.fields)
+
+
+def parse_json_object(text):
+    """
+    Parse a JSON object from text, salvaging fields if it is malformed
+
+    Args:
+        text (str): Text containing a JSON object, possibly wrapped in prose
+            or code fences
+
+    Returns:
+        tuple: (fields dict, True if the full object parsed cleanly)
+    """
+    parser = PartialJSONObjectParser()
+    parser.feed(text)
+    if parser.complete:
+        return parser.fields, True
+    return parser.salvage(), False
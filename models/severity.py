@@ -0,0 +1,133 @@
+"""
+Severity module for Health Companion app
+
+Finds how severe a symptom is described as in a note and puts it on a
+0-10 scale. Only the sentences that mention the symptom are searched, the
+symptom name is escaped before it goes into a pattern, and the distance
+between the symptom and its severity cue is bounded, so a long transcript
+cannot make the search backtrack across the whole note. When no cue is
+close enough to the symptom, a severity word anywhere else in a sentence
+naming it is used; sentences about other symptoms are never searched.
+"""
+import re
+from functools import lru_cache
+
+from .note_document import as_note_document
+
+# Score of each severity word on the 0-10 scale
+SEVERITY_WORD_SCORES = {
+    "minimal": 1,
+    "slight": 2,
+    "mild": 3,
+    "moderate": 5,
+    "significant": 6,
+    "severe": 8,
+    "intense": 8,
+    "extreme": 9,
+    "debilitating": 10,
+    "worst": 10,
+}
+
+# Most characters allowed between a symptom and its severity cue
+SEVERITY_MAX_GAP = 80
+
+# Number of symptoms whose patterns are kept compiled
+SEVERITY_PATTERN_CACHE_SIZE = 1024
+
+SEVERITY_WORDS = "|".join(sorted(SEVERITY_WORD_SCORES, key=len, reverse=True))
+SEVERITY_WORD_PATTERN = re.compile(rf"\b({SEVERITY_WORDS})\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=SEVERITY_PATTERN_CACHE_SIZE)
+def _severity_patterns(symptom):
+    """
+    Severity patterns around one symptom, compiled on first use
+
+    Returns:
+        tuple: Patterns in order of preference; group 1 is the severity cue
+    """
+    name = re.escape(symptom)
+    gap = rf"[\s\S]{{0,{SEVERITY_MAX_GAP}}}?"
+    return (
+        re.compile(rf"{name}{gap}\b({SEVERITY_WORDS})", re.IGNORECASE),
+        re.compile(rf"{name}{gap}\b(\d{{1,3}})\s*/\s*10\b", re.IGNORECASE),
+        re.compile(rf"{name}{gap}\bintensity of (\d{{1,3}})\b", re.IGNORECASE),
+        re.compile(rf"{name}{gap}\b(?:rated|scale|score)\D{{0,20}}?(\d{{1,3}})\b", re.IGNORECASE),
+        re.compile(rf"\b({SEVERITY_WORDS}){gap}{name}", re.IGNORECASE),
+    )
+
+
+def severity_score(label):
+    """
+    Put a severity cue on the 0-10 scale
+
+    Args:
+        label (str): Severity word or number out of 10
+
+    Returns:
+        float: Score from 0 to 10, or None if the label is not recognized
+    """
+    if label is None:
+        return None
+    label = str(label).strip().lower()
+    if label in SEVERITY_WORD_SCORES:
+        return float(SEVERITY_WORD_SCORES[label])
+    try:
+        return float(min(10.0, max(0.0, float(label.split("/")[0]))))
+    except ValueError:
+        return None
+
+
+def extract_severity(note, symptom):
+    """
+    Find the severity given for a symptom in a note
+
+    Args:
+        note (str or NoteDocument): The note
+        symptom (str): Symptom name as it appears in the note
+
+    Returns:
+        dict: score (0-10), label (the severity word or number as written,
+            lowercase), span ((start, end) of the label in the note text) and
+            sentence (the sentence it was found in); None if the note gives
+            no severity for the symptom
+    """
+    if note is None or not symptom:
+        return None
+
+    document = as_note_document(note)
+    sentence_indexes = document.sentence_indexes_containing(symptom)
+    if not sentence_indexes:
+        return None
+
+    for pattern in _severity_patterns(symptom):
+        for index in sentence_indexes:
+            start, end = document.sentence_spans[index]
+            match = pattern.search(document.text, start, end)
+            if match:
+                return _severity_result(document, match)
+
+    return _sentence_severity(document, sentence_indexes)
+
+
+def _sentence_severity(document, sentence_indexes):
+    """First severity word anywhere in the sentences naming the symptom"""
+    for index in sentence_indexes:
+        start, end = document.sentence_spans[index]
+        match = SEVERITY_WORD_PATTERN.search(document.text, start, end)
+        if match:
+            return _severity_result(document, match)
+    return None
+
+
+def _severity_result(document, match):
+    """Build the extract_severity result for a match whose group 1 is the cue"""
+    label = match.group(1).lower()
+    index = document.sentence_index_at(match.start(1))
+    sentence = document.sentence(index) if index is not None else match.group(0)
+    return {
+        "score": severity_score(label),
+        "label": label,
+        "span": match.span(1),
+        "sentence": sentence.strip(),
+    }
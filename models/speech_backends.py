@@ -0,0 +1,200 @@
+"""
+Speech Backends module for Health Companion app
+
+A speech backend turns a chunk of audio (speech_recognition AudioData) into
+text. The transcription pipeline only talks to this interface, so the
+recognizer can be swapped without touching the chunking code.
+
+The backend is chosen with the SPEECH_BACKEND environment variable:
+"google" (default, online) or "vosk" (offline, needs the vosk package and
+a model directory in VOSK_MODEL_PATH).
+"""
+import json
+import os
+import threading
+
+import speech_recognition as sr
+
+try:
+    import vosk
+
+    vosk.SetLogLevel(-1)
+except ImportError:
+    vosk = None
+
+# Backend used when none is requested explicitly
+SPEECH_BACKEND = os.environ.get("SPEECH_BACKEND", "google")
+
+# Directory of the Vosk model (e.g. an unpacked vosk-model-small-en-us)
+VOSK_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH", "vosk-model")
+
+
+class SpeechBackend:
+    """
+    Base class for speech recognition backends
+
+    Subclasses implement transcribe() and return "" or raise
+    sr.UnknownValueError when a chunk contains no recognizable speech, and
+    raise sr.RequestError when the recognizer itself is unavailable.
+    """
+
+    name = "base"
+
+    def transcribe(self, audio_data, language="en-US"):
+        """
+        Transcribe one chunk of audio
+
+        Args:
+            audio_data (sr.AudioData): Mono PCM audio
+            language (str): Language code such as "en-US"
+
+        Returns:
+            str: Recognized text
+        """
+        raise NotImplementedError
+
+
+class GoogleSpeechBackend(SpeechBackend):
+    """Google Web Speech API, trying fallback languages when a request is rejected"""
+
+    name = "google"
+
+    def __init__(self, fallback_languages=("en",)):
+        """
+        Initialize the Google backend
+
+        Args:
+            fallback_languages (tuple): Languages tried in order if the
+                request for the requested language fails
+        """
+        self.recognizer = sr.Recognizer()
+        self.fallback_languages = fallback_languages
+
+    def transcribe(self, audio_data, language="en-US"):
+        languages = [language] + [l for l in self.fallback_languages if l != language]
+        last_error = None
+        for attempt in languages:
+            try:
+                return self.recognizer.recognize_google(audio_data, language=attempt, show_all=False)
+            except sr.UnknownValueError:
+                # Silence or unclear speech: another language would not help
+                return ""
+            except sr.RequestError as e:
+                last_error = e
+        raise last_error
+
+
+class VoskSpeechBackend(SpeechBackend):
+    """
+    Offline recognition on the CPU with a Vosk (Kaldi) model
+
+    The model is loaded once when the backend is created and shared by all
+    threads; each transcribe() call gets its own lightweight recognizer.
+    The model decides the language, so the language argument is ignored.
+    """
+
+    name = "vosk"
+
+    # Frames fed to the recognizer per call
+    BLOCK_FRAMES = 4000
+
+    def __init__(self, model_path=None):
+        """
+        Load the Vosk model
+
+        Args:
+            model_path (str): Model directory (defaults to VOSK_MODEL_PATH)
+        """
+        if vosk is None:
+            raise RuntimeError("The vosk package is not installed")
+        model_path = model_path or VOSK_MODEL_PATH
+        if not os.path.isdir(model_path):
+            raise RuntimeError(f"Vosk model directory not found: {model_path}")
+        print(f"Loading Vosk model from {model_path}")
+        self.model = vosk.Model(model_path)
+
+    def transcribe(self, audio_data, language="en-US"):
+        sample_rate = audio_data.sample_rate
+        pcm = audio_data.get_raw_data(convert_width=2)
+        recognizer = vosk.KaldiRecognizer(self.model, sample_rate)
+
+        texts = []
+        block_bytes = self.BLOCK_FRAMES * 2
+        for offset in range(0, len(pcm), block_bytes):
+            if recognizer.AcceptWaveform(pcm[offset:offset + block_bytes]):
+                texts.append(json.loads(recognizer.Result()).get("text", ""))
+        texts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+
+        text = " ".join(t for t in texts if t)
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class FakeSpeechBackend(SpeechBackend):
+    """
+    Deterministic offline backend for development and benchmarks
+
+    Returns one placeholder word per half second of audio, or the output
+    of a custom function, without calling any service.
+    """
+
+    name = "fake"
+
+    def __init__(self, text_for=None):
+        """
+        Initialize the fake backend
+
+        Args:
+            text_for (callable): Optional function (audio_data, language) -> str
+        """
+        self.text_for = text_for
+
+    def transcribe(self, audio_data, language="en-US"):
+        if self.text_for:
+            return self.text_for(audio_data, language)
+        seconds = len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width)
+        words = int(seconds * 2)
+        if not words:
+            raise sr.UnknownValueError()
+        return " ".join(["speech"] * words)
+
+
+SPEECH_BACKENDS = {
+    GoogleSpeechBackend.name: GoogleSpeechBackend,
+    VoskSpeechBackend.name: VoskSpeechBackend,
+    FakeSpeechBackend.name: FakeSpeechBackend,
+}
+
+_backends_lock = threading.Lock()
+_backends = {}
+
+
+def get_speech_backend(name=None):
+    """
+    Get the shared instance of a speech backend, creating it on first use
+
+    Backends (and any model they load) are created once per process and
+    reused for every request. If the configured backend cannot be loaded,
+    the Google backend is used instead.
+
+    Args:
+        name (str): One of SPEECH_BACKENDS (defaults to SPEECH_BACKEND)
+
+    Returns:
+        SpeechBackend
+    """
+    name = name or SPEECH_BACKEND
+    if name not in SPEECH_BACKENDS:
+        raise ValueError(f"Unknown speech backend '{name}'. Available: {', '.join(SPEECH_BACKENDS)}")
+
+    with _backends_lock:
+        if name not in _backends:
+            try:
+                _backends[name] = SPEECH_BACKENDS[name]()
+            except RuntimeError as e:
+                if name == GoogleSpeechBackend.name:
+                    raise
+                print(f"Could not load the {name} speech backend ({e}), using Google instead")
+                _backends[name] = _backends.get(GoogleSpeechBackend.name) or GoogleSpeechBackend()
+        return _backends[name]
@@ -0,0 +1,263 @@
+"""
+Summary model for Health Companion app
+
+A Summary holds the structured information extracted from a medical note.
+Raw extractor output, AI responses, doctor edits and stored JSON all go
+through Summary.from_dict, a single normalization pass that fills in
+missing fields, drops empty and duplicate list items and gives every
+nested record the same keys. Routes and templates still receive plain
+dicts via to_dict().
+"""
+import json
+
+# Top-level fields of a summary, in the order the AI prompt lists them
+SUMMARY_FIELDS = [
+    "patient_details", "chief_complaints", "chief_complaint_details",
+    "past_history", "chronic_diseases", "lifestyle", "drug_history",
+    "family_history", "allergies", "symptoms", "possible_diseases"
+]
+
+# Summary fields that hold plain string lists
+SUMMARY_LIST_FIELDS = [
+    "chief_complaints", "past_history", "chronic_diseases", "drug_history",
+    "family_history", "allergies", "symptoms", "possible_diseases"
+]
+
+PATIENT_DETAIL_FIELDS = ("name", "age", "gender", "marital_status", "residence")
+COMPLAINT_DETAIL_FIELDS = ("complaint", "location", "severity", "duration")
+HABIT_FIELDS = ("habit", "frequency", "duration")
+
+_FIELD_SET = frozenset(SUMMARY_FIELDS)
+
+_SCALAR_TYPES = (str, int, float)
+
+
+def dedupe_items(items):
+    """
+    Drop empty items and case-insensitive duplicates, keeping the first spelling
+
+    Args:
+        items (list): Raw list values
+
+    Returns:
+        list: Unique, non-empty items in their original order
+    """
+    seen = set()
+    unique = []
+    for item in items:
+        if item:
+            key = str(item).lower()
+            if key not in seen:
+                seen.add(key)
+                unique.append(item)
+    return unique
+
+
+def _normalize_records(items, key_field, fields):
+    """Keep dict records that have key_field, with every field present"""
+    if not isinstance(items, list):
+        return []
+    return [
+        {field: item.get(field) for field in fields}
+        for item in items
+        if isinstance(item, dict) and key_field in item
+    ]
+
+
+def _normalize_patient_details(value):
+    """Patient details with every key present and empty values as None"""
+    if not isinstance(value, dict):
+        return dict.fromkeys(PATIENT_DETAIL_FIELDS)
+    return {key: value.get(key) or None for key in PATIENT_DETAIL_FIELDS}
+
+
+def _normalize_list(value):
+    return dedupe_items(value) if isinstance(value, list) else []
+
+
+def normalize_field(field, value):
+    """
+    Normalize the value of a single top-level summary field
+
+    Args:
+        field (str): One of SUMMARY_FIELDS
+        value: Raw value, e.g. parsed from a streamed AI response
+
+    Returns:
+        The normalized value (dict for patient_details, list otherwise)
+    """
+    if field == "patient_details":
+        return _normalize_patient_details(value)
+    if field == "chief_complaint_details":
+        return _normalize_records(value, "complaint", COMPLAINT_DETAIL_FIELDS)
+    if field == "lifestyle":
+        return _normalize_records(value, "habit", HABIT_FIELDS)
+    return _normalize_list(value)
+
+
+class Summary:
+    """
+    Structured medical information extracted from a note
+
+    Keys outside SUMMARY_FIELDS (e.g. added by a doctor's edit) are kept in
+    ``extras`` so they survive a save/load round trip.
+    """
+
+    __slots__ = tuple(SUMMARY_FIELDS) + ("extras",)
+
+    def __init__(self):
+        self.patient_details = dict.fromkeys(PATIENT_DETAIL_FIELDS)
+        for field in SUMMARY_FIELDS[1:]:
+            setattr(self, field, [])
+        self.extras = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a Summary from a raw dict in one normalization pass
+
+        Args:
+            data (dict): Extracted, edited or stored summary data (may be None)
+
+        Returns:
+            Summary
+        """
+        summary = cls.__new__(cls)
+        if not isinstance(data, dict):
+            data = {}
+        get = data.get
+
+        summary.patient_details = _normalize_patient_details(get("patient_details"))
+        summary.chief_complaints = _normalize_list(get("chief_complaints"))
+        summary.chief_complaint_details = _normalize_records(
+            get("chief_complaint_details"), "complaint", COMPLAINT_DETAIL_FIELDS
+        )
+        summary.past_history = _normalize_list(get("past_history"))
+        summary.chronic_diseases = _normalize_list(get("chronic_diseases"))
+        summary.lifestyle = _normalize_records(get("lifestyle"), "habit", HABIT_FIELDS)
+        summary.drug_history = _normalize_list(get("drug_history"))
+        summary.family_history = _normalize_list(get("family_history"))
+        summary.allergies = _normalize_list(get("allergies"))
+        summary.symptoms = _normalize_list(get("symptoms"))
+        summary.possible_diseases = _normalize_list(get("possible_diseases"))
+
+        if data.keys() <= _FIELD_SET:
+            summary.extras = {}
+        else:
+            summary.extras = {key: value for key, value in data.items() if key not in _FIELD_SET}
+        return summary
+
+    @classmethod
+    def from_json(cls, text):
+        """
+        Decode a summary stored as JSON
+
+        Args:
+            text (str): JSON text from the summaries table
+
+        Returns:
+            Summary
+
+        Raises:
+            ValueError: If the text is not valid JSON
+        """
+        return cls.from_dict(json.loads(text))
+
+    def to_dict(self, include_extras=True):
+        """
+        Convert to the plain dict structure used by the API and templates
+
+        Args:
+            include_extras (bool): Also include unknown keys kept from the input
+
+        Returns:
+            dict: Summary data, sharing its values with this Summary
+        """
+        result = {
+            "patient_details": self.patient_details,
+            "chief_complaints": self.chief_complaints,
+            "chief_complaint_details": self.chief_complaint_details,
+            "past_history": self.past_history,
+            "chronic_diseases": self.chronic_diseases,
+            "lifestyle": self.lifestyle,
+            "drug_history": self.drug_history,
+            "family_history": self.family_history,
+            "allergies": self.allergies,
+            "symptoms": self.symptoms,
+            "possible_diseases": self.possible_diseases,
+        }
+        if include_extras:
+            for key, value in self.extras.items():
+                result.setdefault(key, value)
+        return result
+
+    def to_json(self):
+        """
+        Encode the summary for storage
+
+        Returns:
+            str: JSON text
+        """
+        return json.dumps(self.to_dict())
+
+    @property
+    def patient_name(self):
+        """Name from the patient details, or None"""
+        return self.patient_details.get("name")
+
+    def __eq__(self, other):
+        if not isinstance(other, Summary):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Summary(patient={self.patient_name!r}, symptoms={self.symptoms!r})"
+
+
+def validate_summary(data):
+    """
+    Check raw summary data (e.g. a doctor's edit) for structural problems
+
+    Missing fields are not reported, since normalization fills them in;
+    only values of the wrong type are.
+
+    Args:
+        data: Summary data as received from the client
+
+    Returns:
+        list: Descriptions of the problems found (empty if valid)
+    """
+    if not isinstance(data, dict):
+        return ["summary must be an object"]
+
+    errors = []
+
+    details = data.get("patient_details")
+    if details is not None:
+        if not isinstance(details, dict):
+            errors.append("patient_details must be an object")
+        else:
+            for key in PATIENT_DETAIL_FIELDS:
+                value = details.get(key)
+                if value is not None and not isinstance(value, _SCALAR_TYPES):
+                    errors.append(f"patient_details.{key} must be a string")
+
+    for field in SUMMARY_LIST_FIELDS:
+        value = data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, list):
+            errors.append(f"{field} must be a list")
+        elif any(item is not None and not isinstance(item, _SCALAR_TYPES) for item in value):
+            errors.append(f"{field} must contain only strings")
+
+    for field, key_field in (("chief_complaint_details", "complaint"), ("lifestyle", "habit")):
+        value = data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, list):
+            errors.append(f"{field} must be a list")
+        elif not all(isinstance(item, dict) and key_field in item for item in value):
+            errors.append(f"{field} items must be objects with a '{key_field}' key")
+
+    return errors
@@ -0,0 +1,123 @@
+"""
+Term Normalizer module for Health Companion app
+
+Rewrites medical terms in transcripts to their canonical spelling (e.g.
+"mri" -> "MRI") in a single pass. The terms are compiled into one regular
+expression shaped like a trie, so each position in the text is checked
+against all terms at once and adding thousands of terms from the data file
+barely changes the cost.
+"""
+import os
+import re
+import threading
+
+# One canonical term per line; MEDICAL_TERMS_FILE overrides the bundled list
+MEDICAL_TERMS_FILE = os.environ.get(
+    "MEDICAL_TERMS_FILE", os.path.join(os.path.dirname(__file__), "data", "medical_terms.txt")
+)
+
+# Used when the terms file cannot be read
+DEFAULT_MEDICAL_TERMS = [
+    'COVID', 'COVID-19', 'MRI', 'CT scan', 'EKG', 'ECG', 'IV', 'BP',
+    'HDL', 'LDL', 'VLDL', 'GERD', 'UTI', 'URI', 'PCP', 'COPD'
+]
+
+
+def load_terms(path=MEDICAL_TERMS_FILE):
+    """
+    Read canonical terms from a data file
+
+    Args:
+        path (str): File with one term per line; blank lines and lines
+            starting with # are skipped
+
+    Returns:
+        list: Terms in file order
+    """
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _trie_pattern(node):
+    """Regex source matching every word stored in a trie node"""
+    if list(node) == [""]:
+        return None
+
+    alternatives = []
+    single_chars = []
+    for char in sorted(key for key in node if key):
+        rest = _trie_pattern(node[char])
+        if rest is None:
+            single_chars.append(re.escape(char))
+        else:
+            alternatives.append(re.escape(char) + rest)
+
+    if single_chars:
+        alternatives.append(single_chars[0] if len(single_chars) == 1 else "[" + "".join(single_chars) + "]")
+
+    pattern = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    if "" in node:
+        # A term ends here; longer terms are preferred because ? is greedy
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+
+class TermNormalizer:
+    """Single-pass rewriter of terms to their canonical spelling"""
+
+    def __init__(self, terms):
+        """
+        Compile the terms
+
+        Args:
+            terms (list): Canonical spellings; matching ignores case
+        """
+        self.canonical = {term.lower(): term for term in terms}
+
+        trie = {}
+        for word in self.canonical:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[""] = True
+
+        body = _trie_pattern(trie) if trie else None
+        self.pattern = re.compile(r"\b" + body + r"\b", re.IGNORECASE) if body else None
+
+    def normalize(self, text):
+        """
+        Rewrite every whole-word occurrence of a term to its canonical form
+
+        Args:
+            text (str): Text to normalize
+
+        Returns:
+            str: Normalized text
+        """
+        if not self.pattern or not text:
+            return text
+        canonical = self.canonical
+        return self.pattern.sub(lambda match: canonical.get(match.group(0).lower(), match.group(0)), text)
+
+
+_normalizer_lock = threading.Lock()
+_normalizer = None
+
+
+def get_term_normalizer():
+    """
+    Get the shared normalizer for the medical terms file, compiling it on first use
+
+    Returns:
+        TermNormalizer
+    """
+    global _normalizer
+    with _normalizer_lock:
+        if _normalizer is None:
+            try:
+                terms = load_terms()
+            except OSError as e:
+                print(f"Could not read medical terms from {MEDICAL_TERMS_FILE} ({e}), using the built-in list")
+                terms = DEFAULT_MEDICAL_TERMS
+            _normalizer = TermNormalizer(terms)
+        return _normalizer
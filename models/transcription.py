@@ -0,0 +1,226 @@
+"""
+Transcription pipeline module for Health Companion app
+
+Voice activity detection finds the speech in a recording and the silence
+between is dropped. The speech is grouped into bounded chunks, the chunks
+are sent to the speech backend concurrently, and the results are stitched
+back together in order with their timestamps.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import speech_recognition as sr
+from pydub import AudioSegment
+
+from .audio_decoding import decode_audio_file
+from .speech_backends import get_speech_backend
+from .transcription_cache import get_cached_transcription, store_transcription, transcription_cache_key
+from .vad import detect_speech
+
+# Chunks are kept under this length of audio sent to the recognizer
+MAX_CHUNK_MS = 30000
+
+# Silence inserted between speech segments joined into one chunk
+SEGMENT_GAP_MS = 300
+
+# Number of chunks transcribed at the same time
+TRANSCRIPTION_WORKERS = 4
+
+
+def load_audio(file_path):
+    """
+    Load an audio file as 16 kHz mono PCM
+
+    Args:
+        file_path (str): Path to the audio file
+
+    Returns:
+        AudioSegment
+    """
+    return decode_audio_file(file_path)
+
+
+def plan_chunks(speech_segments, max_chunk_ms=MAX_CHUNK_MS):
+    """
+    Group speech segments into chunks for the recognizer
+
+    Consecutive segments are joined while the chunk stays under
+    max_chunk_ms (counting the gaps inserted between them); a segment
+    longer than that is cut into pieces.
+
+    Args:
+        speech_segments (list): (start_ms, end_ms) tuples from detect_speech
+        max_chunk_ms (int): Maximum chunk length in milliseconds
+
+    Returns:
+        list: Chunks in order, each a list of (start_ms, end_ms) ranges
+    """
+    pieces = []
+    for start, end in speech_segments:
+        while end - start > max_chunk_ms:
+            pieces.append((start, start + max_chunk_ms))
+            start += max_chunk_ms
+        pieces.append((start, end))
+
+    chunks = []
+    length = 0
+    for start, end in pieces:
+        piece_length = end - start
+        if chunks and length + SEGMENT_GAP_MS + piece_length <= max_chunk_ms:
+            chunks[-1].append((start, end))
+            length += SEGMENT_GAP_MS + piece_length
+        else:
+            chunks.append([(start, end)])
+            length = piece_length
+
+    return chunks
+
+
+def chunk_audio(audio, ranges):
+    """
+    Cut a chunk's speech out of the recording, leaving out the silence between ranges
+
+    Args:
+        audio (AudioSegment): The whole recording
+        ranges (list): (start_ms, end_ms) ranges of the chunk
+
+    Returns:
+        AudioSegment
+    """
+    start, end = ranges[0]
+    result = audio[start:end]
+    if len(ranges) > 1:
+        gap = AudioSegment.silent(duration=SEGMENT_GAP_MS, frame_rate=audio.frame_rate)
+        gap = gap.set_sample_width(audio.sample_width).set_channels(audio.channels)
+        for start, end in ranges[1:]:
+            result = result + gap + audio[start:end]
+    return result
+
+
+def to_audio_data(segment):
+    """Convert an AudioSegment to the AudioData type used by the backends"""
+    return sr.AudioData(segment.raw_data, segment.frame_rate, segment.sample_width)
+
+
+def transcribe_chunks(audio, chunks, backend, language="en-US", workers=TRANSCRIPTION_WORKERS,
+                      on_segment=None):
+    """
+    Transcribe chunks of a recording concurrently
+
+    Args:
+        audio (AudioSegment): The whole recording
+        chunks (list): Chunks from plan_chunks
+        backend (SpeechBackend): Recognizer used for every chunk
+        language (str): Language code
+        workers (int): Number of chunks transcribed at once
+        on_segment (callable): Called with (index, segment) as each segment
+            becomes available, in chunk order
+
+    Returns:
+        list: {"start", "end", "text"} segments in chunk order (times in
+            seconds); segments whose request failed also carry "error"
+
+    Raises:
+        sr.RequestError: If every chunk failed because the recognizer was unavailable
+    """
+    errors = []
+
+    def transcribe_one(ranges):
+        start, end = ranges[0][0], ranges[-1][1]
+        try:
+            text = backend.transcribe(to_audio_data(chunk_audio(audio, ranges)), language)
+        except sr.UnknownValueError:
+            text = ""
+        except sr.RequestError as e:
+            errors.append(e)
+            return {"start": round(start / 1000, 2), "end": round(end / 1000, 2), "text": "", "error": str(e)}
+        return {"start": round(start / 1000, 2), "end": round(end / 1000, 2), "text": text.strip()}
+
+    if not chunks:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as executor:
+        # executor.map returns results in chunk order
+        segments = []
+        for index, segment in enumerate(executor.map(transcribe_one, chunks)):
+            segments.append(segment)
+            if on_segment:
+                on_segment(index, segment)
+
+    if errors and len(errors) == len(chunks):
+        raise errors[0]
+    if errors:
+        print(f"Transcription failed for {len(errors)} of {len(chunks)} chunks: {errors[0]}")
+
+    return segments
+
+
+def transcribe_pcm(audio, backend=None, language="en-US", workers=TRANSCRIPTION_WORKERS,
+                   on_plan=None, on_segment=None, use_cache=True):
+    """
+    Transcribe decoded audio, reusing a cached result for identical audio
+
+    Args:
+        audio (AudioSegment): Decoded 16 kHz mono audio
+        backend (SpeechBackend): Recognizer to use (defaults to the configured backend)
+        language (str): Language code
+        workers (int): Number of chunks transcribed at once
+        on_plan (callable): Called with (number of chunks, vad stats) before
+            recognition starts
+        on_segment (callable): Called with (index, segment) as segments finish
+        use_cache (bool): Look up and store the result in the transcription cache
+
+    Returns:
+        dict: "text" (stitched transcript), "segments" (timestamped chunk
+            results), "duration" (seconds), "chunks" (number of chunks),
+            "vad" (seconds of speech kept and silence removed) and "cached"
+    """
+    backend = backend or get_speech_backend()
+    cache_key = transcription_cache_key(audio, backend.name, language) if use_cache else None
+
+    cached = get_cached_transcription(cache_key) if cache_key else None
+    if cached:
+        print(f"Transcription cache hit for {cached['duration']}s of audio")
+        if on_plan:
+            on_plan(cached["chunks"], cached["vad"])
+        if on_segment:
+            for index, segment in enumerate(cached["segments"]):
+                on_segment(index, segment)
+        cached["cached"] = True
+        return cached
+
+    speech_segments, vad_stats = detect_speech(audio)
+    chunks = plan_chunks(speech_segments)
+    if on_plan:
+        on_plan(len(chunks), vad_stats)
+    segments = transcribe_chunks(audio, chunks, backend, language, workers, on_segment)
+
+    result = {
+        "text": " ".join(s["text"] for s in segments if s["text"]),
+        "segments": segments,
+        "duration": round(len(audio) / 1000, 2),
+        "chunks": len(chunks),
+        "vad": vad_stats,
+    }
+
+    # Results with failed chunks are not cached so a retry can fill them in
+    if cache_key and not any("error" in s for s in segments):
+        store_transcription(cache_key, backend.name, language, result)
+
+    result["cached"] = False
+    return result
+
+
+def transcribe_file(file_path, backend=None, language="en-US", workers=TRANSCRIPTION_WORKERS):
+    """
+    Transcribe an audio file through the chunked pipeline
+
+    Args:
+        file_path (str): Path to the audio file
+        backend (SpeechBackend): Recognizer to use (defaults to the configured backend)
+        language (str): Language code
+        workers (int): Number of chunks transcribed at once
+
+    Returns:
+        dict: Result of transcribe_pcm
+    """
+    return transcribe_pcm(load_audio(file_path), backend, language, workers)
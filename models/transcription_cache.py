@@ -0,0 +1,119 @@
+"""
+Transcription Cache module for Health Companion app
+
+Stores finished transcripts keyed by a hash of the decoded PCM audio plus
+the backend and language, so re-uploading the same recording returns the
+earlier result without running recognition again. Entries are kept in
+SQLite and the least recently used ones are evicted once the cache grows
+past its size limit.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from .database import DB_PATH
+
+# Total size of cached transcripts (text + segments) before eviction starts
+TRANSCRIPTION_CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIPTION_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+
+
+def transcription_cache_key(audio, backend_name, language):
+    """
+    Fingerprint decoded audio for the cache
+
+    The hash is taken over the PCM samples rather than the uploaded bytes,
+    so the same recording in a different container or with different
+    metadata still hits the cache.
+
+    Args:
+        audio (AudioSegment): Decoded 16 kHz mono audio
+        backend_name (str): Name of the speech backend
+        language (str): Language code
+
+    Returns:
+        str: Cache key
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{audio.frame_rate}:{audio.sample_width}:{audio.channels}:".encode())
+    digest.update(audio.raw_data)
+    return f"{digest.hexdigest()}:{backend_name}:{language}"
+
+
+def get_cached_transcription(cache_key):
+    """
+    Look up a cached transcription result
+
+    Args:
+        cache_key (str): Key from transcription_cache_key
+
+    Returns:
+        dict: The stored result, or None on a miss
+    """
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            row = conn.execute(
+                "SELECT result_data FROM transcription_cache WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE transcription_cache SET last_used_at = ? WHERE cache_key = ?",
+                (time.time(), cache_key),
+            )
+            conn.commit()
+            return json.loads(row[0])
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Error reading transcription cache: {str(e)}")
+        return None
+
+
+def store_transcription(cache_key, backend_name, language, result, max_bytes=None):
+    """
+    Save a transcription result and evict old entries beyond the size limit
+
+    Args:
+        cache_key (str): Key from transcription_cache_key
+        backend_name (str): Name of the speech backend
+        language (str): Language code
+        result (dict): Transcription result (text, segments, ...)
+        max_bytes (int): Size limit (defaults to TRANSCRIPTION_CACHE_MAX_BYTES)
+    """
+    max_bytes = TRANSCRIPTION_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    result_json = json.dumps(result)
+    size = len(result_json.encode("utf-8"))
+
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            conn.execute(
+                """INSERT OR REPLACE INTO transcription_cache
+                (cache_key, backend, language, result_data, size_bytes, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (cache_key, backend_name, language, result_json, size, time.time()),
+            )
+
+            total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM transcription_cache").fetchone()[0]
+            if total > max_bytes:
+                # Walk from least to most recently used, dropping entries until under the limit
+                rows = conn.execute(
+                    "SELECT cache_key, size_bytes FROM transcription_cache ORDER BY last_used_at"
+                ).fetchall()
+                evicted = []
+                for key, entry_size in rows:
+                    if total <= max_bytes:
+                        break
+                    evicted.append((key,))
+                    total -= entry_size
+                conn.executemany("DELETE FROM transcription_cache WHERE cache_key = ?", evicted)
+                print(f"Evicted {len(evicted)} transcription cache entries")
+
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Error writing transcription cache: {str(e)}")
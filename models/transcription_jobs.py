@@ -0,0 +1,235 @@
+"""
+Transcription Jobs module for Health Companion app
+
+Uploaded recordings are decoded in memory and transcribed in the background
+so the upload request returns at once. Each job records its progress and
+the transcript segments finished so far, which the client polls for and
+shows as they arrive. Job state is kept in SQLite rather than in process
+memory, so a poll answered by a different server worker than the one
+running the job still finds it.
+"""
+import json
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import speech_recognition as sr
+
+from .audio_decoding import decode_audio
+from .database import DB_PATH
+from .notes_processor import clean_transcription
+from .transcription import transcribe_pcm
+
+# Recordings converted and transcribed at the same time
+TRANSCRIPTION_JOB_WORKERS = 2
+
+# Finished jobs are forgotten after this many seconds
+JOB_TTL_SECONDS = 3600
+
+# Unfinished jobs with no progress for this many seconds were lost to a
+# crash or restart and are marked as failed
+JOB_STALE_SECONDS = 600
+
+STALE_JOB_ERROR = "Transcription was interrupted. Please upload the recording again."
+
+# Columns of the transcription_jobs table, in the order they are selected
+JOB_COLUMNS = [
+    "id", "filename", "status", "progress", "chunks_total", "chunks_done", "duration",
+    "vad", "cached", "text", "error", "created_at", "updated_at",
+]
+
+_executor = ThreadPoolExecutor(max_workers=TRANSCRIPTION_JOB_WORKERS, thread_name_prefix="transcription")
+
+
+def _update_job(job_id, **changes):
+    """Write changes to a job's row"""
+    changes["updated_at"] = time.time()
+    if "vad" in changes:
+        changes["vad"] = json.dumps(changes["vad"])
+    assignments = ", ".join(f"{column} = ?" for column in changes)
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute(
+            f"UPDATE transcription_jobs SET {assignments} WHERE id = ?",
+            (*changes.values(), job_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _add_segment(job_id, index, segment, chunks_total):
+    """Store a finished segment and the job's progress in one transaction"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute(
+            """INSERT OR REPLACE INTO transcription_job_segments
+            (job_id, segment_index, segment_data) VALUES (?, ?, ?)""",
+            (job_id, index, json.dumps(segment)),
+        )
+        conn.execute(
+            """UPDATE transcription_jobs
+            SET chunks_done = ?, progress = ?, updated_at = ? WHERE id = ?""",
+            (index + 1, round((index + 1) / chunks_total, 3) if chunks_total else 0.0, time.time(), job_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _expire_stale_jobs(conn, job_id=None):
+    """
+    Mark unfinished jobs without progress for JOB_STALE_SECONDS as failed
+
+    Args:
+        conn (sqlite3.Connection): Open connection; the caller commits
+        job_id (str): Only check this job (default: every job)
+    """
+    now = time.time()
+    query = """UPDATE transcription_jobs SET status = 'error', error = ?, updated_at = ?
+    WHERE status NOT IN ('done', 'error') AND updated_at < ?"""
+    params = [STALE_JOB_ERROR, now, now - JOB_STALE_SECONDS]
+    if job_id is not None:
+        query += " AND id = ?"
+        params.append(job_id)
+    conn.execute(query, params)
+
+
+def _prune_jobs():
+    """Fail stale jobs and forget finished jobs older than JOB_TTL_SECONDS"""
+    cutoff = time.time() - JOB_TTL_SECONDS
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        _expire_stale_jobs(conn)
+        conn.execute("""
+        DELETE FROM transcription_job_segments WHERE job_id IN (
+            SELECT id FROM transcription_jobs WHERE status IN ('done', 'error') AND updated_at < ?
+        )
+        """, (cutoff,))
+        conn.execute(
+            "DELETE FROM transcription_jobs WHERE status IN ('done', 'error') AND updated_at < ?",
+            (cutoff,),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def submit_transcription_job(audio_file, filename, language="en-US"):
+    """
+    Queue an uploaded recording for background transcription
+
+    The job takes ownership of audio_file and closes it when it finishes,
+    whether it succeeded or not.
+
+    Args:
+        audio_file: Binary file object holding the upload (see spool_upload)
+        filename (str): Original file name; its extension selects the decoder
+        language (str): Language code
+
+    Returns:
+        str: Job ID
+    """
+    _prune_jobs()
+
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute(
+            """INSERT INTO transcription_jobs (id, filename, status, created_at, updated_at)
+            VALUES (?, ?, 'queued', ?, ?)""",
+            (job_id, filename, now, now),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    _executor.submit(_run_job, job_id, audio_file, os.path.splitext(filename)[1], language)
+    return job_id
+
+
+def _run_job(job_id, audio_file, audio_format, language):
+    """Decode and transcribe one recording (runs on the job pool)"""
+    try:
+        _update_job(job_id, status="converting")
+        audio = decode_audio(audio_file, audio_format)
+        # The decoded PCM is all that is needed from here on
+        audio_file.close()
+
+        plan = {"chunks_total": 0}
+
+        def on_plan(chunk_count, vad_stats):
+            plan["chunks_total"] = chunk_count
+            _update_job(
+                job_id, status="transcribing", duration=round(len(audio) / 1000, 2),
+                chunks_total=chunk_count, vad=vad_stats,
+            )
+
+        def on_segment(index, segment):
+            _add_segment(job_id, index, segment, plan["chunks_total"])
+
+        result = transcribe_pcm(audio, language=language, on_plan=on_plan, on_segment=on_segment)
+        text = clean_transcription(result["text"])
+
+        if not text:
+            text = "Transcription produced no results. Please try uploading a clearer audio file or entering text manually."
+        _update_job(job_id, status="done", progress=1.0, text=text, cached=result["cached"])
+        print(
+            f"Transcription job {job_id} finished: {result['chunks']} chunks, "
+            f"{result['vad']['removed_seconds']}s of {result['vad']['audio_seconds']}s removed as silence"
+            + (" (cached)" if result["cached"] else "")
+        )
+
+    except sr.RequestError as e:
+        _update_job(
+            job_id, status="error",
+            error=f"Could not request results from Speech Recognition service; {e}. Check your internet connection.",
+        )
+    except Exception as e:
+        print(f"Error in transcription job {job_id}: {str(e)}")
+        _update_job(job_id, status="error", error=f"Error processing audio: {str(e)}")
+    finally:
+        audio_file.close()
+
+
+def get_transcription_job(job_id, since=0):
+    """
+    Get the state of a transcription job
+
+    Args:
+        job_id (str): Job ID from submit_transcription_job
+        since (int): Number of segments the caller already has; only
+            later segments are returned
+
+    Returns:
+        dict: Copy of the job (segments from index `since` on), or None if
+            the job does not exist
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        # A job lost to a restart would otherwise be polled forever
+        _expire_stale_jobs(conn, job_id)
+        conn.commit()
+        row = conn.execute(
+            f"SELECT {', '.join(JOB_COLUMNS)} FROM transcription_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        segment_rows = conn.execute(
+            """SELECT segment_data FROM transcription_job_segments
+            WHERE job_id = ? ORDER BY segment_index LIMIT -1 OFFSET ?""",
+            (job_id, max(0, since)),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    result = dict(zip(JOB_COLUMNS, row))
+    result["vad"] = json.loads(result["vad"]) if result["vad"] else None
+    result["cached"] = bool(result["cached"])
+    result["segments"] = [json.loads(segment_data) for (segment_data,) in segment_rows]
+    result["segments_offset"] = since
+    return result
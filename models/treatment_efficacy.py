@@ -1,13 +1,92 @@
 # models/treatment_efficacy.py
 """
 Treatment Efficacy Analyzer module for Health Companion app
+
+The analysis is linear in the number of visits: symptom occurrences are
+grouped per symptom, treatments are kept in a date-sorted timeline searched
+with bisect, and every regex is compiled once (per medication for the
+dosage patterns built around one). Each patient's extracted timeline is
+cached, so a repeated analysis only extracts visits added since the last one,
+and returns the cached result without loading any notes while no note or
+summary has changed.
 """
 
+import copy
+import hashlib
 import json
 import sqlite3
 import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
 from datetime import datetime
-from models.database import DB_PATH
+from functools import lru_cache
+from models.database import DB_PATH, get_notes_version
+from models.note_document import as_note_document, get_note_document
+from models.medications import normalize_medication, same_dosage
+from models.severity import extract_severity
+
+# Number of medications whose dosage patterns are kept compiled
+TERM_PATTERN_CACHE_SIZE = 1024
+
+# Patients whose timelines and results are kept in memory
+EFFICACY_CACHE_SIZE = 128
+
+# Ranks used to compare severities given as words
+SEVERITY_RANKS = {
+    "mild": 1,
+    "minimal": 1,
+    "slight": 1,
+    "moderate": 2,
+    "significant": 2,
+    "severe": 3,
+    "extreme": 4,
+    "intense": 3,
+    "debilitating": 4,
+    "worst": 4,
+}
+
+# Patterns for improvement
+IMPROVEMENT_PATTERNS = [
+    re.compile(r"(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:has|have|is|are)\s+(?:improved|better|decreased|reduced|subsided)", re.IGNORECASE),
+    re.compile(r"(?:improvement|decrease|reduction)\s+in\s+(?:the|my|her|his|their)\s+([^\.]+)", re.IGNORECASE),
+    re.compile(r"(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:is|are)\s+(?:less|not as)\s+(?:severe|intense|painful|frequent)", re.IGNORECASE),
+    re.compile(r"(?:report|mention|note)\s+(?:that|of)\s+(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:is|has|have)\s+(?:improved|better)", re.IGNORECASE),
+]
+
+# Patterns for worsening
+WORSENING_PATTERNS = [
+    re.compile(r"(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:has|have|is|are)\s+(?:worse|worsened|increased|intensified)", re.IGNORECASE),
+    re.compile(r"(?:worsening|increase|intensification)\s+in\s+(?:the|my|her|his|their)\s+([^\.]+)", re.IGNORECASE),
+    re.compile(r"(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:is|are)\s+(?:more)\s+(?:severe|intense|painful|frequent)", re.IGNORECASE),
+    re.compile(r"(?:report|mention|note)\s+(?:that|of)\s+(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:is|has|have)\s+(?:worse|worsened)", re.IGNORECASE),
+]
+
+# Mentions starting with a pronoun are about a person, not a symptom
+NON_SYMPTOM_PREFIXES = ("i ", "he ", "she ", "they ", "we ")
+
+SYMPTOM_STOPWORDS = {"a", "an", "the", "this", "that", "these", "those", "some", "any"}
+
+DOSAGE_UNITS = r"(?:mg|mcg|g|ml|tablet|tabs|cap|pill)"
+DOSAGE_FREQUENCY = r"(?:/day|/daily|daily|twice daily|BID|TID|QID)?"
+DOSAGE_IN_MEDICATION_PATTERN = re.compile(rf"(\d+\s*{DOSAGE_UNITS})", re.IGNORECASE)
+
+
+_efficacy_lock = threading.Lock()
+_efficacy_cache = OrderedDict()
+
+
+@lru_cache(maxsize=TERM_PATTERN_CACHE_SIZE)
+def _dosage_patterns(base_name):
+    """Dosage patterns around one medication name, compiled on first use"""
+    escaped_name = re.escape(base_name)
+    dosage = rf"(\d+\s*{DOSAGE_UNITS}{DOSAGE_FREQUENCY})"
+    return (
+        re.compile(rf"{escaped_name}\s+{dosage}", re.IGNORECASE),
+        re.compile(rf"{escaped_name}[^\.]*?{dosage}", re.IGNORECASE),
+        re.compile(rf"(?:prescribed|taking|started|initiated)\s+{escaped_name}\s+{dosage}", re.IGNORECASE),
+        re.compile(rf"(?:prescribed|taking|started|initiated)[^\.]*?{escaped_name}[^\.]*?{dosage}", re.IGNORECASE),
+    )
 
 
 def get_patient_notes(patient_name):
@@ -198,51 +277,11 @@ def extract_symptom_severity(note_text, symptom):
         symptom (str): The symptom to look for
 
     Returns:
-        str: Severity level or None if not found
+        str: Severity word or number out of 10 as written (lowercase), or
+            None if not found (see models.severity.extract_severity)
     """
-    # Guard against None values
-    if note_text is None or symptom is None:
-        return None
-
-    # Look for severity indicators near the symptom in the text
-    patterns = [
-        rf"{symptom}.*?(mild|moderate|severe|extreme)",
-        rf"{symptom}.*?(\d+)/10",
-        rf"{symptom}.*?intensity of (\d+)",
-        rf"{symptom}.*?(?:rated|scale|score)[^\d]*(\d+)",
-        rf"(mild|moderate|severe|extreme).*?{symptom}",
-    ]
-
-    for pattern in patterns:
-        try:
-            match = re.search(pattern, note_text, re.IGNORECASE)
-            if match:
-                return match.group(1).lower()
-        except Exception as e:
-            print(f"Error in regex search for severity: {e}")
-            continue
-
-    # Look for severity keywords in context
-    keywords = {
-        "mild": 1,
-        "minimal": 1,
-        "slight": 1,
-        "moderate": 2,
-        "significant": 2,
-        "severe": 3,
-        "extreme": 4,
-        "intense": 3,
-        "debilitating": 4,
-        "worst": 4,
-    }
-
-    symptom_context = extract_symptom_context(note_text, symptom)
-    if symptom_context:
-        for keyword, value in keywords.items():
-            if keyword in symptom_context.lower():
-                return str(value)
-
-    return None
+    severity = extract_severity(note_text, symptom)
+    return severity["label"] if severity else None
 
 
 def extract_symptom_context(note_text, symptom, window_size=100):
@@ -251,21 +290,32 @@ def extract_symptom_context(note_text, symptom, window_size=100):
     if note_text is None or symptom is None:
         return None
 
-    # Escape regex special characters in the symptom
-    try:
-        safe_symptom = re.escape(symptom)
-
-        match = re.search(
-            rf"(.{{0,{window_size}}}{safe_symptom}.{{0,{window_size}}})",
-            note_text,
-            re.IGNORECASE,
-        )
-        if match:
-            return match.group(1)
-    except Exception as e:
-        print(f"Error extracting symptom context: {e}")
+    document = as_note_document(note_text)
+    occurrences = document.find_all(symptom)
+    if not occurrences:
+        return None
 
-    return None
+    text = document.text
+    length = len(symptom)
+
+    # Same result as the regex (.{0,w}symptom.{0,w}): the window never
+    # crosses a line break, starts up to w characters before the first
+    # mention and ends w characters after the last mention it reaches
+    first = occurrences[0]
+    line_start = text.rfind("\n", 0, first) + 1
+    line_end = text.find("\n", first)
+    if line_end == -1:
+        line_end = len(text)
+
+    start = max(line_start, first - window_size)
+    last = first
+    for offset in occurrences[1:]:
+        if offset > start + window_size or offset + length > line_end:
+            break
+        last = offset
+
+    end = min(line_end, last + length + window_size)
+    return text[start:end]
 
 
 def extract_improvement_mentions(note_text):
@@ -284,63 +334,24 @@ def extract_improvement_mentions(note_text):
 
     mentions = []
 
-    # Patterns for improvement
-    improvement_patterns = [
-        r"(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:has|have|is|are)\s+(?:improved|better|decreased|reduced|subsided)",
-        r"(?:improvement|decrease|reduction)\s+in\s+(?:the|my|her|his|their)\s+([^\.]+)",
-        r"(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:is|are)\s+(?:less|not as)\s+(?:severe|intense|painful|frequent)",
-        r"(?:report|mention|note)\s+(?:that|of)\s+(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:is|has|have)\s+(?:improved|better)",
-    ]
-
-    # Patterns for worsening
-    worsening_patterns = [
-        r"(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:has|have|is|are)\s+(?:worse|worsened|increased|intensified)",
-        r"(?:worsening|increase|intensification)\s+in\s+(?:the|my|her|his|their)\s+([^\.]+)",
-        r"(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:is|are)\s+(?:more)\s+(?:severe|intense|painful|frequent)",
-        r"(?:report|mention|note)\s+(?:that|of)\s+(?:the|my|her|his|their)\s+([^\.]+?)\s+(?:is|has|have)\s+(?:worse|worsened)",
-    ]
-
-    # Extract improvements
-    for pattern in improvement_patterns:
-        try:
-            matches = re.finditer(pattern, note_text, re.IGNORECASE)
-            for match in matches:
-                symptom_text = match.group(1).strip()
-                # Filter out non-symptom matches
-                if len(symptom_text) > 3 and not symptom_text.lower().startswith(
-                    ("i ", "he ", "she ", "they ", "we ")
-                ):
-                    mentions.append(
-                        {
-                            "symptom": clean_symptom_name(symptom_text),
-                            "change": "improved",
-                            "text": match.group(0),
-                        }
-                    )
-        except Exception as e:
-            print(f"Error extracting improvement mentions: {e}")
-            continue
-
-    # Extract worsenings
-    for pattern in worsening_patterns:
-        try:
-            matches = re.finditer(pattern, note_text, re.IGNORECASE)
-            for match in matches:
+    for patterns, change in (
+        (IMPROVEMENT_PATTERNS, "improved"),
+        (WORSENING_PATTERNS, "worsened"),
+    ):
+        for pattern in patterns:
+            for match in pattern.finditer(note_text):
                 symptom_text = match.group(1).strip()
                 # Filter out non-symptom matches
                 if len(symptom_text) > 3 and not symptom_text.lower().startswith(
-                    ("i ", "he ", "she ", "they ", "we ")
+                    NON_SYMPTOM_PREFIXES
                 ):
                     mentions.append(
                         {
                             "symptom": clean_symptom_name(symptom_text),
-                            "change": "worsened",
+                            "change": change,
                             "text": match.group(0),
                         }
                     )
-        except Exception as e:
-            print(f"Error extracting worsening mentions: {e}")
-            continue
 
     return mentions
 
@@ -355,6 +366,21 @@ def analyze_treatment_efficacy(patient_name):
     Returns:
         dict: Analysis of treatment efficacy
     """
+    cache_key = (patient_name or "").lower().strip()
+
+    # While no note or summary changed, the cached result is still current
+    notes_version = get_notes_version()
+    with _efficacy_lock:
+        timeline = _efficacy_cache.get(cache_key)
+        if (
+            timeline is not None
+            and notes_version is not None
+            and timeline.notes_version == notes_version
+            and timeline.result is not None
+        ):
+            _efficacy_cache.move_to_end(cache_key)
+            return _efficacy_response(patient_name, timeline.result)
+
     # Fetch all notes for this patient
     notes = get_patient_notes(patient_name)
     if not notes or len(notes) < 2:
@@ -364,77 +390,80 @@ def analyze_treatment_efficacy(patient_name):
 
     # Sort notes by date
     notes.sort(key=lambda x: x.get("created_at", ""))
+    note_keys = [efficacy_note_key(note) for note in notes]
+
+    # Take the patient's timeline out of the cache while it is updated, so a
+    # concurrent analysis builds its own instead of sharing a half-updated one
+    with _efficacy_lock:
+        timeline = _efficacy_cache.pop(cache_key, None)
+
+    known = len(timeline.note_keys) if timeline is not None else 0
+    if timeline is None or timeline.note_keys != note_keys[:known]:
+        # New patient, or an earlier visit was edited, deleted or back-dated
+        timeline = PatientTimeline()
+        known = 0
+    for note, note_key in zip(notes[known:], note_keys[known:]):
+        # Only visits appended since the last analysis are extracted
+        timeline.add_note(note, note_key)
+        timeline.result = None
+
+    if timeline.result is None:
+        timeline.result = summarize_treatment_efficacy(timeline.treatments, timeline.symptoms)
+    # Read before the notes were loaded, so a change made meanwhile is not missed
+    timeline.notes_version = notes_version
+
+    with _efficacy_lock:
+        _efficacy_cache[cache_key] = timeline
+        while len(_efficacy_cache) > EFFICACY_CACHE_SIZE:
+            _efficacy_cache.popitem(last=False)
+
+    return _efficacy_response(patient_name, timeline.result)
+
+
+def _efficacy_response(patient_name, result):
+    """Copy of a cached result for one request, dated now"""
+    return {
+        "patient_name": patient_name,
+        **copy.deepcopy(result),
+        "analysis_date": datetime.now().isoformat(),
+    }
 
-    # Extract treatments and symptoms over time
-    treatments_timeline = []
-    symptoms_timeline = []
 
-    for note in notes:
-        visit_date = note.get("created_at")
-        note_id = note.get("id")
-        note_text = note.get("original", "")
+def efficacy_note_key(note):
+    """
+    Key identifying a note's content for the efficacy cache
 
-        # Get medications/treatments from this visit
-        if note.get("summary") and note["summary"].get("drug_history"):
-            for treatment in note["summary"]["drug_history"]:
-                treatments_timeline.append(
-                    {
-                        "date": visit_date,
-                        "treatment": treatment,
-                        "note_id": note_id,
-                        "dosage": extract_dosage(treatment, note_text),
-                    }
-                )
+    Args:
+        note (dict): Note from get_patient_notes
 
-        # Get symptoms from this visit
-        if note.get("summary") and note["summary"].get("symptoms"):
-            for symptom in note["summary"]["symptoms"]:
-                severity = extract_symptom_severity(note_text, symptom)
-                symptoms_timeline.append(
-                    {
-                        "date": visit_date,
-                        "symptom": symptom,
-                        "severity": severity,
-                        "note_id": note_id,
-                        "raw_text": extract_symptom_context(note_text, symptom, 150),
-                    }
-                )
+    Returns:
+        tuple: (note ID, visit date, hash of the note text and summary)
+    """
+    digest = hashlib.sha256((note.get("original") or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(note.get("summary"), sort_keys=True).encode("utf-8"))
+    return (note.get("id"), note.get("created_at"), digest.hexdigest())
 
-        # Also look for explicit mentions of improvement/worsening in the text
-        improvement_mentions = extract_improvement_mentions(note_text)
-        for mention in improvement_mentions:
-            # Check if this mention matches any known symptom
-            matched_symptom = None
-            for symptom_entry in symptoms_timeline:
-                if symptom_entry["symptom"].lower() in mention["text"].lower():
-                    matched_symptom = symptom_entry["symptom"]
-                    break
 
-            # If no match, use the extracted symptom from the mention
-            if not matched_symptom:
-                matched_symptom = mention.get("symptom", "Unnamed symptom")
+def summarize_treatment_efficacy(treatments_timeline, symptoms_timeline):
+    """
+    Correlate a patient's symptom changes with the treatments started before them
 
-            symptoms_timeline.append(
-                {
-                    "date": visit_date,
-                    "symptom": matched_symptom,
-                    "severity": None,  # No explicit severity
-                    "note_id": note_id,
-                    "change": mention["change"],  # 'improved' or 'worsened'
-                    "raw_text": mention["text"],
-                }
-            )
+    Args:
+        treatments_timeline (list): Treatments from build_timelines
+        symptoms_timeline (list): Symptom observations from build_timelines
 
+    Returns:
+        dict: analysis_date, treatment_effectiveness and detailed_analysis
+    """
     # Analyze the correlation between treatments and symptom changes
     efficacy_analysis = []
+    treatments = TreatmentTimeline(treatments_timeline)
 
     # Group symptoms by name to track over time
     symptom_groups = {}
     for entry in symptoms_timeline:
-        symptom = entry["symptom"]
-        if symptom not in symptom_groups:
-            symptom_groups[symptom] = []
-        symptom_groups[symptom].append(entry)
+        symptom_groups.setdefault(entry["symptom"], []).append(entry)
 
     # For each symptom, analyze treatments that might have affected it
     for symptom, occurrences in symptom_groups.items():
@@ -444,18 +473,16 @@ def analyze_treatment_efficacy(patient_name):
         # Sort by date
         sorted_occurrences = sorted(occurrences, key=lambda x: x["date"])
 
-        for i in range(1, len(sorted_occurrences)):
-            current = sorted_occurrences[i]
-            previous = sorted_occurrences[i - 1]
-
+        for previous, current in zip(sorted_occurrences, sorted_occurrences[1:]):
             # Determine if the symptom improved or worsened
             if "change" in current:
                 # If we have an explicit change mention, use that
                 severity_change = current["change"]
             else:
-                # Otherwise compare severities
+                # Otherwise compare severities on the 0-10 scale, since the
+                # labels of two visits may mix words and numbers
                 severity_change = compare_severity(
-                    current.get("severity"), previous.get("severity")
+                    current.get("severity_score"), previous.get("severity_score")
                 )
 
             # Skip if no change detected
@@ -463,9 +490,7 @@ def analyze_treatment_efficacy(patient_name):
                 continue
 
             # Find treatments that were started between these two visits
-            new_treatments = find_treatments_between_dates(
-                treatments_timeline, previous["date"], current["date"]
-            )
+            new_treatments = treatments.started_between(previous["date"], current["date"])
 
             if new_treatments:
                 efficacy_analysis.append(
@@ -484,8 +509,10 @@ def analyze_treatment_efficacy(patient_name):
 
     # Generate an overall effectiveness report
     treatment_effectiveness = {}
+    listed_symptoms = {}  # treatment -> symptoms already in its improved/worsened lists
 
     for entry in efficacy_analysis:
+        positive = entry["correlation"] == "positive"
         for treatment in entry["treatments"]:
             treatment_name = extract_base_med_name(treatment["treatment"])
 
@@ -498,42 +525,29 @@ def analyze_treatment_efficacy(patient_name):
                     "latest_dosage": treatment.get("dosage"),
                     "evidence": [],
                 }
-
-            if entry["correlation"] == "positive":
-                treatment_effectiveness[treatment_name]["positive"] += 1
-                if (
-                    entry["symptom"]
-                    not in treatment_effectiveness[treatment_name]["symptoms_improved"]
-                ):
-                    treatment_effectiveness[treatment_name]["symptoms_improved"].append(
-                        entry["symptom"]
-                    )
-                # Add the evidence text
-                treatment_effectiveness[treatment_name]["evidence"].append(
-                    {
-                        "type": "improvement",
-                        "symptom": entry["symptom"],
-                        "text": entry["evidence"],
-                    }
-                )
-            # Continuing models/treatment_efficacy.py
+                listed_symptoms[treatment_name] = (set(), set())
+
+            data = treatment_effectiveness[treatment_name]
+            improved, worsened = listed_symptoms[treatment_name]
+            if positive:
+                data["positive"] += 1
+                if entry["symptom"] not in improved:
+                    improved.add(entry["symptom"])
+                    data["symptoms_improved"].append(entry["symptom"])
             else:
-                treatment_effectiveness[treatment_name]["negative"] += 1
-                if (
-                    entry["symptom"]
-                    not in treatment_effectiveness[treatment_name]["symptoms_worsened"]
-                ):
-                    treatment_effectiveness[treatment_name]["symptoms_worsened"].append(
-                        entry["symptom"]
-                    )
-                # Add the evidence text
-                treatment_effectiveness[treatment_name]["evidence"].append(
-                    {
-                        "type": "worsening",
-                        "symptom": entry["symptom"],
-                        "text": entry["evidence"],
-                    }
-                )
+                data["negative"] += 1
+                if entry["symptom"] not in worsened:
+                    worsened.add(entry["symptom"])
+                    data["symptoms_worsened"].append(entry["symptom"])
+
+            # Add the evidence text
+            data["evidence"].append(
+                {
+                    "type": "improvement" if positive else "worsening",
+                    "symptom": entry["symptom"],
+                    "text": entry["evidence"],
+                }
+            )
 
     # Calculate effectiveness scores
     for treatment, data in treatment_effectiveness.items():
@@ -552,13 +566,158 @@ def analyze_treatment_efficacy(patient_name):
             treatment_effectiveness[treatment]["dosage_changes"] = changes
 
     return {
-        "patient_name": patient_name,
         "analysis_date": datetime.now().isoformat(),
         "treatment_effectiveness": treatment_effectiveness,
         "detailed_analysis": efficacy_analysis,
     }
 
 
+def build_timelines(notes):
+    """
+    Collect the treatments and symptom observations of a patient's visits
+
+    Args:
+        notes (list): The patient's notes, sorted by date
+
+    Returns:
+        tuple: (treatments timeline, symptoms timeline), both in visit order
+    """
+    timeline = PatientTimeline()
+    for note in notes:
+        timeline.add_note(note)
+    return timeline.treatments, timeline.symptoms
+
+
+class PatientTimeline:
+    """
+    A patient's treatments and symptom observations, built one visit at a time
+
+    Visits must be added in date order. Improvement mentions are attributed
+    to symptoms seen at earlier visits, so the timeline keeps the symptom
+    names seen so far and a later visit can be added without going over the
+    earlier ones again.
+    """
+
+    def __init__(self):
+        self.treatments = []
+        self.symptoms = []
+        self.note_keys = []  # efficacy_note_key of each visit added
+        self.result = None  # summarize_treatment_efficacy of the visits added
+        self.notes_version = None  # get_notes_version when the timeline was last updated
+
+        # Symptom names seen so far (first-seen order) with their lowercase form,
+        # used to attribute improvement mentions to a known symptom
+        self._known_symptoms = {}
+
+    def add_note(self, note, note_key=None):
+        """
+        Extract one visit's treatments and symptom observations
+
+        Args:
+            note (dict): Note with id, original, created_at and summary
+            note_key (tuple): efficacy_note_key of the note, if already computed
+        """
+        visit_date = note.get("created_at")
+        note_id = note.get("id")
+        note_text = get_note_document(note_id, note.get("original", ""))
+        summary = note.get("summary") or {}
+        known_symptoms = self._known_symptoms
+
+        # Get medications/treatments from this visit
+        for treatment in summary.get("drug_history") or []:
+            self.treatments.append(
+                {
+                    "date": visit_date,
+                    "treatment": treatment,
+                    "note_id": note_id,
+                    "dosage": extract_dosage(treatment, note_text),
+                }
+            )
+
+        # Get symptoms from this visit
+        for symptom in summary.get("symptoms") or []:
+            severity = extract_severity(note_text, symptom) or {}
+            self.symptoms.append(
+                {
+                    "date": visit_date,
+                    "symptom": symptom,
+                    "severity": severity.get("label"),
+                    "severity_score": severity.get("score"),
+                    "note_id": note_id,
+                    "raw_text": extract_symptom_context(note_text, symptom, 150),
+                }
+            )
+            known_symptoms.setdefault(symptom, symptom.lower())
+
+        # Also look for explicit mentions of improvement/worsening in the text
+        for mention in extract_improvement_mentions(note_text.text):
+            # Check if this mention matches any known symptom
+            mention_lower = mention["text"].lower()
+            matched_symptom = next(
+                (name for name, lower in known_symptoms.items() if lower in mention_lower),
+                None,
+            )
+
+            # If no match, use the extracted symptom from the mention
+            if not matched_symptom:
+                matched_symptom = mention.get("symptom", "Unnamed symptom")
+
+            self.symptoms.append(
+                {
+                    "date": visit_date,
+                    "symptom": matched_symptom,
+                    "severity": None,  # No explicit severity
+                    "note_id": note_id,
+                    "change": mention["change"],  # 'improved' or 'worsened'
+                    "raw_text": mention["text"],
+                }
+            )
+            known_symptoms.setdefault(matched_symptom, matched_symptom.lower())
+
+        self.note_keys.append(note_key or efficacy_note_key(note))
+
+
+class TreatmentTimeline:
+    """
+    Treatments sorted by visit date for fast range lookups
+
+    Lookups use bisect on the sorted dates and are memoized per date pair,
+    since every symptom observed at the same two visits asks for the same
+    range.
+    """
+
+    def __init__(self, treatments_timeline):
+        # sorted() is stable, so treatments from the same visit keep their order
+        self.entries = sorted(treatments_timeline, key=lambda entry: entry["date"])
+        self.dates = [entry["date"] for entry in self.entries]
+        self._ranges = {}
+
+    def started_between(self, start_date, end_date):
+        """
+        Treatments first listed after start_date and up to end_date
+
+        Args:
+            start_date: Exclusive lower bound
+            end_date: Inclusive upper bound
+
+        Returns:
+            list: Timeline entries, one per distinct treatment, in date order
+        """
+        key = (start_date, end_date)
+        if key not in self._ranges:
+            low = bisect_right(self.dates, start_date)
+            high = bisect_right(self.dates, end_date)
+            treatments = []
+            seen = set()
+            for entry in self.entries[low:high]:
+                # Keep the first entry of each treatment
+                if entry["treatment"] not in seen:
+                    seen.add(entry["treatment"])
+                    treatments.append(entry)
+            self._ranges[key] = treatments
+        return list(self._ranges[key])
+
+
 def clean_symptom_name(symptom_text):
     """Clean up extracted symptom text"""
     # Guard against None values
@@ -566,10 +725,8 @@ def clean_symptom_name(symptom_text):
         return ""
 
     # Remove common non-symptom words
-    stopwords = ["a", "an", "the", "this", "that", "these", "those", "some", "any"]
-
     words = symptom_text.split()
-    if words and words[0].lower() in stopwords:
+    if words and words[0].lower() in SYMPTOM_STOPWORDS:
         symptom_text = " ".join(words[1:])
 
     return symptom_text
@@ -577,15 +734,7 @@ def clean_symptom_name(symptom_text):
 
 def find_treatments_between_dates(treatments_timeline, start_date, end_date):
     """Find treatments that were started between two dates"""
-    treatments = []
-
-    for entry in treatments_timeline:
-        if start_date < entry["date"] <= end_date:
-            # Check if this treatment is already in the list
-            if not any(t["treatment"] == entry["treatment"] for t in treatments):
-                treatments.append(entry)
-
-    return treatments
+    return TreatmentTimeline(treatments_timeline).started_between(start_date, end_date)
 
 
 def compare_severity(current, previous):
@@ -593,6 +742,14 @@ def compare_severity(current, previous):
     if current is None or previous is None:
         return "unchanged"
 
+    # Scores from severity_score
+    if isinstance(current, (int, float)) and isinstance(previous, (int, float)):
+        if current < previous:
+            return "improved"
+        elif current > previous:
+            return "worsened"
+        return "unchanged"
+
     # If the severity is a number out of 10
     if (
         isinstance(current, str)
@@ -626,21 +783,9 @@ def compare_severity(current, previous):
         pass
 
     # If the severity is a string
-    severity_ranks = {
-        "mild": 1,
-        "minimal": 1,
-        "slight": 1,
-        "moderate": 2,
-        "significant": 2,
-        "severe": 3,
-        "extreme": 4,
-        "intense": 3,
-        "debilitating": 4,
-    }
-
     if isinstance(current, str) and isinstance(previous, str):
-        current_rank = severity_ranks.get(current.lower(), 0)
-        previous_rank = severity_ranks.get(previous.lower(), 0)
+        current_rank = SEVERITY_RANKS.get(current.lower(), 0)
+        previous_rank = SEVERITY_RANKS.get(previous.lower(), 0)
 
         if current_rank < previous_rank:
             return "improved"
@@ -652,26 +797,22 @@ def compare_severity(current, previous):
 
 def extract_dosage(medication, note_text):
     """Extract dosage information for a medication"""
-    # Extract the base medication name (without dosage)
-    base_name = extract_base_med_name(medication)
+    # The medication name as written (without dosage), to find it in the note
+    base_name = normalize_medication(medication)["written_name"]
+
+    # Every pattern stays within one sentence, so only sentences naming the medication can match
+    sentences = as_note_document(note_text).sentences_containing(base_name) if base_name else []
 
     # Look for dosage information in the text
-    dosage_patterns = [
-        rf"{base_name}\s+(\d+\s*(?:mg|mcg|g|ml|tablet|tabs|cap|pill)(?:/day|/daily|daily|twice daily|BID|TID|QID)?)",
-        rf"{base_name}[^\.]*?(\d+\s*(?:mg|mcg|g|ml|tablet|tabs|cap|pill)(?:/day|/daily|daily|twice daily|BID|TID|QID)?)",
-        rf"(?:prescribed|taking|started|initiated)\s+{base_name}\s+(\d+\s*(?:mg|mcg|g|ml|tablet|tabs|cap|pill)(?:/day|/daily|daily|twice daily|BID|TID|QID)?)",
-        rf"(?:prescribed|taking|started|initiated)[^\.]*?{base_name}[^\.]*?(\d+\s*(?:mg|mcg|g|ml|tablet|tabs|cap|pill)(?:/day|/daily|daily|twice daily|BID|TID|QID)?)",
-    ]
-
-    for pattern in dosage_patterns:
-        match = re.search(pattern, note_text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
+    if sentences:
+        for pattern in _dosage_patterns(base_name):
+            for sentence in sentences:
+                match = pattern.search(sentence)
+                if match:
+                    return match.group(1).strip()
 
     # If no dosage found in text but it's in the medication string
-    dosage_match = re.search(
-        r"(\d+\s*(?:mg|mcg|g|ml|tablet|tabs|cap|pill))", medication, re.IGNORECASE
-    )
+    dosage_match = DOSAGE_IN_MEDICATION_PATTERN.search(medication)
     if dosage_match:
         return dosage_match.group(1).strip()
 
@@ -679,24 +820,14 @@ def extract_dosage(medication, note_text):
 
 
 def extract_base_med_name(medication):
-    """Extract the base medication name without dosage"""
-    # Remove dosage information
-    base_name = re.sub(
-        r"\s+\d+\s*(?:mg|mcg|g|ml|tablet|tabs|cap|pill).*",
-        "",
-        medication,
-        flags=re.IGNORECASE,
-    )
-
-    # Remove frequency information
-    base_name = re.sub(
-        r"\s+(?:once|twice|three times|daily|BID|TID|QID).*",
-        "",
-        base_name,
-        flags=re.IGNORECASE,
-    )
+    """
+    Extract the base medication name without dosage
 
-    return base_name.strip()
+    Brand names and other synonyms are resolved to the canonical name from
+    the medications index (e.g. "Glucophage 500mg BID" -> "Metformin");
+    medications missing from the index keep the name as written.
+    """
+    return normalize_medication(medication)["name"]
 
 
 def track_dosage_changes(treatments_timeline):
@@ -711,13 +842,11 @@ def track_dosage_changes(treatments_timeline):
     """
     dosage_changes = {}
 
-    # Group treatments by base name
+    # Group treatments by canonical name
     grouped_treatments = {}
     for treatment in treatments_timeline:
         base_name = extract_base_med_name(treatment["treatment"])
-        if base_name not in grouped_treatments:
-            grouped_treatments[base_name] = []
-        grouped_treatments[base_name].append(treatment)
+        grouped_treatments.setdefault(base_name, []).append(treatment)
 
     # For each medication, track dosage changes
     for med_name, treatments in grouped_treatments.items():
@@ -731,7 +860,7 @@ def track_dosage_changes(treatments_timeline):
         for treatment in sorted_treatments:
             current_dosage = treatment.get("dosage")
 
-            if current_dosage and previous_dosage and current_dosage != previous_dosage:
+            if current_dosage and previous_dosage and not same_dosage(current_dosage, previous_dosage):
                 changes.append(
                     {
                         "date": treatment["date"],
@@ -0,0 +1,155 @@
+"""
+Voice Activity Detection module for Health Companion app
+
+An energy-based detector that finds the stretches of a recording that
+contain speech, so silence and background noise between them are never
+sent to the recognizer. Frame energies are computed with numpy in one pass
+over the PCM samples.
+"""
+import threading
+
+import numpy as np
+
+# Length of the frames energy is measured over
+FRAME_MS = 30
+
+# Frames this far above the noise floor (or below the loudest speech) count as speech
+SPEECH_MARGIN_DB = 12
+
+# Anything quieter than this is silence regardless of the recording's levels
+SILENCE_FLOOR_DB = -55
+
+# Pauses shorter than this are kept inside a speech segment
+MIN_SILENCE_MS = 500
+
+# Bursts shorter than this (clicks, bumps) are dropped
+MIN_SPEECH_MS = 150
+
+# Audio kept on each side of a speech segment so words are not clipped
+PADDING_MS = 200
+
+_stats_lock = threading.Lock()
+_totals = {"recordings": 0, "audio_seconds": 0.0, "speech_seconds": 0.0, "removed_seconds": 0.0}
+
+
+def frame_energies(audio, frame_ms=FRAME_MS):
+    """
+    Energy of each frame of a mono recording in dBFS
+
+    Args:
+        audio (AudioSegment): Mono audio
+        frame_ms (int): Frame length in milliseconds
+
+    Returns:
+        numpy.ndarray: One dBFS value per complete frame
+    """
+    samples = np.asarray(audio.get_array_of_samples(), dtype=np.float64)
+    frame_length = int(audio.frame_rate * frame_ms / 1000)
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.empty(0)
+
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    full_scale = float(1 << (8 * audio.sample_width - 1))
+    return 20 * np.log10(rms / full_scale + 1e-10)
+
+
+def speech_threshold(energies):
+    """
+    Pick the dBFS level separating speech from background for a recording
+
+    Args:
+        energies (numpy.ndarray): Frame energies from frame_energies
+
+    Returns:
+        float: Threshold in dBFS, or None if the recording is silent
+    """
+    noise_floor = np.percentile(energies, 10)
+    speech_level = np.percentile(energies, 90)
+    if speech_level < SILENCE_FLOOR_DB:
+        return None
+    return max(SILENCE_FLOOR_DB, min(noise_floor + SPEECH_MARGIN_DB, speech_level - SPEECH_MARGIN_DB))
+
+
+def detect_speech(audio, frame_ms=FRAME_MS, min_silence_ms=MIN_SILENCE_MS,
+                  min_speech_ms=MIN_SPEECH_MS, padding_ms=PADDING_MS):
+    """
+    Find the speech segments of a recording
+
+    Args:
+        audio (AudioSegment): Mono audio
+        frame_ms (int): Frame length in milliseconds
+        min_silence_ms (int): Shortest pause that splits two segments
+        min_speech_ms (int): Shortest burst kept as speech
+        padding_ms (int): Audio kept on each side of a segment
+
+    Returns:
+        tuple: (list of (start_ms, end_ms) segments in order, stats dict with
+            audio_seconds, speech_seconds, removed_seconds and segments)
+    """
+    energies = frame_energies(audio, frame_ms)
+    threshold = speech_threshold(energies) if len(energies) else None
+
+    segments = []
+    if threshold is not None:
+        is_speech = np.concatenate(([0], (energies > threshold).astype(np.int8), [0]))
+        edges = np.flatnonzero(np.diff(is_speech))
+        starts, ends = edges[0::2], edges[1::2]
+
+        for start, end in zip(starts * frame_ms, ends * frame_ms):
+            if segments and start - segments[-1][1] < min_silence_ms:
+                segments[-1] = (segments[-1][0], int(end))
+            else:
+                segments.append((int(start), int(end)))
+
+        duration = len(audio)
+        segments = [
+            (max(0, start - padding_ms), min(duration, end + padding_ms))
+            for start, end in segments
+            if end - start >= min_speech_ms
+        ]
+
+        # Padding can make neighbours overlap
+        merged = []
+        for start, end in segments:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        segments = merged
+
+    audio_seconds = len(audio) / 1000
+    speech_seconds = sum(end - start for start, end in segments) / 1000
+    stats = {
+        "audio_seconds": round(audio_seconds, 2),
+        "speech_seconds": round(speech_seconds, 2),
+        "removed_seconds": round(audio_seconds - speech_seconds, 2),
+        "segments": len(segments),
+    }
+
+    with _stats_lock:
+        _totals["recordings"] += 1
+        _totals["audio_seconds"] += audio_seconds
+        _totals["speech_seconds"] += speech_seconds
+        _totals["removed_seconds"] += audio_seconds - speech_seconds
+
+    return segments, stats
+
+
+def get_vad_stats():
+    """
+    Get totals of the audio processed and removed by voice activity detection
+
+    Returns:
+        dict: Counters, plus the fraction of audio removed
+    """
+    with _stats_lock:
+        totals = dict(_totals)
+
+    totals["removed_ratio"] = (
+        round(totals["removed_seconds"] / totals["audio_seconds"], 4) if totals["audio_seconds"] else 0.0
+    )
+    for key in ("audio_seconds", "speech_seconds", "removed_seconds"):
+        totals[key] = round(totals[key], 2)
+    return totals
@@ -27,6 +27,10 @@ document.addEventListener('DOMContentLoaded', function() {
     let audioChunks = [];
     let currentNoteId = null;
     let currentSummary = null;
+    let dictation = null;
+
+    // Sample rate streamed to the server for live dictation
+    const DICTATION_SAMPLE_RATE = 16000;
 
     // Initialize
     initializeVoiceRecognition();
@@ -66,28 +70,159 @@ document.addEventListener('DOMContentLoaded', function() {
                 startBtn.classList.remove('active');
                 startBtn.disabled = false;
                 stopBtn.disabled = true;
-                
-                // ADD THE NEW CODE HERE
-                console.log("=== STARTING PATIENT DETECTION ===");
-                console.log("Transcript text:", finalTranscript.substring(0, 100) + "...");
-                const patientDetails = extractPatientDetailsFromText(finalTranscript);
-                console.log("Extracted patient details:", patientDetails);
-                if (patientDetails && patientDetails.name && patientDetails.age) {
-                    console.log("=== ATTEMPTING HISTORY RETRIEVAL ===");
-                    console.log(`Looking for history for: ${patientDetails.name}, ${patientDetails.age}`);
-                    retrievePreviousPatientHistory(patientDetails.name, patientDetails.age)
-                        .then(history => {
-                            console.log("History retrieval complete, result:", history ? "Found" : "Not found");
-                        });
-                } else {
-                    console.log("=== PATIENT DETECTION FAILED ===");
-                    console.log("Could not extract valid patient name and age from transcript");
-                }
-                // END OF NEW CODE
+
+                detectPatientFromTranscript();
             };
+        }
+    }
+
+    // Look up the dictated patient's previous notes
+    function detectPatientFromTranscript() {
+        console.log("=== STARTING PATIENT DETECTION ===");
+        console.log("Transcript text:", finalTranscript.substring(0, 100) + "...");
+        const patientDetails = extractPatientDetailsFromText(finalTranscript);
+        console.log("Extracted patient details:", patientDetails);
+        if (patientDetails && patientDetails.name && patientDetails.age) {
+            console.log("=== ATTEMPTING HISTORY RETRIEVAL ===");
+            console.log(`Looking for history for: ${patientDetails.name}, ${patientDetails.age}`);
+            retrievePreviousPatientHistory(patientDetails.name, patientDetails.age)
+                .then(history => {
+                    console.log("History retrieval complete, result:", history ? "Found" : "Not found");
+                });
         } else {
-            startBtn.disabled = true;
+            console.log("=== PATIENT DETECTION FAILED ===");
+            console.log("Could not extract valid patient name and age from transcript");
+        }
+    }
+
+    // Start live dictation: stream microphone audio to the server over a
+    // WebSocket and show transcript segments as they come back. Rejects if
+    // the server does not offer live dictation.
+    function startServerDictation() {
+        if (!window.WebSocket || !navigator.mediaDevices || !navigator.mediaDevices.getUserMedia) {
+            return Promise.reject(new Error('Live dictation is not supported in this browser'));
+        }
+
+        return navigator.mediaDevices.getUserMedia({ audio: true }).then(stream => new Promise((resolve, reject) => {
+            const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+            const socket = new WebSocket(
+                `${protocol}//${window.location.host}/dictation?language=en-US&sample_rate=${DICTATION_SAMPLE_RATE}`
+            );
+            const session = { socket: socket, stream: stream, audioContext: null, processor: null, partial: '' };
+            let opened = false;
+
+            socket.onopen = function() {
+                opened = true;
+                const AudioContextClass = window.AudioContext || window.webkitAudioContext;
+                session.audioContext = new AudioContextClass();
+                const source = session.audioContext.createMediaStreamSource(stream);
+                session.processor = session.audioContext.createScriptProcessor(4096, 1, 1);
+                session.processor.onaudioprocess = function(e) {
+                    if (socket.readyState === WebSocket.OPEN) {
+                        socket.send(toPcm16(e.inputBuffer.getChannelData(0), session.audioContext.sampleRate));
+                    }
+                };
+                source.connect(session.processor);
+                session.processor.connect(session.audioContext.destination);
+                dictation = session;
+                console.log('Live dictation started');
+                resolve();
+            };
+
+            socket.onmessage = function(event) {
+                handleDictationMessage(session, JSON.parse(event.data));
+            };
+
+            socket.onerror = function() {
+                if (!opened) {
+                    stream.getTracks().forEach(track => track.stop());
+                    reject(new Error('Could not connect to the dictation server'));
+                }
+            };
+
+            socket.onclose = function() {
+                stopDictationAudio(session);
+                if (dictation === session) {
+                    dictation = null;
+                }
+            };
+        }));
+    }
+
+    // Downsample microphone samples to 16-bit PCM at DICTATION_SAMPLE_RATE
+    function toPcm16(samples, inputRate) {
+        const ratio = inputRate / DICTATION_SAMPLE_RATE;
+        const length = Math.floor(samples.length / ratio);
+        const pcm = new Int16Array(length);
+        for (let i = 0; i < length; i++) {
+            const start = Math.floor(i * ratio);
+            const end = Math.min(samples.length, Math.floor((i + 1) * ratio));
+            let sum = 0;
+            for (let j = start; j < end; j++) {
+                sum += samples[j];
+            }
+            const value = Math.max(-1, Math.min(1, sum / Math.max(1, end - start)));
+            pcm[i] = value < 0 ? value * 0x8000 : value * 0x7FFF;
+        }
+        return pcm.buffer;
+    }
+
+    // Show partial and final transcript segments from the dictation server
+    function handleDictationMessage(session, message) {
+        if (message.type === 'partial') {
+            session.partial = message.text;
+        } else if (message.type === 'final') {
+            if (message.text) {
+                finalTranscript += message.text + ' ';
+            }
+            session.partial = '';
+        } else if (message.type === 'error') {
+            showToast('Speech recognition error: ' + message.error, 'error');
+        } else if (message.type === 'done') {
+            finalTranscript = message.text;
+            session.partial = '';
+            session.socket.close();
+            detectPatientFromTranscript();
+        }
+        transcriptDiv.innerText = finalTranscript + session.partial;
+    }
+
+    // Release the microphone and audio graph of a dictation session
+    function stopDictationAudio(session) {
+        if (session.stopped) {
+            return;
+        }
+        session.stopped = true;
+        if (session.processor) {
+            session.processor.disconnect();
+            session.processor.onaudioprocess = null;
+        }
+        if (session.audioContext && session.audioContext.state !== 'closed') {
+            session.audioContext.close();
+        }
+        session.stream.getTracks().forEach(track => track.stop());
+    }
+
+    // Fall back to the browser's own speech recognition
+    function startBrowserRecognition() {
+        if (!recognition) {
             showToast("Speech Recognition is not supported in this browser.", 'warning');
+            return;
+        }
+        try {
+            recognition.start();
+            console.log('Recognition started');
+            isRecording = true;
+            startBtn.classList.add('active');
+            startBtn.disabled = true;
+            stopBtn.disabled = false;
+            
+            // Also start audio recording
+            initializeAudioRecording();
+            
+        } catch (e) {
+            console.error('Error starting recognition:', e);
+            showToast('Error starting recognition: ' + e.message, 'error');
         }
     }
 
@@ -202,29 +337,34 @@ document.addEventListener('DOMContentLoaded', function() {
         finalTranscript = '';
         transcriptDiv.innerText = '';
         
-        // Start speech recognition
-        try {
-            recognition.start();
-            console.log('Recognition started');
-            isRecording = true;
-            startBtn.classList.add('active');
-            startBtn.disabled = true;
-            stopBtn.disabled = false;
-            
-            // Also start audio recording
-            initializeAudioRecording();
-            
-        } catch (e) {
-            console.error('Error starting recognition:', e);
-            showToast('Error starting recognition: ' + e.message, 'error');
-        }
+        // Prefer live dictation on the server, falling back to the browser's recognizer
+        startServerDictation()
+            .then(() => {
+                isRecording = true;
+                startBtn.classList.add('active');
+                startBtn.disabled = true;
+                stopBtn.disabled = false;
+                
+                // Also start audio recording
+                initializeAudioRecording();
+            })
+            .catch(error => {
+                console.log('Live dictation unavailable, using browser speech recognition:', error.message);
+                startBrowserRecognition();
+            });
     }
 
     // Stop recording function
     function stopRecording() {
         try {
-            // Stop speech recognition
-            if (recognition) {
+            // Stop live dictation; the server sends the remaining text before closing
+            if (dictation) {
+                stopDictationAudio(dictation);
+                if (dictation.socket.readyState === WebSocket.OPEN) {
+                    dictation.socket.send('stop');
+                }
+            } else if (recognition) {
+                // Stop speech recognition
                 recognition.stop();
             }
             
@@ -293,22 +433,29 @@ function handleAudioUpload(event) {
     const formData = new FormData();
     formData.append('audio_file', file);
     
-    // Send the file to the server for transcription
+    // Send the file to the server; it is transcribed in a background job
     fetch('/upload_audio', {
         method: 'POST',
         body: formData
     })
     .then(response => response.json())
     .then(data => {
+        if (data.status !== 'success' || !data.job_id) {
+            throw new Error(data.message || 'Failed to transcribe audio. Please try again or enter text manually.');
+        }
+        transcriptDiv.innerText = '';
+        return pollTranscriptionJob(data.job_id, loadingIndicator);
+    })
+    .then(job => {
         // Remove loading indicator
         if (document.querySelector('.transcription-loading')) {
             document.querySelector('.transcription-loading').remove();
         }
         
-        if (data.status === 'success') {
+        if (job.text) {
             // Set the transcription in the transcript div
-            transcriptDiv.innerText = data.transcription;
-            finalTranscript = data.transcription;
+            transcriptDiv.innerText = job.text;
+            finalTranscript = job.text;
             
             showToast('Audio transcription complete', 'success');
 
@@ -332,7 +479,7 @@ function handleAudioUpload(event) {
             }
             
             // Add quality indicator if the transcription seems short
-            const wordCount = data.transcription.split(' ').length;
+            const wordCount = job.text.split(' ').length;
             const audioLength = audioPlayer.duration;
             
             if (wordCount < 10 && audioLength > 10) {
@@ -358,10 +505,6 @@ function handleAudioUpload(event) {
                     feather.replace(); // Refresh icons
                 }
             }
-        } else {
-            const errorMessage = data.message || 'Failed to transcribe audio. Please try again or enter text manually.';
-            transcriptDiv.innerText = '';
-            showToast(errorMessage, 'error');
         }
     })
     .catch(error => {
@@ -371,8 +514,133 @@ function handleAudioUpload(event) {
         }
         
         console.error('Error uploading and transcribing audio:', error);
-        showToast('Error processing audio file. Please try again or type notes manually.', 'error');
+        transcriptDiv.innerText = '';
+        showToast(error.message || 'Error processing audio file. Please try again or type notes manually.', 'error');
+    });
+}
+
+// Poll a background transcription job, streaming finished segments into the editor
+function pollTranscriptionJob(jobId, loadingIndicator) {
+    const pollIntervalMs = 1000;
+    let received = 0;
+    
+    return new Promise((resolve, reject) => {
+        function poll() {
+            fetch(`/transcription_jobs/${jobId}?since=${received}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.status !== 'success') {
+                    reject(new Error(data.message || 'Transcription job failed'));
+                    return;
+                }
+                
+                const job = data.job;
+                
+                // Append the segments finished since the last poll
+                job.segments.forEach(segment => {
+                    if (segment.text) {
+                        transcriptDiv.innerText += (transcriptDiv.innerText ? ' ' : '') + segment.text;
+                    }
+                });
+                received += job.segments.length;
+                
+                const statusText = loadingIndicator.querySelector('p');
+                if (statusText && job.chunks_total) {
+                    statusText.textContent = `Transcribing audio... ${Math.round(job.progress * 100)}% (${job.chunks_done} of ${job.chunks_total} parts)`;
+                }
+                
+                if (job.status === 'done') {
+                    resolve(job);
+                } else if (job.status === 'error') {
+                    reject(new Error(job.error || 'Transcription failed'));
+                } else {
+                    setTimeout(poll, pollIntervalMs);
+                }
+            })
+            .catch(reject);
+        }
+        
+        poll();
     });
+}
+// Stream the note's summary from the server, reporting each field as soon as it is extracted
+function streamNoteExtraction(noteText, onField) {
+    return fetch('/stream_extract', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({ note: noteText })
+    })
+    .then(response => {
+        if (!response.ok || !response.body) {
+            throw new Error(`Server returned ${response.status}: ${response.statusText}`);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let summary = null;
+        
+        function handleEvent(rawEvent) {
+            const data = rawEvent.split('\n')
+                .filter(line => line.startsWith('data:'))
+                .map(line => line.slice(5).trim())
+                .join('\n');
+            if (!data) {
+                return;
+            }
+            
+            const event = JSON.parse(data);
+            if (event.type === 'field') {
+                onField(event.field, event.value);
+            } else if (event.type === 'complete') {
+                summary = event.summary;
+            } else if (event.type === 'error') {
+                throw new Error(event.message || 'Extraction failed');
+            }
+        }
+        
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                
+                // Server-sent events are separated by a blank line
+                const events = buffer.split('\n\n');
+                buffer = done ? '' : events.pop();
+                events.forEach(handleEvent);
+                
+                if (done) {
+                    if (!summary) {
+                        throw new Error('Extraction stream ended without a summary');
+                    }
+                    return summary;
+                }
+                return read();
+            });
+        }
+        
+        return read();
+    });
+}
+
+// Short text preview of a streamed summary field
+function describeExtractedField(field, value) {
+    const labels = {
+        patient_details: 'Patient',
+        chief_complaints: 'Chief complaints',
+        symptoms: 'Symptoms',
+        possible_diseases: 'Possible diseases'
+    };
+    if (!labels[field]) {
+        return null;
+    }
+    
+    let text;
+    if (field === 'patient_details') {
+        text = [value?.name, value?.age, value?.gender].filter(Boolean).join(', ');
+    } else if (Array.isArray(value)) {
+        text = value.map(item => typeof item === 'string' ? item : (item?.name || item?.disease || '')).filter(Boolean).join(', ');
+    }
+    return text ? `${labels[field]}: ${text}` : null;
 }
     // Fixed saveNote function in notes.js to properly handle IDs from server
 
@@ -385,15 +653,42 @@ function handleAudioUpload(event) {
         
         // Show loading indicator
         showToast('Processing note...', 'info');
-    
-        fetch('/save_note', {
+        
+        // Show the summary fields below the transcript as they are extracted
+        const extractionStatus = document.createElement('div');
+        extractionStatus.className = 'extraction-loading alert alert-secondary mt-3';
+        const extractionHeading = document.createElement('p');
+        extractionHeading.className = 'mb-1';
+        extractionHeading.textContent = 'Extracting summary...';
+        const extractionFields = document.createElement('ul');
+        extractionFields.className = 'mb-0';
+        extractionStatus.appendChild(extractionHeading);
+        extractionStatus.appendChild(extractionFields);
+        transcriptDiv.parentNode.insertBefore(extractionStatus, transcriptDiv.nextSibling);
+        
+        streamNoteExtraction(noteText, (field, value) => {
+            const preview = describeExtractedField(field, value);
+            if (preview) {
+                const item = document.createElement('li');
+                item.textContent = preview;
+                extractionFields.appendChild(item);
+            }
+        })
+        .catch(error => {
+            // The save endpoint extracts the summary itself when streaming fails
+            console.error('Error streaming extraction:', error);
+            return null;
+        })
+        .then(summary => fetch('/save_note', {
             method: 'POST',
             headers: {'Content-Type': 'application/json'},
             body: JSON.stringify({ 
                 note: noteText,
+                summary: summary,  // Already extracted while streaming, if available
                 imported_history: window.importedPatientHistory || null  // Include any imported history
             })
-        })
+        }))
+        .finally(() => extractionStatus.remove())
         .then(res => {
             if (!res.ok) {
                 throw new Error(`Server returned ${res.status}: ${res.statusText}`);